@@ -0,0 +1,282 @@
+"""
+admission module
+
+This module provides admission control for flash sales. A hot product, e.g. a limited item
+many buyers want at once, gets a token bucket limiting its purchases per second. Every
+purchase is admitted once: when it's added to a shopping-cart, or when it's queued as an
+order that bypasses carts (see the orderqueue module). Limits are kept by product id, so
+frozen copies of a read view are admitted like the live product. A request finding the
+bucket empty waits in the queue of its product and requests are served first come, first
+served. The queue is bounded and a request is rejected right away if the queue is full or
+the requests ahead of it need longer than its timeout, so the contention on a hot product
+stays bounded and fails fast instead of piling up. Products without a limit are admitted
+without a lock, the rest of the catalog runs at full speed.
+
+Classes:
+    AdmissionRejected
+    TokenBucket
+    AdmissionControl
+
+Class AdmissionRejected:
+    Raised if a request for a limited product isn't admitted.
+
+Class TokenBucket:
+    Hands out tokens at a fixed rate with bursts up to a capacity.
+
+    Methods:
+        __init__(self, rate: int | float, burst: int = 1):
+            Initializes a full bucket.
+
+        try_acquire(self, tokens: int = 1) -> bool:
+            Takes tokens if available.
+
+        wait_time(self, tokens: int = 1) -> float:
+            Returns the seconds until the tokens are available.
+
+Class AdmissionControl:
+    Limits the requests of hot products with a token bucket and a fair waiting queue each.
+
+    Methods:
+        __init__(self, max_waiting: int = 100, timeout: float = 0.5):
+            Initializes the admission control without limits.
+
+        limit(self, product: Product, rate: int | float, burst: int = 1) -> None:
+            Limits the requests of a product of a store per second.
+
+        unlimit(self, product: Product) -> None:
+            Removes the limit of a product.
+
+        is_limited(self, product: Product) -> bool:
+            Checks if a product is limited.
+
+        waiting(self, product: Product) -> int:
+            Returns the number of requests waiting for a product.
+
+        admit(self, product: Product, timeout: float | None = None) -> None:
+            Waits for the turn of a request, raises AdmissionRejected if it isn't admitted.
+
+        admitted(self) -> int:
+            Returns the number of admitted requests of limited products.
+
+        rejected(self) -> int:
+            Returns the number of rejected requests.
+"""
+
+from collections import deque
+from threading import Condition
+from time import monotonic
+
+import metrics
+
+
+class AdmissionRejected(RuntimeError):
+    """ A request for a limited product wasn't admitted, the client should retry later. """
+
+
+class TokenBucket:
+    """
+    Hands out tokens at a fixed rate, up to burst tokens at once.
+    Not thread-safe, AdmissionControl guards its buckets.
+    """
+
+    __slots__ = ("_rate", "_burst", "_tokens", "_updated")
+
+    def __init__(self, rate: int | float, burst: int = 1):
+        """
+        Initializes a full bucket.
+        :param rate: The tokens added per second.
+        :param burst: The most tokens the bucket holds.
+        """
+        if isinstance(rate, bool) or not isinstance(rate, (int, float)) or not rate > 0:
+            raise ValueError("The rate should be a positive number of tokens per second.")
+
+        if not isinstance(burst, int) or burst < 1:
+            raise ValueError("The burst should be a positive int.")
+
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = monotonic()
+
+    @property
+    def rate(self) -> int | float:
+        """ Returns the tokens added per second. """
+        return self._rate
+
+    @property
+    def burst(self) -> int:
+        """ Returns the most tokens the bucket holds. """
+        return self._burst
+
+    def _refill(self) -> None:
+        """ Adds the tokens of the time passed since the last refill. """
+        now = monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: int = 1) -> bool:
+        """ Takes tokens if available, returns whether they were taken. """
+        self._refill()
+
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+
+        return False
+
+    def wait_time(self, tokens: int = 1) -> float:
+        """
+        Returns the seconds until tokens are available, 0 if they are. Also works for more
+        tokens than the burst, e.g. for the tokens of all waiting requests.
+        """
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self._rate)
+
+
+class _Lane:
+    """ The bucket and the waiting requests of a limited product. """
+
+    __slots__ = ("bucket", "condition", "waiting")
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.condition = Condition()
+        # A ticket per waiting request in order of arrival.
+        self.waiting = deque()
+
+
+class AdmissionControl:
+    """
+    Limits the requests of hot products, see the module description.
+    Requests of products without a limit are always admitted.
+    """
+
+    __slots__ = ("_lanes", "_max_waiting", "_timeout", "_admitted", "_rejected")
+
+    def __init__(self, max_waiting: int = 100, timeout: float = 0.5):
+        """
+        Initializes the admission control without limits.
+        :param max_waiting: The most requests waiting per product, more are rejected.
+        :param timeout: The default seconds a request waits at most.
+        """
+        if not isinstance(max_waiting, int) or max_waiting < 0:
+            raise ValueError("max_waiting should be an int of at least 0.")
+
+        if not isinstance(timeout, (int, float)) or timeout < 0:
+            raise ValueError("The timeout should be a number of seconds of at least 0.")
+
+        # Product id -> lane.
+        self._lanes = {}
+        self._max_waiting = max_waiting
+        self._timeout = timeout
+        self._admitted = 0
+        self._rejected = 0
+
+    @property
+    def admitted(self) -> int:
+        """ Returns the number of admitted requests of limited products. """
+        return self._admitted
+
+    @property
+    def rejected(self) -> int:
+        """ Returns the number of rejected requests. """
+        return self._rejected
+
+    def limit(self, product, rate: int | float, burst: int = 1) -> None:
+        """
+        Limits the requests of a product, replacing a previous limit. Waiting requests keep
+        waiting for the previous limit.
+        :param product: The product, e.g. a limited item of a flash sale. It must be in a store.
+        :param rate: The admitted requests per second.
+        :param burst: The most requests admitted at once after a quiet period.
+        """
+        if product.id is None:
+            raise ValueError(f"{product.name} isn't sold in a store, add it to a store first.")
+
+        self._lanes[product.id] = _Lane(TokenBucket(rate, burst))
+
+    def unlimit(self, product) -> None:
+        """ Removes the limit of a product, products without a limit are ignored. """
+        self._lanes.pop(product.id, None)
+
+    def is_limited(self, product) -> bool:
+        """ Checks if a product is limited. """
+        return product.id in self._lanes
+
+    def waiting(self, product) -> int:
+        """ Returns the number of requests waiting for a product. """
+        lane = self._lanes.get(product.id)
+        return len(lane.waiting) if lane is not None else 0
+
+    def _reject(self, product, reason: str) -> AdmissionRejected:
+        """ Counts a rejection and returns its error. Expects the lock of the lane to be held. """
+        self._rejected += 1
+
+        if metrics.is_enabled():
+            metrics.REGISTRY.counter("admission_rejected_total", "Requests rejected by admission control.").inc()
+
+        return AdmissionRejected(f"{product.name} is in high demand, {reason}. Please try again.")
+
+    def _admit(self) -> None:
+        """ Counts an admission. Expects the lock of the lane to be held. """
+        self._admitted += 1
+
+        if metrics.is_enabled():
+            metrics.REGISTRY.counter("admission_admitted_total", "Requests of limited products admitted.").inc()
+
+    def admit(self, product, timeout: float | None = None) -> None:
+        """
+        Waits for the turn of a request for a product. Requests are admitted in order of arrival.
+        :param product: The requested product.
+        :param timeout: [Optional]: Seconds to wait at most, defaults to the timeout of the control.
+        :raises AdmissionRejected: If the queue of the product is full or the request can't be
+            admitted within the timeout. Raised right away if the requests ahead need longer.
+        """
+        lane = self._lanes.get(product.id)
+        if lane is None:
+            return
+
+        timeout = self._timeout if timeout is None else timeout
+        bucket = lane.bucket
+
+        with lane.condition:
+            if not lane.waiting and bucket.try_acquire():
+                self._admit()
+                return
+
+            if not self._max_waiting:
+                raise self._reject(product, "there is no capacity")
+
+            if len(lane.waiting) >= self._max_waiting:
+                raise self._reject(product, "the queue is full")
+
+            # One token per request ahead and one for this request.
+            if bucket.wait_time(len(lane.waiting) + 1) > timeout:
+                raise self._reject(product, "the wait is too long")
+
+            ticket = object()
+            lane.waiting.append(ticket)
+            deadline = monotonic() + timeout
+
+            try:
+                while True:
+                    remaining = deadline - monotonic()
+
+                    if lane.waiting[0] is ticket:
+                        wait = bucket.wait_time()
+                        if wait == 0 and bucket.try_acquire():
+                            self._admit()
+                            return
+                        if wait > remaining:
+                            raise self._reject(product, "the wait is too long")
+                    else:
+                        wait = remaining
+
+                    if remaining <= 0:
+                        raise self._reject(product, "the wait is too long")
+
+                    lane.condition.wait(min(wait, remaining))
+            finally:
+                lane.waiting.remove(ticket)
+                # The next request could be at the head now.
+                lane.condition.notify_all()
@@ -0,0 +1,137 @@
+"""
+allocation module
+
+This module provides warehouse locations and an allocation engine splitting an order line
+across the locations holding stock of a product. Locations are ranked once by priority or
+by cost, an allocation only visits the locations the product is actually stocked in.
+
+Classes:
+    Location
+    Allocator
+
+Class Location:
+    A warehouse or store location with a priority and a shipping cost.
+
+    Methods:
+        __init__(self, name: str, priority: int = 0, cost: int | float = 0):
+            Initializes the location.
+
+Class Allocator:
+    Splits order lines across locations.
+
+    Methods:
+        __init__(self, locations: list[Location], strategy: str = "priority"):
+            Ranks the locations by the given strategy.
+
+        allocate(self, product: Product, quantity: int) -> dict[str, int]:
+            Returns how many items of the product to take from which location.
+"""
+
+from math import inf
+
+STRATEGIES = ("priority", "cost")
+
+
+class Location:
+    """ A location holding stock. Lower priority and cost values are preferred. """
+
+    __slots__ = ("_name", "_priority", "_cost")
+
+    def __init__(self, name: str, priority: int = 0, cost: int | float = 0):
+        """ Checks the validity of inputs and sets instance attributes. """
+        if not isinstance(name, str) or not name:
+            raise ValueError("The location needs a name.")
+
+        if not isinstance(priority, int):
+            raise TypeError("The priority should be of type int.")
+
+        if not isinstance(cost, (int, float)) or cost < 0:
+            raise ValueError("The cost should be a positive number.")
+
+        self._name = name
+        self._priority = priority
+        self._cost = cost
+
+    def __repr__(self):
+        return f"Location({self._name!r}, priority={self._priority}, cost={self._cost})"
+
+    @property
+    def name(self) -> str:
+        """ Returns the private property name. """
+        return self._name
+
+    @property
+    def priority(self) -> int:
+        """ Returns the private property priority. """
+        return self._priority
+
+    @property
+    def cost(self) -> int | float:
+        """ Returns the private property cost. """
+        return self._cost
+
+
+class Allocator:
+    """
+    Splits order lines across locations, preferring locations by priority or cost.
+    Locations unknown to the allocator are used last.
+    """
+
+    __slots__ = ("_locations", "_rank")
+
+    def __init__(self, locations: list[Location], strategy: str = "priority"):
+        """
+        Ranks the locations once.
+        :param locations: The locations of the store.
+        :param strategy: "priority" or "cost". Ties are broken by the other value and the name.
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"The strategy should be one of {', '.join(STRATEGIES)}.")
+
+        if len({location.name for location in locations}) != len(locations):
+            raise ValueError("Location names should be unique.")
+
+        if strategy == "priority":
+            ranked = sorted(locations, key=lambda loc: (loc.priority, loc.cost, loc.name))
+        else:
+            ranked = sorted(locations, key=lambda loc: (loc.cost, loc.priority, loc.name))
+
+        self._locations = ranked
+        self._rank = {location.name: rank for rank, location in enumerate(ranked)}
+
+    @property
+    def locations(self) -> list[Location]:
+        """ Returns the locations in order of preference. """
+        return list(self._locations)
+
+    def allocate(self, product, quantity: int) -> dict[str, int]:
+        """
+        Splits an order line across the locations holding stock of the product.
+        :param product: The product to take from. Products without locations are not split.
+        :param quantity: The ordered quantity.
+        :return: Maps location names to the quantity to take from each.
+        """
+        stock = product.locations
+
+        if not stock:
+            if product.quantity < quantity:
+                raise ValueError(f"Stock of {product.name} is insufficient to buy {quantity}.")
+            return {}
+
+        rank = self._rank
+        split = {}
+        missing = quantity
+
+        for name in sorted(stock, key=lambda loc: rank.get(loc, inf)):
+            if missing == 0:
+                break
+
+            taken = min(stock[name], missing)
+            if taken:
+                split[name] = taken
+                missing -= taken
+
+        if missing:
+            raise ValueError(f"Stock of {product.name} is insufficient to buy {quantity}.")
+
+        return split
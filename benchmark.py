@@ -0,0 +1,541 @@
+"""
+benchmark module
+
+This module provides a small benchmark suite for the hot paths of the store.
+Synthetic catalogs between 10^3 and 10^6 products are generated and the store, shopping-cart
+and promotion operations are timed. Results can be saved as a JSON baseline and compared
+against a later run, failing the comparison if a benchmark regressed over a threshold.
+
+Usage:
+    python benchmark.py --sizes 1000 10000 --save baseline.json
+    python benchmark.py --sizes 1000 10000 --compare baseline.json --threshold 0.25
+
+Functions:
+    make_catalog(size: int, seed: int = 0) -> list[Product]:
+        Creates a deterministic synthetic catalog of the given size.
+
+    time_call(func, repeat: int = 5, setup=None) -> float:
+        Returns the best wall-clock time of repeated calls in seconds.
+
+    make_located_store(lines: int, locations: int, seed: int = 0) -> Store:
+        Creates a store with stock spread over locations and a filled cart.
+
+    run_order_queue(window: float | None, orders: int = QUEUE_ORDERS, clients: int = QUEUE_CLIENTS):
+        Sends orders from concurrent clients through an OrderQueue, returns total and median latency.
+
+    make_session_db(path: str, sessions: int = SESSIONS, seed: int = 0) -> None:
+        Writes a session database of stored carts.
+
+    run_flash_sale(admission: bool, seconds: float = FLASH_SECONDS) -> tuple[float, float]:
+        Orders one hot product from many clients and other products from a few, returns their latencies.
+
+    run_benchmarks(sizes: list[int], repeat: int = 5) -> dict[str, float]:
+        Runs every benchmark for every catalog size and returns the timings.
+
+    compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+        Returns a description of every benchmark that regressed over the threshold.
+
+    main(argv: list[str] | None = None) -> int:
+        Command line entry-point. Returns the exit-code.
+"""
+
+import argparse
+import json
+import random
+import os
+import sqlite3
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from contextlib import redirect_stdout
+from itertools import chain
+from io import StringIO
+from time import perf_counter, time
+
+from admission import AdmissionControl, AdmissionRejected
+from allocation import Allocator, Location
+from catalogsync import diff
+from changefeed import ChangeFeed, Restocked
+from history import InventoryHistory
+from lazycatalog import LazyCatalog
+from orderqueue import OrderQueue
+from quotes import quote_at_least, quote_budget
+from repricing import PercentChange, reprice
+from serialization import read_products, save_products
+from sessions import SessionStore, encode_cart
+from simulator import Demand, simulate
+from products import Product, NonStockedProduct, LimitedProduct
+from promotion import NoPromotion, PromotionDiscountPercent, PromotionEveryXFree
+from store import Store
+
+DEFAULT_SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+
+PROMOTIONS = {
+    "no_promotion": NoPromotion("No Promotion"),
+    "discount_percent": PromotionDiscountPercent("20% off", 20),
+    "every_x_free": PromotionEveryXFree("Buy two, get one free", 3),
+    "every_x_percent": PromotionEveryXFree("Every 2nd 20%", 2, 20),
+}
+
+# Number of cart lines used for the cart- and order-benchmarks.
+CART_LINES = 100
+
+# Cart lines and locations of the allocation-benchmark.
+ALLOCATION_LINES = 5000
+ALLOCATION_LOCATIONS = 200
+
+# Orders and catalog size of the simulator-benchmark.
+SIMULATION_ORDERS = 10 ** 6
+SIMULATION_PRODUCTS = 1000
+
+# Catalog size of the quote-benchmarks.
+QUOTE_PRODUCTS = 40
+
+# Order queue: closed-loop clients each wait for their order before sending the next one.
+QUEUE_ORDERS = 4000
+QUEUE_CLIENTS = 64
+QUEUE_POPULAR = 100
+QUEUE_BATCH = 256
+QUEUE_WINDOWS = (0.0, 0.001, 0.005)
+
+# Clients of the flash sale ordering the hot product and other products, the admitted hot
+# orders per second and the duration of the sale.
+FLASH_HOT_CLIENTS = 32
+FLASH_CLIENTS = 8
+FLASH_RATE = 500
+FLASH_SECONDS = 1.0
+
+# Products of the history benchmarks and the stock changes recorded per repetition.
+HISTORY_PRODUCTS = 10 ** 5
+HISTORY_CHANGES = 10 ** 5
+
+# Catalog lines of the lazy loading benchmarks and the products looked up per repetition.
+LAZY_PRODUCTS = 10 ** 5
+LAZY_LOOKUPS = 1000
+
+# Stored carts of the session benchmarks, restored lazily.
+SESSIONS = 2 * 10 ** 5
+
+# Tags of the synthetic products, assigned round-robin.
+TAG_SETS = (("audio",), ("audio", "wireless"), ("phone", "wireless"), ("video",), ())
+
+
+def make_catalog(size: int, seed: int = 0) -> list[Product]:
+    """
+    Creates a deterministic synthetic catalog. Roughly 80% stocked products,
+    10% non-stocked and 10% limited products, spread over all promotion types and tags.
+    :param size: Number of products in the catalog.
+    :param seed: Seed for the random generator.
+    :return: The list of products.
+    """
+    rng = random.Random(seed)
+    promotions = list(PROMOTIONS.values())
+    catalog = []
+
+    for idx in range(size):
+        name = f"Product {idx}"
+        price = rng.randint(1, 2000)
+        promotion = promotions[idx % len(promotions)]
+        kind = rng.random()
+
+        if kind < 0.1:
+            catalog.append(NonStockedProduct(name, price=price, promotion=promotion))
+        elif kind < 0.2:
+            catalog.append(LimitedProduct(name, price=price, maximum=3, promotion=promotion))
+        else:
+            catalog.append(Product(name, price=price, quantity=rng.randint(0, 500), promotion=promotion))
+
+        catalog[-1].set_tags(TAG_SETS[idx % len(TAG_SETS)])
+
+    return catalog
+
+
+def time_call(func, repeat: int = 5, setup=None) -> float:
+    """
+    Calls func repeat-times and returns the best wall-clock time in seconds.
+    Output printed by func is swallowed.
+    :param setup: [Optional]: Called untimed before every repetition, its
+        return value is passed to func.
+    """
+    best = float("inf")
+
+    for _ in range(repeat):
+        with redirect_stdout(StringIO()):
+            args = (setup(),) if setup else ()
+            start = perf_counter()
+            func(*args)
+            elapsed = perf_counter() - start
+
+        best = min(best, elapsed)
+
+    return best
+
+
+def _fill_cart(store: Store) -> None:
+    """ Adds up to CART_LINES stocked products with quantity 1 to the cart of the store. """
+    for product in store.get_all_available_products()[:CART_LINES]:
+        store.shopping_cart.add_item(store.get_product(product.id), 1)
+
+
+def _store_with_cart(size: int) -> Store:
+    """ Creates a fresh store with a filled cart. """
+    store = Store(make_catalog(size))
+    _fill_cart(store)
+    return store
+
+
+def make_located_store(lines: int, locations: int, seed: int = 0) -> Store:
+    """
+    Creates a store of products stocked in 2 to 20 random locations each, with every
+    product in the cart. The allocator prefers the cheapest location.
+    :param lines: Number of products and cart lines.
+    :param locations: Number of locations.
+    :param seed: Seed for the random generator.
+    """
+    rng = random.Random(seed)
+    all_locations = [
+        Location(f"Warehouse {idx}", priority=rng.randint(0, 10), cost=rng.random())
+        for idx in range(locations)
+    ]
+    store = Store([], allocator=Allocator(all_locations, strategy="cost"))
+
+    for idx in range(lines):
+        product = Product(f"Product {idx}", price=rng.randint(1, 2000), quantity=0)
+        store.add_product(product)
+        for location in rng.sample(all_locations, rng.randint(2, min(20, locations))):
+            store.set_location_stock(product, location.name, rng.randint(1, 50))
+
+        store.shopping_cart.add_item(product, rng.randint(1, product.quantity))
+
+    return store
+
+
+def make_session_db(path: str, sessions: int = SESSIONS, seed: int = 0) -> None:
+    """ Writes a session database of carts with 1 to 10 lines, as a SessionStore stores them. """
+    rng = random.Random(seed)
+    SessionStore(path).close()
+
+    with sqlite3.connect(path) as connection:
+        connection.executemany("INSERT INTO carts (session, data) VALUES (?, ?)", (
+            (f"session-{idx}", encode_cart({
+                product_id: rng.randint(1, 5) for product_id in rng.sample(range(10 ** 4), rng.randint(1, 10))
+            }))
+            for idx in range(sessions)
+        ))
+    connection.close()
+
+
+def run_order_queue(window: float | None, orders: int = QUEUE_ORDERS,
+                    clients: int = QUEUE_CLIENTS) -> tuple[float, float]:
+    """
+    Sends a burst of orders for a few popular products from concurrent clients, e.g. a sale.
+    :param window: The batch window of the OrderQueue, None settles every order directly.
+    :return: The total seconds and the median latency of an order in seconds.
+    """
+    store = Store(make_catalog(10 ** 4, seed=2))
+    store.read_view()
+    popular = store.products[:QUEUE_POPULAR]
+    for product in popular:
+        if not isinstance(product, (NonStockedProduct, LimitedProduct)):
+            product.quantity = 10 ** 6
+    ids = [product.id for product in popular]
+
+    def client(seed, take):
+        rng = random.Random(seed)
+        latencies = []
+        for _ in range(orders // clients):
+            items = {rng.choice(ids): 1 for _ in range(rng.randint(1, 3))}
+            start = perf_counter()
+            take(items)
+            latencies.append(perf_counter() - start)
+        return latencies
+
+    queue = None if window is None else OrderQueue(store, window=window, max_batch=QUEUE_BATCH)
+    take = (lambda items: store.settle_orders([items])) if queue is None else queue.order
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = sorted(chain.from_iterable(pool.map(client, range(clients), [take] * clients)))
+    total = perf_counter() - start
+
+    if queue is not None:
+        queue.close()
+    store.close()
+
+    return total, latencies[len(latencies) // 2]
+
+
+def run_flash_sale(admission: bool, seconds: float = FLASH_SECONDS) -> tuple[float, float]:
+    """
+    Runs a flash sale: many clients order one hot product through an OrderQueue while a few
+    clients order other products. Rejected hot clients back off for a millisecond.
+    :param admission: Limit the hot product to FLASH_RATE orders per second.
+    :return: The median and the 99th percentile latency of the orders of other products in seconds.
+    """
+    store = Store(make_catalog(10 ** 3, seed=6))
+    products = [product for product in store.products if isinstance(product, Product)
+                and not isinstance(product, (NonStockedProduct, LimitedProduct))]
+    for product in products:
+        product.quantity = 10 ** 9
+    hot, others = products[0], products[1:]
+
+    if admission:
+        control = AdmissionControl(max_waiting=16, timeout=0.01)
+        control.limit(hot, rate=FLASH_RATE, burst=10)
+        store = Store(store.products, admission=control)
+
+    stop = Event()
+
+    def hot_client(queue):
+        while not stop.is_set():
+            try:
+                queue.order({hot: 1})
+            except AdmissionRejected:
+                stop.wait(0.001)
+
+    def client(queue, seed):
+        rng = random.Random(seed)
+        latencies = []
+        while not stop.is_set():
+            start = perf_counter()
+            queue.order({rng.choice(others): 1})
+            latencies.append(perf_counter() - start)
+        return latencies
+
+    with OrderQueue(store, window=0) as queue, \
+            ThreadPoolExecutor(max_workers=FLASH_HOT_CLIENTS + FLASH_CLIENTS) as pool:
+        for _ in range(FLASH_HOT_CLIENTS):
+            pool.submit(hot_client, queue)
+        futures = [pool.submit(client, queue, seed) for seed in range(FLASH_CLIENTS)]
+        stop.wait(seconds)
+        stop.set()
+        latencies = sorted(chain.from_iterable(future.result() for future in futures))
+
+    return latencies[len(latencies) // 2], latencies[len(latencies) * 99 // 100]
+
+
+def run_benchmarks(sizes: list[int], repeat: int = 5) -> dict[str, float]:
+    """
+    Runs all benchmarks for every catalog size.
+    :param sizes: The catalog sizes to benchmark.
+    :param repeat: How often each benchmark is repeated, the best time is kept.
+    :return: A mapping of "<benchmark>[<size>]" to seconds.
+    """
+    results = {}
+
+    for size in sizes:
+        # Large catalogs are expensive to build, repeat them less often.
+        reps = repeat if size < 10 ** 5 else max(1, repeat // 5)
+        store = Store(make_catalog(size))
+        other = Store(make_catalog(size, seed=1))
+        # Listings read the view, build it once outside the timings.
+        store.read_view()
+
+        benchmarks = {
+            "store_len": lambda: len(store),
+            "get_all_active_products": store.get_all_active_products,
+            "get_all_available_products": store.get_all_available_products,
+            "get_all_available_products_for_current_cart":
+                store.get_all_available_products_for_current_cart,
+            "shopping_cart_add_item": lambda: _fill_cart(Store(store.products)),
+            "store_add": lambda: store + other,
+            "store_snapshot": lambda: store.snapshot().set_price(store.products[0], 1),
+            "read_view_publish": lambda: store.touch(store.products[0]),
+        }
+
+        for name, func in benchmarks.items():
+            results[f"{name}[{size}]"] = time_call(func, reps)
+
+        # One percent of the catalog changed since the last sync.
+        changed = make_catalog(size)
+        for product in changed[::100]:
+            product.price += 1
+        results[f"catalog_diff[{size}]"] = time_call(lambda: diff(store, changed), reps)
+
+        # The index and the read view keep the change-feed active, the store closes them
+        # before the stock is changed.
+        index = store.catalog_index()
+        results[f"index_query[{size}]"] = time_call(
+            lambda: index.query(tags=["audio"], active=True, in_stock=True, max_price=300), reps
+        )
+        store.close()
+
+        # Changes every price, the last benchmark changing the shared store.
+        results[f"bulk_reprice[{size}]"] = time_call(lambda: reprice(store, rule=PercentChange(1)), reps)
+
+        # Ordering mutates the stock, every repetition gets its own store.
+        results[f"store_order[{size}]"] = time_call(
+            lambda fresh: fresh._order(), reps, setup=lambda: _store_with_cart(size)
+        )
+
+    results[f"allocation_order[{ALLOCATION_LINES}x{ALLOCATION_LOCATIONS}]"] = time_call(
+        lambda fresh: fresh._order(),
+        repeat,
+        setup=lambda: make_located_store(ALLOCATION_LINES, ALLOCATION_LOCATIONS)
+    )
+
+    # Longer windows trade the latency of an order for larger batches.
+    for window in (None, *QUEUE_WINDOWS):
+        label = "direct" if window is None else f"window={window * 1000:g}ms"
+        total, median = run_order_queue(window)
+        results[f"order_queue_total[{QUEUE_ORDERS}x{label}]"] = total
+        results[f"order_queue_p50_latency[{label}]"] = median
+
+    # Recording goes through a private feed, the products keep publishing to an inactive FEED.
+    history_feed = ChangeFeed(capacity=HISTORY_CHANGES)
+    tracked = make_catalog(HISTORY_PRODUCTS, seed=4)
+    history = InventoryHistory(Store(tracked), history_feed)
+    clock = [time()]
+
+    def record():
+        clock[0] += 60
+        for idx in range(HISTORY_CHANGES):
+            product = tracked[idx % HISTORY_PRODUCTS]
+            history_feed.publish(Restocked(product, 0, idx % 97 + 1, clock[0] + idx / 1000))
+        history_feed.flush()
+
+    results[f"history_record[{HISTORY_CHANGES}]"] = time_call(record, repeat)
+    results[f"history_stock_at[{HISTORY_PRODUCTS}]"] = time_call(
+        lambda: [history.stock_at(product, clock[0]) for product in tracked[:1000]], repeat
+    )
+    history.close()
+
+    # Opening a session store and restoring one cart doesn't depend on the stored sessions.
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        make_session_db(path)
+
+        def restore():
+            with SessionStore(path) as sessions:
+                return sessions.cart(f"session-{SESSIONS // 2}")
+
+        results[f"session_restore[{SESSIONS}]"] = time_call(restore, repeat)
+
+        # Every add_item upserts the encoded cart, commits are batched.
+        shopper = Store(make_catalog(10 ** 3))
+        with SessionStore(path, shopper) as sessions:
+            def shop():
+                shopper.shopping_cart = sessions.cart("shopper")
+                _fill_cart(shopper)
+                shopper.shopping_cart.clear()
+
+            results[f"session_add_item[{CART_LINES}]"] = time_call(shop, repeat)
+
+    # Opening a store of a catalog file, parsing every product or loading them on demand.
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "catalog.jsonl")
+        save_products(make_catalog(LAZY_PRODUCTS, seed=5), path)
+
+        results[f"catalog_open_eager[{LAZY_PRODUCTS}]"] = time_call(
+            lambda: Store(list(read_products(path))), repeat
+        )
+
+        def open_lazy():
+            with LazyCatalog(path) as catalog:
+                Store(catalog.products())
+
+        results[f"catalog_open_lazy[{LAZY_PRODUCTS}]"] = time_call(open_lazy, repeat)
+
+        # Every repetition loads new products, the LRU keeps the last ones.
+        with LazyCatalog(path, capacity=LAZY_LOOKUPS) as catalog:
+            offsets = iter(range(0, LAZY_PRODUCTS, LAZY_LOOKUPS))
+            results[f"lazy_load[{LAZY_LOOKUPS}]"] = time_call(
+                lambda start: [catalog[position].price for position in range(start, start + LAZY_LOOKUPS)],
+                repeat,
+                setup=lambda: next(offsets)
+            )
+
+    # Admission control keeps the hot product from slowing down the orders of the others.
+    for admission in (False, True):
+        label = "admission" if admission else "unlimited"
+        median, p99 = run_flash_sale(admission)
+        results[f"flash_sale_p50_latency[{label}]"] = median
+        results[f"flash_sale_p99_latency[{label}]"] = p99
+
+    quoted = Store(make_catalog(QUOTE_PRODUCTS, seed=3))
+    results[f"quote_at_least[{QUOTE_PRODUCTS}]"] = time_call(lambda: quote_at_least(quoted, 100), repeat)
+    results[f"quote_budget[{QUOTE_PRODUCTS}]"] = time_call(lambda: quote_budget(quoted, 200000), repeat)
+
+    catalog = make_catalog(SIMULATION_PRODUCTS)
+    results[f"simulate[{SIMULATION_ORDERS}x{SIMULATION_PRODUCTS}]"] = time_call(
+        lambda: simulate(catalog, Demand.synthetic(catalog), orders=SIMULATION_ORDERS),
+        repeat
+    )
+
+    for name, promotion in PROMOTIONS.items():
+        results[f"apply_promotion_{name}"] = time_call(
+            lambda: [promotion.apply_promotion(price=499, quantity=q) for q in range(10 ** 5)],
+            repeat
+        )
+
+        # Integer cents, one order line at a time and batched per promotion.
+        results[f"apply_promotion_cents_{name}"] = time_call(
+            lambda: [promotion.apply_promotion_cents(price=49999, quantity=q) for q in range(10 ** 5)],
+            repeat
+        )
+        results[f"apply_promotion_cents_many_{name}"] = time_call(
+            lambda: promotion.apply_promotion_cents_many([49999] * 10 ** 5, range(10 ** 5)),
+            repeat
+        )
+
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compares results with a baseline.
+    :param results: The current timings.
+    :param baseline: The saved timings.
+    :param threshold: Allowed relative slowdown, 0.25 allows 25% slower timings.
+    :return: Descriptions of all regressed benchmarks. Empty if nothing regressed.
+    """
+    regressions = []
+
+    for name, seconds in results.items():
+        if name not in baseline or baseline[name] <= 0:
+            continue
+
+        ratio = seconds / baseline[name]
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{name}: {baseline[name]:.6f}s -> {seconds:.6f}s ({ratio:.2f}x)"
+            )
+
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    """ Runs the benchmarks from the command line and returns the exit-code. """
+    parser = argparse.ArgumentParser(description="Benchmarks for the best-buy store.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="Write the results as JSON baseline to this file.")
+    parser.add_argument("--compare", help="Compare the results with this JSON baseline.")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.repeat)
+
+    for name, seconds in results.items():
+        print(f"{name:60} {seconds * 1000:10.3f} ms")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.threshold)
+
+        if regressions:
+            print("Regressions over threshold:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
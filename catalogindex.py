@@ -0,0 +1,385 @@
+"""
+catalogindex module
+
+This module provides a bitmap index of a store's catalog for filtered listings, such as
+"active, in stock, tagged audio, at most $300". Every product gets a bit position, and the
+index keeps one bitmap per tag and per status (active, in stock, limited, unlimited). Prices
+are indexed bit-sliced: bitmap i holds the products whose price in cents has bit i set, so a
+price range is resolved with a few bitwise operations per price bit. A query intersects
+bitmaps and looks up the products of the set bits only, no product is checked one by one.
+
+Bitmaps are Python ints, the bitwise operations run over whole machine words. They are not
+compressed, every bitmap takes up to one bit per product, which suits categories and
+attributes shared by many products. The index is updated incrementally from the change-feed,
+the changed bits of a batch of events are applied with one XOR per bitmap.
+
+Classes:
+    CatalogIndex
+
+Class CatalogIndex:
+    A bitmap index of the products of a store.
+
+    Methods:
+        __init__(self, store, feed: ChangeFeed = FEED):
+            Builds the bitmaps of the store products and subscribes to the change-feed.
+
+        __len__(self) -> int:
+            Returns the number of indexed products.
+
+        track(self, product: Product) -> None:
+            Starts indexing a product, e.g. after Store.add_product.
+
+        untrack(self, product: Product) -> None:
+            Stops indexing a product.
+
+        refresh(self) -> None:
+            Delivers pending change-feed events so the bitmaps are up to date.
+
+        tags(self) -> dict[str, int]:
+            Returns the number of products per tag.
+
+        count(self, **filters) -> int:
+            Returns the number of products matching the filters.
+
+        query(self, **filters) -> list[Product]:
+            Returns the products matching the filters.
+
+        close(self) -> None:
+            Unsubscribes from the change-feed.
+
+Filters:
+    tags: Tags all products must have, e.g. ("audio",).
+    any_tags: Tags of which the products must have at least one.
+    attributes: Attributes the products must have, e.g. {"brand": "acme"}.
+    active, in_stock, limited, unlimited: True or False to require or exclude a status.
+    min_price, max_price: Inclusive price bounds.
+"""
+
+from collections import defaultdict
+from itertools import repeat
+from math import isinf
+from operator import attrgetter
+from threading import Lock
+
+import changefeed
+import money
+from changefeed import FEED, ChangeFeed
+from products import LimitedProduct, Product
+
+# The status bitmaps and the tests deciding if a product has the status.
+STATUSES = ("active", "in_stock", "limited", "unlimited")
+_STATUS_TESTS = (
+    Product.is_active,
+    lambda product: product.quantity > 0,
+    lambda product: isinstance(product, LimitedProduct),
+    lambda product: isinf(product.quantity),
+)
+
+# Stands in for the product of a vacant position, it has no status, price or tag.
+_VACANT = Product("Vacant", price=0, quantity=0, active=False)
+
+# Translates flag bytes to the digits of a binary literal.
+_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+
+def _from_flags(flags) -> int:
+    """ Returns the bitmap with bit i set for every set flag byte i. """
+    digits = bytes(flags).translate(_DIGITS)[::-1]
+    return int(digits, 2) if digits else 0
+
+
+def _from_positions(positions: list) -> int:
+    """ Returns the bitmap with the bits of the positions set. """
+    if len(positions) < 64:
+        bitmap = 0
+        for position in positions:
+            bitmap |= 1 << position
+        return bitmap
+
+    digits = bytearray(b"0") * (max(positions) + 1)
+    for position in positions:
+        digits[position] = 49  # "1"
+    digits.reverse()
+    return int(digits, 2)
+
+
+def _positions(bitmap: int) -> list[int]:
+    """ Returns the positions of the set bits, lowest first. """
+    digits = bin(bitmap)[:1:-1]
+    positions = []
+    find = digits.find
+
+    position = find("1")
+    while position != -1:
+        positions.append(position)
+        position = find("1", position + 1)
+
+    return positions
+
+
+def _slices(cents: list[int]) -> list[int]:
+    """ Returns the bit-sliced bitmaps of the prices, bitmap i holds price bit i. """
+    width = max(cents, default=0).bit_length()
+    if not width:
+        return []
+
+    # One fixed-width binary literal per price, column i of all literals is slice i.
+    digits = "".join(map(f"{{:0{width}b}}".format, cents))
+    return [int(digits[width - 1 - bit::width][::-1], 2) for bit in range(width)]
+
+
+def _at_most(slices: list[int], cents: int, candidates: int) -> int:
+    """ Returns the candidates priced at most cents, comparing from the highest price bit. """
+    if cents < 0:
+        return 0
+
+    if cents.bit_length() > len(slices):
+        return candidates
+
+    below, equal = 0, candidates
+    for bit in range(len(slices) - 1, -1, -1):
+        if cents >> bit & 1:
+            below |= equal & ~slices[bit]
+            equal &= slices[bit]
+        else:
+            equal &= ~slices[bit]
+
+    return below | equal
+
+
+class CatalogIndex:
+    """
+    A bitmap index of the products of a store, updated from the change-feed.
+    Positions of untracked products are reused by products tracked later.
+    """
+
+    __slots__ = (
+        "_feed", "_lock", "_products", "_positions", "_free", "_flags", "_cents", "_tag_sets",
+        "_all", "_status", "_slices", "_tags"
+    )
+
+    def __init__(self, store, feed: ChangeFeed = FEED):
+        """
+        Builds the bitmaps of the store products and subscribes to the change-feed.
+        :param store: The store to index, e.g. use Store.catalog_index.
+        :param feed: [Optional]: The change-feed publishing the product changes.
+        """
+        self._feed = feed
+        self._lock = Lock()
+        self._products = list(store.products)
+        self._positions = {product: position for position, product in enumerate(self._products)}
+        self._free = []
+        self._build()
+
+        feed.subscribe(self._on_changes, (
+            changefeed.StockDecremented, changefeed.Restocked, changefeed.Activated,
+            changefeed.Deactivated, changefeed.PriceChanged, changefeed.TagsChanged,
+        ))
+
+    def _build(self) -> None:
+        """
+        Builds all bitmaps from the tracked products. The indexed state of the positions is
+        kept in columns, a flag array per status and lists of prices and tag sets.
+        """
+        products = [_VACANT if product is None else product for product in self._products]
+
+        # The status tests of _STATUS_TESTS mapped over the whole catalog, stock is never negative.
+        quantities = list(map(attrgetter("quantity"), products))
+        self._flags = [
+            bytearray(map(Product.is_active, products)),
+            bytearray(map(bool, quantities)),
+            bytearray(map(isinstance, products, repeat(LimitedProduct))),
+            bytearray(map(isinf, quantities)),
+        ]
+        self._cents = [product.price_cents for product in products]
+        self._tag_sets = [product.tags for product in products]
+
+        self._all = _from_flags(bytes(product is not None for product in self._products))
+        self._status = [_from_flags(flags) for flags in self._flags]
+        self._slices = _slices(self._cents)
+
+        # Products share their tag sets, the positions are grouped by set first.
+        by_set = defaultdict(list)
+        for position, tags in enumerate(self._tag_sets):
+            if tags:
+                by_set[tags].append(position)
+
+        members = defaultdict(list)
+        for tags, positions in by_set.items():
+            for tag in tags:
+                members[tag].extend(positions)
+
+        self._tags = {tag: _from_positions(positions) for tag, positions in members.items()}
+
+    def __len__(self) -> int:
+        """ Returns the number of indexed products. """
+        return len(self._positions)
+
+    def _set(self, position: int, product: Product | None, toggles: dict) -> None:
+        """
+        Stores the state of a product at its position and collects the bits that changed,
+        by bitmap. None vacates the position.
+        """
+        source = _VACANT if product is None else product
+
+        for status, test in enumerate(_STATUS_TESTS):
+            flag = test(source)
+            if flag != self._flags[status][position]:
+                self._flags[status][position] = flag
+                toggles["status", status].append(position)
+
+        cents = source.price_cents
+        changed = cents ^ self._cents[position]
+        self._cents[position] = cents
+        for bit in range(changed.bit_length()):
+            if changed >> bit & 1:
+                toggles["price", bit].append(position)
+
+        tags = source.tags
+        for tag in tags ^ self._tag_sets[position]:
+            toggles["tag", tag].append(position)
+        self._tag_sets[position] = tags
+
+    def _toggle(self, toggles: dict) -> None:
+        """ Flips the collected bits, one XOR per changed bitmap. """
+        for (kind, key), positions in toggles.items():
+            mask = _from_positions(positions)
+
+            if kind == "all":
+                self._all ^= mask
+            elif kind == "status":
+                self._status[key] ^= mask
+            elif kind == "price":
+                if key >= len(self._slices):
+                    self._slices.extend([0] * (key + 1 - len(self._slices)))
+                self._slices[key] ^= mask
+            else:
+                bitmap = self._tags.get(key, 0) ^ mask
+                if bitmap:
+                    self._tags[key] = bitmap
+                else:
+                    del self._tags[key]
+
+    def track(self, product: Product) -> None:
+        """ Starts indexing a product, tracked products are ignored. """
+        with self._lock:
+            if product in self._positions:
+                return
+
+            if self._free:
+                position = self._free.pop()
+                self._products[position] = product
+            else:
+                position = len(self._products)
+                self._products.append(product)
+                for flags in self._flags:
+                    flags.append(0)
+                self._cents.append(0)
+                self._tag_sets.append(_VACANT.tags)
+
+            self._positions[product] = position
+            toggles = defaultdict(list)
+            toggles["all", None].append(position)
+            self._set(position, product, toggles)
+            self._toggle(toggles)
+
+    def untrack(self, product: Product) -> None:
+        """ Stops indexing a product, e.g. after Store.remove_product. """
+        with self._lock:
+            position = self._positions.pop(product, None)
+            if position is None:
+                return
+
+            toggles = defaultdict(list)
+            toggles["all", None].append(position)
+            self._set(position, None, toggles)
+            self._products[position] = None
+            self._free.append(position)
+            self._toggle(toggles)
+
+    def _on_changes(self, events: list) -> None:
+        """ Applies the changes of a batch of events to the bitmaps. """
+        with self._lock:
+            if any(isinstance(event, changefeed.FeedOverflow) for event in events):
+                # Events were lost, every bitmap could be stale.
+                self._build()
+                return
+
+            toggles = defaultdict(list)
+            for product in {event.product: None for event in events}:
+                position = self._positions.get(product)
+                if position is not None:
+                    self._set(position, product, toggles)
+
+            self._toggle(toggles)
+
+    def refresh(self) -> None:
+        """ Delivers pending change-feed events so the bitmaps reflect the current products. """
+        self._feed.flush()
+
+    def tags(self) -> dict[str, int]:
+        """ Returns the number of products per tag. """
+        self.refresh()
+
+        with self._lock:
+            return {tag: bitmap.bit_count() for tag, bitmap in self._tags.items()}
+
+    def _select(self, tags=(), any_tags=(), attributes=None, active=None, in_stock=None,
+                limited=None, unlimited=None, min_price=None, max_price=None) -> int:
+        """
+        Returns the bitmap of the products matching the filters, see the module filters.
+        Expects the lock to be held.
+        """
+        if isinstance(tags, str):
+            tags = (tags,)
+        if isinstance(any_tags, str):
+            any_tags = (any_tags,)
+
+        bitmap = self._all
+
+        for tag in tags:
+            bitmap &= self._tags.get(tag, 0)
+
+        for key, value in (attributes or {}).items():
+            bitmap &= self._tags.get(f"{key}={value}", 0)
+
+        if any_tags:
+            union = 0
+            for tag in any_tags:
+                union |= self._tags.get(tag, 0)
+            bitmap &= union
+
+        for status, wanted in enumerate((active, in_stock, limited, unlimited)):
+            if wanted is not None:
+                bitmap = bitmap & self._status[status] if wanted else bitmap & ~self._status[status]
+
+        if max_price is not None and bitmap:
+            bitmap = _at_most(self._slices, money.to_cents(max_price), bitmap)
+
+        if min_price is not None and bitmap:
+            bitmap &= ~_at_most(self._slices, money.to_cents(min_price) - 1, bitmap)
+
+        return bitmap
+
+    def count(self, **filters) -> int:
+        """ Returns the number of products matching the filters, without looking them up. """
+        self.refresh()
+
+        with self._lock:
+            return self._select(**filters).bit_count()
+
+    def query(self, **filters) -> list[Product]:
+        """
+        Returns the products matching the filters, e.g.
+        index.query(tags=["audio"], active=True, in_stock=True, max_price=300).
+        Products are returned in position order, catalog order unless positions were reused.
+        """
+        self.refresh()
+
+        with self._lock:
+            products = self._products
+            return [products[position] for position in _positions(self._select(**filters))]
+
+    def close(self) -> None:
+        """ Unsubscribes from the change-feed. """
+        self._feed.unsubscribe(self._on_changes)
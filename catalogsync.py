@@ -0,0 +1,287 @@
+"""
+catalogsync module
+
+This module computes the difference between two catalogs and applies it to a store in place,
+so a replica store is kept in sync by shipping small patches instead of full catalogs.
+Every product is reduced to a canonical state tuple, or a short digest of it for fingerprints
+that are stored or shipped. Only products whose state differs are compared field by field.
+
+Classes:
+    Patch
+
+Class Patch:
+    The added, removed and changed products turning one catalog into another.
+
+    Methods:
+        to_dict(self) -> dict:
+            Returns the patch as JSON-serializable dictionary.
+
+        from_dict(cls, data: dict) -> Patch:
+            Creates a patch from a dictionary written by to_dict.
+
+Functions:
+    product_digest(product: Product) -> bytes:
+        Returns a digest of the name, type, price, stock, promotion, tags and state of a product.
+
+    fingerprint(products) -> dict[str, bytes]:
+        Maps the product names to their digests.
+
+    diff(old, new) -> Patch:
+        Returns the patch turning the old catalog into the new one.
+
+    apply_patch(store: Store, patch: Patch) -> int:
+        Applies a patch to a store in place and returns the number of touched products.
+"""
+
+from hashlib import blake2b
+from math import isinf
+
+from products import Product, LimitedProduct
+from serialization import product_to_dict, product_from_dict
+
+# Fields of a product dictionary that are compared and patched, besides name and type.
+FIELDS = ("price", "quantity", "maximum", "active", "promotion", "locations", "tags")
+
+# Changing any of these fields may change whether the product is active.
+_STATE_FIELDS = {"active", "quantity", "locations"}
+
+
+class Patch:
+    """
+    Turns one catalog into another.
+    added: Product dictionaries (see serialization.product_to_dict) of new products.
+    removed: Names of removed products.
+    changed: Name, type and the changed fields of every changed product. Patches computed
+        from a fingerprint carry all fields.
+    """
+
+    __slots__ = ("added", "removed", "changed")
+
+    def __init__(self, added: list, removed: list, changed: list):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    def __repr__(self):
+        return f"Patch(added={len(self.added)}, removed={len(self.removed)}, changed={len(self.changed)})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Patch):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __len__(self) -> int:
+        """ Returns the number of touched products. """
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    def to_dict(self) -> dict:
+        """ Returns the patch as JSON-serializable dictionary. """
+        return {"added": self.added, "removed": self.removed, "changed": self.changed}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """ Creates a patch from a dictionary written by to_dict. """
+        return cls(
+            added=list(data.get("added", ())),
+            removed=list(data.get("removed", ())),
+            changed=list(data.get("changed", ())),
+        )
+
+
+def _state(product: Product) -> tuple:
+    """
+    Returns the canonical state of a product. Locations without stock are left out,
+    they aren't distinguishable from locations the product was never stocked in.
+    """
+    promotion = product.promotion
+    locations = product.locations
+
+    return (
+        type(product).__name__,
+        product.name,
+        product.price,
+        None if isinf(product.quantity) else product.quantity,
+        getattr(product, "maximum", None),
+        product.is_active(),
+        type(promotion).__name__,
+        promotion.name,
+        getattr(promotion, "percent", None),
+        getattr(promotion, "x", None),
+        tuple(sorted((name, stock) for name, stock in locations.items() if stock)) if locations else (),
+        tuple(sorted(product.tags)),
+    )
+
+
+def product_digest(product: Product) -> bytes:
+    """
+    Returns an 8 byte digest of the product state. The digest is stable across processes,
+    fingerprints can be stored and shipped.
+    """
+    return blake2b(repr(_state(product)).encode(), digest_size=8).digest()
+
+
+def fingerprint(products) -> dict:
+    """ Maps the name of every product to its digest. """
+    return {product.name: product_digest(product) for product in products}
+
+
+def _changed_fields(old: dict, new: dict) -> dict:
+    """ Returns name, type and the fields of the new product dictionary that differ from old. """
+    change = {"name": new["name"], "type": new["type"]}
+
+    for field in FIELDS:
+        before, after = old.get(field), new.get(field)
+        if field == "locations":
+            before = {name: stock for name, stock in (before or {}).items() if stock}
+            after = {name: stock for name, stock in (after or {}).items() if stock}
+        elif field == "tags":
+            before, after = before or [], after or []
+
+        if before != after:
+            change[field] = new.get(field)
+
+    return change
+
+
+def diff(old, new) -> Patch:
+    """
+    Returns the patch turning the old catalog into the new one. Products are matched by name.
+    :param old: The old store, a list of products or a fingerprint of the old catalog.
+        From a fingerprint the changed products are shipped with all fields.
+    :param new: The new store or a list of products.
+    :return: The patch, empty if both catalogs are equal.
+    """
+    new_products = new.products if hasattr(new, "products") else new
+
+    # Catalogs in memory compare the state tuples directly, digests are only needed to
+    # compare against a fingerprint.
+    if isinstance(old, dict):
+        old_states, old_products, state = old, None, product_digest
+    else:
+        old_products = old.products if hasattr(old, "products") else old
+        old_products = {product.name: product for product in old_products}
+        old_states = {name: _state(product) for name, product in old_products.items()}
+        state = _state
+
+    added, changed, seen = [], [], set()
+
+    for product in new_products:
+        name = product.name
+        seen.add(name)
+        old_state = old_states.get(name)
+
+        if old_state is None:
+            added.append(product_to_dict(product))
+        elif old_state != state(product):
+            data = product_to_dict(product)
+            if old_products is None:
+                data.setdefault("locations", {})
+                data.setdefault("tags", [])
+            else:
+                data = _changed_fields(product_to_dict(old_products[name]), data)
+            changed.append(data)
+
+    removed = [name for name in old_states if name not in seen]
+
+    return Patch(added=added, removed=removed, changed=changed)
+
+
+def _target(product: Product, change: dict) -> tuple[Product, bool]:
+    """
+    Builds the patched product from the current one, validating the change.
+    :return: The patched product and whether the change replaces the product type.
+    """
+    data = product_to_dict(product)
+    replace = change.get("type", data["type"]) != data["type"]
+    if "quantity" in change and "locations" not in change:
+        # The locations would override the changed total, it's spread over them on update.
+        data.pop("locations", None)
+    data.update(change)
+    return product_from_dict(data), replace
+
+
+def _update(store, product: Product, target: Product, change: dict) -> None:
+    """ Copies the changed fields of target onto product. """
+    if "locations" in change:
+        locations = target.locations
+        for name, stock in locations.items():
+            if product.locations.get(name, 0) != stock:
+                store.set_location_stock(product, name, stock)
+        # Locations without stock may be left out of the patch, e.g. the default location
+        # the stock moved to when the first location was set above.
+        for name, stock in product.locations.items():
+            if stock != locations.get(name, 0):
+                store.set_location_stock(product, name, locations.get(name, 0))
+
+    if "quantity" in change and not isinf(target.quantity) and product.quantity != target.quantity:
+        product.quantity = int(target.quantity)
+
+    if "price" in change and product.price != target.price:
+        product.price = target.price
+
+    if "promotion" in change and product.promotion is not target.promotion:
+        product.set_promotion(target.promotion)
+
+    if "maximum" in change and isinstance(product, LimitedProduct):
+        product.maximum = target.maximum
+
+    if "tags" in change:
+        product.set_tags(target.tags)
+
+    # Setting the stock (de)activates the product, the patched state is applied last.
+    if _STATE_FIELDS & change.keys() and product.is_active() != target.is_active():
+        if target.is_active():
+            product.activate()
+        else:
+            product.deactivate()
+
+
+def apply_patch(store, patch: Patch) -> int:
+    """
+    Applies a patch to the store in place. The whole patch is validated before any product
+    is changed. Products and cart lines not touched by the patch are kept. Products
+    changing their type are replaced, their cart lines are dropped.
+    :param store: The store to patch.
+    :param patch: A Patch or its dictionary.
+    :return: The number of touched products.
+    """
+    if isinstance(patch, dict):
+        patch = Patch.from_dict(patch)
+
+    products = {product.name: product for product in store.products}
+
+    missing = [name for name in patch.removed if name not in products]
+    missing += [change["name"] for change in patch.changed if change["name"] not in products]
+    if missing:
+        raise KeyError(f"Products not in the store: {', '.join(missing)}")
+
+    duplicates = [data["name"] for data in patch.added if data["name"] in products]
+    if duplicates:
+        raise ValueError(f"Products already in the store: {', '.join(duplicates)}")
+
+    added = [product_from_dict(data) for data in patch.added]
+    updates = []
+    replaced = []
+
+    for change in patch.changed:
+        product = products[change["name"]]
+        target, replace = _target(product, change)
+
+        if replace:
+            replaced.append(product)
+            added.append(target)
+        else:
+            updates.append((product, target, change))
+
+    # Readers of the store see the whole patch applied or none of it.
+    with store.batch():
+        store.remove_products([products[name] for name in patch.removed] + replaced)
+
+        for product, target, change in updates:
+            _update(store, product, target, change)
+            store.touch(product)
+
+        for product in added:
+            store.add_product(product)
+
+    return len(patch)
@@ -0,0 +1,284 @@
+"""
+changefeed module
+
+This module provides a change-feed for inventory changes. Products publish typed events
+whenever their stock, status, price, promotion or tags change. Events are only recorded while
+the feed has subscribers. They are appended to a bounded ring buffer and delivered to the
+subscribers in coalesced batches, either by calling flush() or from a background thread.
+Subscribers recording every change, e.g. a history, can take the batches uncoalesced.
+Publishing never calls a subscriber, so a slow consumer cannot slow down a checkout.
+
+Classes:
+    StockDecremented
+    Restocked
+    Activated
+    Deactivated
+    PriceChanged
+    PromotionChanged
+    TagsChanged
+    FeedOverflow
+    ChangeFeed
+
+Variables:
+    FEED: ChangeFeed
+        The feed all products publish to.
+
+Class ChangeFeed:
+    Buffers published events and delivers them in batches.
+
+    Methods:
+        __init__(self, capacity: int = 65536):
+            Initializes the feed with a ring buffer of the given capacity.
+
+        subscribe(self, callback, event_types: tuple | None = None, coalesced: bool = True) -> None:
+            Registers callback for batches of events, optionally filtered by type or uncoalesced.
+
+        unsubscribe(self, callback) -> None:
+            Removes a subscriber.
+
+        publish(self, event) -> None:
+            Appends an event to the ring buffer.
+
+        flush(self) -> int:
+            Coalesces the buffered events and delivers them. Returns the number of events delivered.
+
+        start(self, interval: float = 0.05) -> None:
+            Starts delivering batches from a background thread.
+
+        stop(self) -> None:
+            Stops the background thread and delivers the remaining events.
+
+Function coalesce:
+    Merges consecutive changes of the same kind on the same product into one event.
+"""
+
+import traceback
+from collections import deque
+from threading import Event, Lock, Thread
+from typing import Any, NamedTuple
+
+
+class StockDecremented(NamedTuple):
+    """ Stock was removed by a purchase or by lowering the quantity. """
+    product: Any
+    quantity: int | float
+    remaining: int | float
+    time: float
+
+
+class Restocked(NamedTuple):
+    """ Stock was raised from previous to quantity. """
+    product: Any
+    previous: int | float
+    quantity: int | float
+    time: float
+
+
+class Activated(NamedTuple):
+    """ The product is shown in the store again. """
+    product: Any
+    time: float
+
+
+class Deactivated(NamedTuple):
+    """ The product was hidden from the store, e.g. because it sold out. """
+    product: Any
+    time: float
+
+
+class PriceChanged(NamedTuple):
+    """ The price changed from old to new. """
+    product: Any
+    old: int | float
+    new: int | float
+    time: float
+
+
+class PromotionChanged(NamedTuple):
+    """ The promotion changed from old to new. """
+    product: Any
+    old: Any
+    new: Any
+    time: float
+
+
+class TagsChanged(NamedTuple):
+    """ The tags changed from old to new. """
+    product: Any
+    old: frozenset
+    new: frozenset
+    time: float
+
+
+class FeedOverflow(NamedTuple):
+    """ The ring buffer was full and dropped events. Consumers should resynchronize. """
+    dropped: int
+    time: float
+
+
+def _merge(first, last):
+    """ Merges two events of the same type on the same product. """
+    if isinstance(first, StockDecremented):
+        return first._replace(quantity=first.quantity + last.quantity, remaining=last.remaining, time=last.time)
+
+    if isinstance(first, Restocked):
+        return first._replace(quantity=last.quantity, time=last.time)
+
+    if isinstance(first, (PriceChanged, PromotionChanged, TagsChanged)):
+        return first._replace(new=last.new, time=last.time)
+
+    return last
+
+
+def coalesce(events: list) -> list:
+    """
+    Merges changes of the same kind on the same product into one event, e.g. a hundred
+    purchases of one product become one StockDecremented with the summed quantity.
+    Activated and Deactivated share a key, only the last status change survives.
+    The merged events take the position of the last event of their kind, so consumers
+    applying the batch in order end at the latest state, e.g. a restock between two
+    purchases comes before the merged purchases.
+    :param events: The events in publishing order.
+    :return: The coalesced events.
+    """
+    merged = {}
+
+    for event in events:
+        if isinstance(event, FeedOverflow):
+            key = (FeedOverflow, None)
+        elif isinstance(event, (Activated, Deactivated)):
+            key = (Activated, id(event.product))
+        else:
+            key = (type(event), id(event.product))
+
+        # Re-inserted keys move to the end, the merged event takes the position of the last event.
+        previous = merged.pop(key, None)
+        if previous is None:
+            merged[key] = event
+        elif isinstance(event, FeedOverflow):
+            merged[key] = event._replace(dropped=previous.dropped + event.dropped)
+        else:
+            merged[key] = _merge(previous, event)
+
+    return list(merged.values())
+
+
+class ChangeFeed:
+    """
+    Buffers published events in a ring buffer and delivers them to subscribers in batches.
+    The attribute active is True while there are subscribers, publishers should check it
+    before creating an event.
+    """
+
+    __slots__ = (
+        "active", "capacity", "_buffer", "_dropped", "_subscribers",
+        "_lock", "_flush_lock", "_thread", "_stop"
+    )
+
+    def __init__(self, capacity: int = 65536):
+        """ Initializes the feed with a ring buffer of the given capacity. """
+        if not isinstance(capacity, int) or capacity < 1:
+            raise ValueError("The capacity should be a positive int.")
+
+        self.active = False
+        self.capacity = capacity
+        self._buffer = deque(maxlen=capacity)
+        self._dropped = 0
+        self._subscribers = []
+        # Guards the buffer and the count of dropped events, held only briefly by publishers.
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._thread = None
+        self._stop = Event()
+
+    def subscribe(self, callback, event_types: tuple | None = None, coalesced: bool = True) -> None:
+        """
+        Registers a subscriber.
+        :param callback: Called with a list of coalesced events.
+        :param event_types: [Optional]: Only deliver events of these types.
+        :param coalesced: [Optional]: False delivers every event in publishing order,
+            e.g. to record each change instead of the latest state.
+        """
+        self._subscribers.append((callback, event_types, coalesced))
+        self.active = True
+
+    def unsubscribe(self, callback) -> None:
+        """ Removes a subscriber. Stops recording events if it was the last one. """
+        self._subscribers = [
+            subscriber for subscriber in self._subscribers if subscriber[0] != callback
+        ]
+        self.active = bool(self._subscribers)
+
+        if not self.active:
+            with self._lock:
+                self._buffer.clear()
+
+    def publish(self, event) -> None:
+        """ Appends an event to the ring buffer, the oldest event is dropped if it is full. """
+        with self._lock:
+            if len(self._buffer) == self.capacity:
+                self._dropped += 1
+
+            self._buffer.append(event)
+
+    def flush(self) -> int:
+        """
+        Coalesces all buffered events and delivers them to the subscribers.
+        :return: The number of delivered events, coalesced unless all subscribers take them uncoalesced.
+        """
+        with self._flush_lock:
+            with self._lock:
+                events = list(self._buffer)
+                self._buffer.clear()
+                dropped, self._dropped = self._dropped, 0
+
+            if dropped:
+                events.insert(0, FeedOverflow(dropped, events[0].time if events else 0.0))
+
+            if not events:
+                return 0
+
+            subscribers = list(self._subscribers)
+            batch = coalesce(events) if any(subscriber[2] for subscriber in subscribers) else events
+
+            for callback, event_types, coalesced in subscribers:
+                delivered = batch if coalesced else events
+
+                if event_types is None:
+                    callback(delivered)
+                    continue
+
+                selected = [event for event in delivered if isinstance(event, event_types + (FeedOverflow,))]
+                if selected:
+                    callback(selected)
+
+            return len(batch)
+
+    def start(self, interval: float = 0.05) -> None:
+        """ Starts delivering batches every interval seconds from a daemon thread. """
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._thread = Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """ Stops the background thread and delivers the remaining events. """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+        self.flush()
+
+    def _run(self, interval: float) -> None:
+        """ Delivers batches until stop() is called. A failing subscriber does not stop the feed. """
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()
+
+
+FEED = ChangeFeed()
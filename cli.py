@@ -0,0 +1,433 @@
+"""
+cli module
+
+This module provides non-interactive subcommands for store operations, so cron-jobs and
+pipelines can run them without a TTY. Catalogs are JSON, JSON-lines or CSV files (see the
+serialization module), results are written to stdout as JSON-lines, JSON or CSV.
+Every command imports only the modules it needs and streams its input where the
+operation allows it.
+
+Usage:
+    python cli.py list CATALOG [--filter all|active|available] [--format jsonl|json|csv]
+    python cli.py totals CATALOG
+    python cli.py import CATALOG INPUT [INPUT ...]
+    python cli.py restock CATALOG RESTOCK_FILE
+    python cli.py order CATALOG ORDERS_FILE [--ledger LEDGER] [--dry-run]
+    python cli.py merge CATALOG OTHER_CATALOG [--output CATALOG]
+    python cli.py diff OLD_CATALOG NEW_CATALOG
+    python cli.py patch CATALOG PATCH_FILE
+    python cli.py reprice CATALOG [--prices PRICES_FILE] [--percent PERCENT [--tag TAG ...]]
+                          [--processes N]
+    python cli.py simulate CATALOG [--ledger LEDGER] [--orders N] [--runs N] [--processes N]
+                           [--promotion PROMOTION_JSON]
+
+Every command takes --trace TRACE_FILE to write a Chrome trace of the store operations.
+
+Functions:
+    main(argv: list[str] | None = None) -> int:
+        Parses the arguments, runs the command and returns the exit-code.
+"""
+
+import argparse
+import sys
+
+OUTPUT_FORMATS = ("jsonl", "json", "csv")
+
+
+def _emit(rows, file_format: str, stream=None) -> None:
+    """
+    Writes dictionaries to stdout, one at a time for JSON-lines.
+    :param rows: Iterable of flat dictionaries.
+    :param file_format: "jsonl", "json" or "csv".
+    """
+    import json
+
+    stream = stream or sys.stdout
+
+    if file_format == "jsonl":
+        for row in rows:
+            stream.write(json.dumps(row) + "\n")
+    elif file_format == "json":
+        json.dump(list(rows), stream, indent=2)
+        stream.write("\n")
+    else:
+        import csv
+
+        writer = None
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(stream, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+
+
+def _lines(items: dict) -> str:
+    """ Formats order lines as one flat field, e.g. "MacBook Air M2: 2, Google Pixel 7: 1". """
+    return ", ".join(f"{name}: {quantity}" for name, quantity in items.items())
+
+
+def _load_store(path: str, catalog_format: str | None, ledger=None):
+    """ Loads a catalog file into a Store. """
+    from serialization import read_products
+    from store import Store
+
+    return Store(list(read_products(path, catalog_format)), ledger=ledger)
+
+
+def _by_name(store) -> dict:
+    """ Maps the product names of a store to the products. """
+    return {product.name: product for product in store.products}
+
+
+def command_list(args) -> int:
+    """ Streams the (active or available) products of a catalog. """
+    from serialization import read_products, write_products
+
+    products = read_products(args.catalog, args.catalog_format)
+
+    if args.filter == "active":
+        products = (product for product in products if product.is_active())
+    elif args.filter == "available":
+        products = (product for product in products if product.is_active() and product.quantity > 0)
+
+    write_products(products, sys.stdout, args.format)
+    return 0
+
+
+def command_totals(args) -> int:
+    """ Streams a catalog and emits the number of products and the total finite stock. """
+    from math import isinf
+    from serialization import read_products
+
+    totals = {"products": 0, "active": 0, "unlimited": 0, "stock": 0}
+
+    for product in read_products(args.catalog, args.catalog_format):
+        totals["products"] += 1
+        totals["active"] += product.is_active()
+        if isinf(product.quantity):
+            totals["unlimited"] += 1
+        else:
+            totals["stock"] += product.quantity
+
+    _emit([totals], args.format)
+    return 0
+
+
+def command_import(args) -> int:
+    """ Adds the products of the input files to the catalog, replacing products of the same name. """
+    import os
+    from serialization import read_products, save_products
+
+    catalog = {}
+    if os.path.exists(args.catalog):
+        catalog = {product.name: product for product in read_products(args.catalog, args.catalog_format)}
+
+    imported = 0
+    for path in args.inputs:
+        for product in read_products(path):
+            catalog[product.name] = product
+            imported += 1
+
+    save_products(catalog.values(), args.catalog, args.catalog_format)
+    _emit([{"imported": imported, "products": len(catalog)}], args.format)
+    return 0
+
+
+def _read_rows(path: str):
+    """ Yields the rows of a JSON-lines or CSV file, "-" reads JSON-lines from stdin. """
+    import csv
+    import json
+
+    if path == "-":
+        yield from (json.loads(line) for line in sys.stdin if line.strip())
+        return
+
+    with open(path, encoding="utf-8", newline="") as stream:
+        if path.lower().endswith(".csv"):
+            yield from csv.DictReader(stream)
+        else:
+            yield from (json.loads(line) for line in stream if line.strip())
+
+
+def command_restock(args) -> int:
+    """ Applies a restock file with name and quantity per row in one pass. """
+    from serialization import save_products
+
+    store = _load_store(args.catalog, args.catalog_format)
+    products = _by_name(store)
+    plan = {}
+
+    for row in _read_rows(args.restock):
+        if row["name"] not in products:
+            print(f"Unknown product {row['name']}.", file=sys.stderr)
+            return 1
+
+        product = products[row["name"]]
+        plan[product] = plan.get(product, 0) + int(row["quantity"])
+
+    added = store.restock(plan)
+    save_products(store.products, args.catalog, args.catalog_format)
+    _emit([{"restocked": len(plan), "units": added}], args.format)
+    return 0
+
+
+def command_order(args) -> int:
+    """
+    Runs a stream of orders against the catalog. Every row of the orders file holds
+    {"items": {"<product name>": quantity}}. Emits one result per order, its status is "ok" if
+    every line was sold, "partial" if some lines were rejected, e.g. out of stock or above the
+    maximum of a product, and "rejected" if none was sold.
+    """
+    from contextlib import redirect_stdout
+    from money import format_cents
+    from serialization import save_products
+
+    ledger = None
+    if args.ledger:
+        from ledger import Ledger
+        ledger = Ledger(args.ledger)
+
+    store = _load_store(args.catalog, args.catalog_format, ledger)
+    products = _by_name(store)
+    out = sys.stdout
+
+    def results():
+        for number, row in enumerate(_read_rows(args.orders)):
+            items = {name: int(quantity) for name, quantity in row["items"].items()}
+            requested = sum(items.values())
+            unknown = [name for name in items if name not in products]
+
+            if unknown:
+                yield {"order": number, "status": "rejected", "total": "0.00", "total_cents": 0,
+                       "requested": requested, "sold": 0, "rejected": _lines(items),
+                       "error": f"Unknown products: {', '.join(unknown)}"}
+                continue
+
+            rejected, unsold = {}, {}
+            # Messages of the cart and the order go to stderr, stdout carries the results.
+            with redirect_stdout(sys.stderr):
+                cart = store.shopping_cart
+                for name, quantity in items.items():
+                    before = cart[products[name]]
+                    cart.add_item(products[name], quantity)
+                    if cart[products[name]] == before:
+                        rejected[name] = quantity
+
+                total = store._order(unsold)
+                store.shopping_cart.clear()
+
+            for product_id, quantity in unsold.items():
+                rejected[store.get_product(product_id).name] = quantity
+
+            sold = requested - sum(rejected.values())
+            status = "ok" if not rejected else "partial" if sold > 0 else "rejected"
+            yield {"order": number, "status": status, "total": format_cents(total), "total_cents": total,
+                   "requested": requested, "sold": sold, "rejected": _lines(rejected), "error": ""}
+
+    try:
+        _emit(results(), args.format, out)
+    finally:
+        if ledger is not None:
+            ledger.close()
+
+    if not args.dry_run:
+        save_products(store.products, args.catalog, args.catalog_format)
+
+    return 0
+
+
+def command_merge(args) -> int:
+    """ Merges two catalogs with Store.__add__ and writes the result. """
+    from serialization import save_products, write_products
+
+    merged = _load_store(args.catalog, args.catalog_format) + _load_store(args.other, args.catalog_format)
+
+    if args.output:
+        save_products(merged.products, args.output)
+    else:
+        write_products(merged.products, sys.stdout, args.format)
+
+    return 0
+
+
+def command_diff(args) -> int:
+    """ Writes the patch turning the old catalog into the new one as JSON. """
+    import json
+    from catalogsync import diff
+    from serialization import read_products
+
+    patch = diff(
+        list(read_products(args.old, args.catalog_format)),
+        read_products(args.new, args.catalog_format)
+    )
+    json.dump(patch.to_dict(), sys.stdout)
+    sys.stdout.write("\n")
+    return 0
+
+
+def command_patch(args) -> int:
+    """ Applies a patch written by the diff command to a catalog. """
+    import json
+    from catalogsync import apply_patch
+    from serialization import save_products
+
+    if args.patch == "-":
+        patch = json.load(sys.stdin)
+    else:
+        with open(args.patch, encoding="utf-8") as stream:
+            patch = json.load(stream)
+
+    store = _load_store(args.catalog, args.catalog_format)
+    touched = apply_patch(store, patch)
+    save_products(store.products, args.catalog, args.catalog_format)
+    _emit([{"patched": touched, "products": len(store.products)}], args.format)
+    return 0
+
+
+def command_reprice(args) -> int:
+    """
+    Reprices a catalog in bulk. Every row of the prices file holds the name and a price
+    and/or a promotion (see serialization.promotion_to_dict). A percentage is applied to all
+    products carrying the given tags, the prices file takes precedence.
+    """
+    from repricing import PercentChange, reprice
+    from serialization import _number, promotion_from_dict, save_products
+
+    prices, promotions = {}, {}
+    for row in _read_rows(args.prices) if args.prices else ():
+        if row.get("price") not in (None, ""):
+            prices[row["name"]] = _number(row["price"])
+        if row.get("promotion"):
+            promotions[row["name"]] = promotion_from_dict(row["promotion"])
+
+    rule = PercentChange(args.percent, args.tag) if args.percent is not None else None
+
+    store = _load_store(args.catalog, args.catalog_format)
+    changed = reprice(store, prices, promotions, rule=rule, processes=args.processes)
+    save_products(store.products, args.catalog, args.catalog_format)
+    _emit([{"repriced": changed, "products": len(store.products)}], args.format)
+    return 0
+
+
+def command_simulate(args) -> int:
+    """
+    Simulates order streams against a catalog and emits the revenue report. Without a ledger
+    a synthetic demand is used. A promotion given as JSON (see serialization.promotion_to_dict)
+    replaces the promotions of all products.
+    """
+    import json
+    from serialization import promotion_from_dict, read_products
+    from simulator import Demand, simulate
+
+    products = list(read_products(args.catalog, args.catalog_format))
+
+    if args.ledger:
+        from ledger import Ledger
+        with Ledger(args.ledger) as ledger:
+            demand = Demand.from_ledger(ledger)
+    else:
+        demand = Demand.synthetic(products, seed=args.seed)
+
+    promotion = promotion_from_dict(json.loads(args.promotion)) if args.promotion else None
+    report = simulate(
+        products, demand, orders=args.orders, runs=args.runs,
+        promotion=promotion, seed=args.seed, processes=args.processes
+    )
+    _emit([report.to_dict()], args.format)
+    return 0
+
+
+def _parser() -> argparse.ArgumentParser:
+    """ Returns the argument parser with all subcommands. """
+    parser = argparse.ArgumentParser(prog="best-buy", description="Headless best-buy store operations.")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="jsonl", help="Output format.")
+    parser.add_argument("--catalog-format", choices=("json", "jsonl", "csv"),
+                        help="Catalog format, detected from the extension by default.")
+    parser.add_argument("--trace", help="Write a Chrome trace of the store operations to this file.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("list", help="List the products of a catalog.")
+    command.add_argument("catalog")
+    command.add_argument("--filter", choices=("all", "active", "available"), default="all")
+    command.set_defaults(func=command_list)
+
+    command = commands.add_parser("totals", help="Show the total stock of a catalog.")
+    command.add_argument("catalog")
+    command.set_defaults(func=command_totals)
+
+    command = commands.add_parser("import", help="Import products into a catalog.")
+    command.add_argument("catalog")
+    command.add_argument("inputs", nargs="+")
+    command.set_defaults(func=command_import)
+
+    command = commands.add_parser("restock", help="Restock products from a file of name and quantity.")
+    command.add_argument("catalog")
+    command.add_argument("restock", help="CSV or JSON-lines file, - for stdin.")
+    command.set_defaults(func=command_restock)
+
+    command = commands.add_parser("order", help="Run a file of orders against a catalog.")
+    command.add_argument("catalog")
+    command.add_argument("orders", help='JSON-lines file of {"items": {name: quantity}}, - for stdin.')
+    command.add_argument("--ledger", help="Record the sold lines in this ledger.")
+    command.add_argument("--dry-run", action="store_true", help="Don't save the updated stock.")
+    command.set_defaults(func=command_order)
+
+    command = commands.add_parser("merge", help="Merge two catalogs.")
+    command.add_argument("catalog")
+    command.add_argument("other")
+    command.add_argument("--output", help="Write the merged catalog to this file instead of stdout.")
+    command.set_defaults(func=command_merge)
+
+    command = commands.add_parser("diff", help="Write the patch turning one catalog into another.")
+    command.add_argument("old")
+    command.add_argument("new")
+    command.set_defaults(func=command_diff)
+
+    command = commands.add_parser("patch", help="Apply a patch written by diff to a catalog.")
+    command.add_argument("catalog")
+    command.add_argument("patch", help="JSON patch file, - for stdin.")
+    command.set_defaults(func=command_patch)
+
+    command = commands.add_parser("reprice", help="Change the prices and promotions of many products.")
+    command.add_argument("catalog")
+    command.add_argument("--prices", help="CSV or JSON-lines file of name, price and promotion, - for stdin.")
+    command.add_argument("--percent", type=float, help="Change the prices by this percentage, e.g. -20.")
+    command.add_argument("--tag", action="append", default=[], help="Only change products with this tag.")
+    command.add_argument("--processes", type=int, help="Evaluate the percentage on worker processes.")
+    command.set_defaults(func=command_reprice)
+
+    command = commands.add_parser("simulate", help="Simulate the revenue of a catalog and its promotions.")
+    command.add_argument("catalog")
+    command.add_argument("--ledger", help="Take the demand from this ledger instead of a synthetic one.")
+    command.add_argument("--orders", type=int, default=10 ** 6, help="Orders per run.")
+    command.add_argument("--runs", type=int, default=1)
+    command.add_argument("--processes", type=int, help="Spread the runs over worker processes.")
+    command.add_argument("--seed", type=int, default=0)
+    command.add_argument("--promotion", help='e.g. {"type": "every_x_free", "name": "Every 2nd 20%%", '
+                                             '"x": 2, "percent": 20}')
+    command.set_defaults(func=command_simulate)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    """ Parses the arguments, runs the command and returns the exit-code. """
+    args = _parser().parse_args(argv)
+
+    if args.trace:
+        import tracing
+        tracing.enable()
+
+    try:
+        return args.func(args)
+    except (OSError, ValueError, TypeError, KeyError) as error:
+        print(f"{args.command}: {error}", file=sys.stderr)
+        return 1
+    finally:
+        if args.trace:
+            tracing.write_chrome(args.trace)
+            tracing.disable()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+differential module
+
+This module checks the optimized pricing and checkout paths against the reference semantics.
+Seeded random cases are generated: catalogs of stocked, unlimited and limited products with
+a mix of promotions, and carts filled through ShoppingCart.add_item, with lines over the stock
+or the maximum of a product. Every case runs through the reference and every optimized path
+on its own fresh copy of the catalog. Bills, stock and status are compared and every mismatch
+is reported as a Divergence together with the case seed, so it can be replayed. The time
+spent in every path is reported alongside.
+
+The reference prices an order line with Promotion.apply_promotion on dollar floats, rounded
+to cents, and checks out line by line with Product.buy, skipping lines the stock doesn't
+cover. The cents paths round the discount of every line half-up, so they may differ from the
+floats by tolerance_cents per line. Stock and status have to match exactly.
+
+Paths:
+    promotion_cents: Promotion.apply_promotion_cents per order line.
+    promotion_cents_many: Promotion.apply_promotion_cents_many over all lines of a case,
+        has to match promotion_cents exactly.
+    order: Store._order, the checkout of the shopping cart.
+    settle_orders: Store.settle_orders, the batched checkout of the order queue.
+
+Usage:
+    python differential.py --cases 1000 --seed 7
+
+Classes:
+    Divergence
+    Report
+
+Functions:
+    make_case(seed: int) -> tuple[list[Product], list[tuple[int, int]]]:
+        Creates the catalog and cart lines of a case.
+
+    run(cases: int = 200, seed: int = 0, tolerance_cents: int = 1) -> Report:
+        Runs seeded cases through all paths and returns the divergences and timings.
+
+    main(argv: list[str] | None = None) -> int:
+        Command line entry-point. Returns the exit-code.
+"""
+
+import argparse
+import random
+import sys
+from contextlib import redirect_stdout
+from io import StringIO
+from math import inf
+from time import perf_counter
+from typing import NamedTuple
+
+import money
+from products import Product, NonStockedProduct, LimitedProduct
+from promotion import NoPromotion, PromotionDiscountPercent, PromotionEveryXFree
+from store import Store
+
+PATHS = ("reference", "promotion_cents", "promotion_cents_many", "order", "settle_orders")
+
+
+class Divergence(NamedTuple):
+    """ A mismatch of a path against the reference in the case of a seed. """
+    seed: int
+    path: str
+    detail: str
+
+
+class Report(NamedTuple):
+    """ The divergences found over all cases and the seconds spent per path. """
+    cases: int
+    divergences: list
+    timings: dict
+
+
+def _promotion(rng: random.Random):
+    """ Returns a random promotion of the mix. """
+    kind = rng.random()
+
+    if kind < 0.3:
+        return NoPromotion.shared("No Promotion")
+    if kind < 0.65:
+        return PromotionDiscountPercent("Discount", rng.randint(1, 100))
+
+    return PromotionEveryXFree("Every X", rng.randint(2, 5), rng.choice((100, 50, 20, 12.5)))
+
+
+def make_case(seed: int) -> tuple[list[Product], list[tuple[int, int]]]:
+    """
+    Creates the catalog and cart lines of a case. Equal seeds create equal cases, every call
+    creates new products.
+    :return: The products and (product index, quantity) pairs to add to the cart.
+    """
+    rng = random.Random(seed)
+    products = []
+
+    for idx in range(rng.randint(1, 12)):
+        price = rng.randint(0, 200000) / 100 if rng.random() < 0.8 else rng.randint(0, 2000)
+        promotion = _promotion(rng)
+        kind = rng.random()
+
+        if kind < 0.6:
+            products.append(Product(f"Product {idx}", price=price, quantity=rng.randint(0, 20),
+                                    promotion=promotion))
+        elif kind < 0.8:
+            products.append(NonStockedProduct(f"License {idx}", price=price, promotion=promotion))
+        else:
+            quantity = inf if rng.random() < 0.5 else rng.randint(0, 10)
+            products.append(LimitedProduct(f"Limited {idx}", price=price, maximum=rng.randint(1, 3),
+                                           quantity=quantity, promotion=promotion))
+
+    lines = [(rng.randrange(len(products)), rng.randint(1, 25)) for _ in range(rng.randint(1, 8))]
+    return products, lines
+
+
+def _store(seed: int) -> Store:
+    """ Creates a fresh store of a case and fills its cart through add_item. """
+    products, lines = make_case(seed)
+    store = Store(products)
+
+    # add_item reports rejected lines, e.g. over the maximum, on stdout.
+    with redirect_stdout(StringIO()):
+        for idx, quantity in lines:
+            store.shopping_cart.add_item(products[idx], quantity)
+
+    return store
+
+
+def _state(store: Store) -> list[tuple]:
+    """ Returns the stock and status of every product. """
+    return [(product.quantity, product.is_active()) for product in store.products]
+
+
+def _reference(store: Store) -> tuple[int, list[int]]:
+    """
+    Checks out the cart of the store by the reference semantics.
+    :return: The bill in cents and the float-priced cents of every order line, 0 if not sold.
+    """
+    bill = 0
+    lines = []
+
+    for product_id, quantity in store.shopping_cart.cart.items():
+        product = store.get_product(product_id)
+        try:
+            product.buy(quantity)
+        except ValueError:
+            lines.append(0)
+            continue
+
+        lines.append(money.to_cents(product.promotion.apply_promotion(product.price, quantity)))
+        bill += lines[-1]
+
+    return bill, lines
+
+
+def _check_pricing(seed: int, store: Store, tolerance_cents: int, timings: dict) -> list[Divergence]:
+    """ Prices every product at several quantities by the float, cents and batched cents paths. """
+    divergences = []
+    lines = [
+        (product.promotion, product.price, product.price_cents, quantity)
+        for product in store.products for quantity in (1, 2, 3, 7, 25)
+    ]
+
+    start = perf_counter()
+    expected = [money.to_cents(promotion.apply_promotion(price, quantity)) for promotion, price, _, quantity in lines]
+    timings["reference"] += perf_counter() - start
+
+    start = perf_counter()
+    single = [promotion.apply_promotion_cents(cents, quantity) for promotion, _, cents, quantity in lines]
+    timings["promotion_cents"] += perf_counter() - start
+
+    start = perf_counter()
+    # Lines sharing a promotion are priced in one call, as money.bill_cents does.
+    groups = {}
+    for position, (promotion, _, cents, quantity) in enumerate(lines):
+        group = groups.setdefault(id(promotion), (promotion, [], [], []))
+        group[1].append(position)
+        group[2].append(cents)
+        group[3].append(quantity)
+    many = [0] * len(lines)
+    for promotion, positions, prices, quantities in groups.values():
+        for position, total in zip(positions, promotion.apply_promotion_cents_many(prices, quantities)):
+            many[position] = total
+    timings["promotion_cents_many"] += perf_counter() - start
+
+    for (promotion, price, cents, quantity), reference, total, batched in zip(lines, expected, single, many):
+        line = f"{type(promotion).__name__} of {cents} cents x {quantity}"
+
+        if abs(total - reference) > tolerance_cents:
+            divergences.append(Divergence(seed, "promotion_cents", f"{line}: {total} != {reference}"))
+
+        if batched != total:
+            divergences.append(Divergence(seed, "promotion_cents_many", f"{line}: {batched} != {total}"))
+
+    return divergences
+
+
+def _check_checkout(seed: int, tolerance_cents: int, timings: dict) -> list[Divergence]:
+    """ Checks out the cart of a case by the reference, Store._order and Store.settle_orders. """
+    divergences = []
+
+    reference_store = _store(seed)
+    start = perf_counter()
+    expected, lines = _reference(reference_store)
+    timings["reference"] += perf_counter() - start
+    expected_state = _state(reference_store)
+    tolerance = tolerance_cents * len(lines)
+
+    order_store = _store(seed)
+    start = perf_counter()
+    with redirect_stdout(StringIO()):
+        bill = order_store._order()
+    timings["order"] += perf_counter() - start
+
+    settle_store = _store(seed)
+    cart = dict(settle_store.shopping_cart.cart)
+    start = perf_counter()
+    result = settle_store.settle_orders([cart])[0] if cart else None
+    timings["settle_orders"] += perf_counter() - start
+    total = result.total if result is not None else 0
+
+    for path, path_bill, store in (("order", bill, order_store), ("settle_orders", total, settle_store)):
+        if abs(path_bill - expected) > tolerance:
+            divergences.append(Divergence(seed, path, f"bill {path_bill} != {expected}"))
+
+        state = _state(store)
+        if state != expected_state:
+            divergences.append(Divergence(seed, path, f"stock and status {state} != {expected_state}"))
+
+    return divergences
+
+
+def run(cases: int = 200, seed: int = 0, tolerance_cents: int = 1) -> Report:
+    """
+    Runs seeded cases through the reference and all optimized paths.
+    :param cases: The number of cases, case i uses the seed seed + i.
+    :param seed: The seed of the first case.
+    :param tolerance_cents: The allowed difference of a cents price to its float reference, per line.
+    :return: The divergences of all cases and the seconds spent per path.
+    """
+    if not isinstance(cases, int) or cases < 1:
+        raise ValueError("The number of cases should be a positive int.")
+
+    divergences = []
+    timings = dict.fromkeys(PATHS, 0.0)
+
+    for case_seed in range(seed, seed + cases):
+        divergences += _check_pricing(case_seed, Store(make_case(case_seed)[0]), tolerance_cents, timings)
+        divergences += _check_checkout(case_seed, tolerance_cents, timings)
+
+    return Report(cases, divergences, timings)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """ Runs the harness and prints the report. Returns 1 if a path diverged. """
+    parser = argparse.ArgumentParser(description="Check the optimized paths against the reference.")
+    parser.add_argument("--cases", type=int, default=1000, help="Number of random cases.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first case.")
+    parser.add_argument("--tolerance", type=int, default=1, help="Allowed cents difference per line.")
+    args = parser.parse_args(argv)
+
+    report = run(args.cases, args.seed, args.tolerance)
+
+    for path, seconds in report.timings.items():
+        print(f"{path:<22}{seconds * 1000:>10.2f} ms")
+
+    for divergence in report.divergences:
+        print(f"seed {divergence.seed}: {divergence.path}: {divergence.detail}")
+
+    print(f"{report.cases} cases, {len(report.divergences)} divergences")
+    return 1 if report.divergences else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
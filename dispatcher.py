@@ -13,9 +13,11 @@ Type Aliases:
 Variables:
     dispatcher: list[Dispatcher]
         A list of dispatcher actions mapping labels to functions.
+        Every action is instrumented with a latency histogram, see the metrics module.
 """
 
 from typing import Callable, TypedDict
+import metrics
 
 
 class Dispatcher(TypedDict):
@@ -48,3 +50,11 @@ dispatcher = [
         lambda store: None
     },
 ]
+
+# Observe the latency of every action, labeled by the menu entry.
+for action in dispatcher:
+    action["func"] = metrics.timed(
+        "store_action_seconds",
+        "Latency of the store menu actions.",
+        labels={"action": action["label"]}
+    )(action["func"])
@@ -0,0 +1,380 @@
+"""
+history module
+
+This module records how the prices and the stock of products change over time, e.g. as input
+for demand forecasting. Every product has a time series per field, fed by the uncoalesced
+change-feed, so every price change, purchase and restock is recorded with its time.
+
+A time series stores its changes delta-encoded: times in milliseconds and values (cents or
+units) as differences to the previous change, written as variable-length ints into one
+bytearray. Changes are grouped in blocks of BLOCK_SIZE, the first change of every block is
+kept with its absolute time and value in an index array. A lookup at a time binary-searches
+the index and decodes one block at most. A change minutes to hours after the previous one
+takes 4 to 6 bytes, a series of a few changes about 250 bytes in total. 10^5 products with a
+thousand changes each take about 500 MB, as lists of (time, value) tuples it would be 10 GB.
+
+The recorder watches its store, products added later are recorded from then on and only
+changes of products in the store are recorded, e.g. not of products of another store on the
+same feed. Changes of a removed product still pending in the feed are dropped.
+
+Unlimited stock isn't recorded. Changes published while the recorder isn't subscribed, or
+dropped by a full feed, are missed, on a feed overflow the current state of every product
+is recorded instead.
+
+Classes:
+    TimeSeries
+    InventoryHistory
+
+Class TimeSeries:
+    The delta-encoded changes of one value over time.
+
+    Methods:
+        __len__(self) -> int:
+            Returns the number of recorded changes.
+
+        __iter__(self):
+            Yields the (time in ms, value) pairs of all changes.
+
+        append(self, when: int, value: int) -> bool:
+            Records a change, returns False if the value didn't change.
+
+        at(self, when: int) -> int | None:
+            Returns the value at a time.
+
+        between(self, start: int, end: int) -> list[tuple[int, int]]:
+            Returns the changes within a time window.
+
+        nbytes(self) -> int:
+            Returns the bytes taken by the encoded changes.
+
+Class InventoryHistory:
+    Records the price and stock history of products from the change-feed.
+
+    Methods:
+        __init__(self, store, feed: ChangeFeed = FEED):
+            Records the current state of the store products, subscribes to the change-feed and
+            watches the store.
+
+        track(self, product: Product) -> None:
+            Starts recording a product, called by the store for added products.
+
+        untrack(self, product: Product) -> None:
+            Stops recording a product, called by the store for removed products.
+
+        refresh(self) -> None:
+            Delivers pending change-feed events so the history is up to date.
+
+        price_at(self, product: Product | int, when: float) -> float | None:
+            Returns the price of a product at a time.
+
+        stock_at(self, product: Product | int, when: float) -> int | None:
+            Returns the stock of a product at a time.
+
+        price_changes(self, product: Product | int, start: float, end: float) -> list[tuple[float, float]]:
+            Returns the price changes of a product within a time window.
+
+        stock_changes(self, product: Product | int, start: float, end: float) -> list[tuple[float, int]]:
+            Returns the stock changes of a product within a time window.
+
+        nbytes(self) -> int:
+            Returns the bytes taken by the encoded changes of all products.
+
+        close(self) -> None:
+            Unsubscribes from the change-feed and stops watching the store.
+"""
+
+from array import array
+from bisect import bisect_right
+from math import isinf
+from threading import Lock
+from time import time
+
+import changefeed
+import money
+from changefeed import FEED, ChangeFeed
+from products import Product
+from varint import read_varint, unzigzag, write_varint, zigzag
+
+# The number of changes per block, a lookup decodes one block at most.
+BLOCK_SIZE = 64
+
+
+def _milliseconds(when: float) -> int:
+    """ Returns a time in seconds as int milliseconds. """
+    return round(when * 1000)
+
+
+class TimeSeries:
+    """
+    The changes of an int value over time, times in int milliseconds. Times are kept in
+    recording order, a change recorded with an earlier time than the last is moved up to it.
+    """
+
+    __slots__ = ("_data", "_blocks", "_count", "_last_time", "_last_value")
+
+    def __init__(self):
+        # Deltas of time and value to the previous change, the block starts aren't in here.
+        self._data = bytearray()
+        # Per block its start time, its start value and the offset of its deltas in _data.
+        self._blocks = array("q")
+        self._count = 0
+        self._last_time = 0
+        self._last_value = 0
+
+    def __len__(self) -> int:
+        """ Returns the number of recorded changes. """
+        return self._count
+
+    def __iter__(self):
+        """ Yields the (time, value) pairs of all changes in time order. """
+        for block in range(len(self._blocks) // 3):
+            yield from self._decode(block)
+
+    @property
+    def nbytes(self) -> int:
+        """ Returns the bytes taken by the encoded changes, without the object overhead. """
+        return len(self._data) + self._blocks.itemsize * len(self._blocks)
+
+    def append(self, when: int, value: int) -> bool:
+        """
+        Records a change.
+        :param when: The time of the change in milliseconds.
+        :param value: The new value.
+        :return: False if the value equals the last recorded value and nothing was recorded.
+        """
+        if self._count:
+            if value == self._last_value:
+                return False
+            when = max(when, self._last_time)
+
+        if self._count % BLOCK_SIZE == 0:
+            self._blocks.extend((when, value, len(self._data)))
+        else:
+            write_varint(self._data, when - self._last_time)
+            write_varint(self._data, zigzag(value - self._last_value))
+
+        self._count += 1
+        self._last_time = when
+        self._last_value = value
+        return True
+
+    def _decode(self, block: int):
+        """ Yields the (time, value) pairs of a block. """
+        blocks = self._blocks
+        when, value, offset = blocks[3 * block], blocks[3 * block + 1], blocks[3 * block + 2]
+        end = blocks[3 * block + 5] if 3 * block + 5 < len(blocks) else len(self._data)
+        data = self._data
+
+        yield when, value
+        while offset < end:
+            delta, offset = read_varint(data, offset)
+            when += delta
+            delta, offset = read_varint(data, offset)
+            value += unzigzag(delta)
+            yield when, value
+
+    def _block_at(self, when: int) -> int:
+        """ Returns the last block starting at or before a time, -1 if there is none. """
+        blocks = self._blocks
+        return bisect_right(range(len(blocks) // 3), when, key=lambda block: blocks[3 * block]) - 1
+
+    def at(self, when: int) -> int | None:
+        """ Returns the value at a time, None before the first change. """
+        block = self._block_at(when)
+        if block < 0:
+            return None
+
+        value = None
+        for change_time, change_value in self._decode(block):
+            if change_time > when:
+                break
+            value = change_value
+
+        return value
+
+    def between(self, start: int, end: int) -> list[tuple[int, int]]:
+        """ Returns the (time, value) pairs of the changes from start to end, both inclusive. """
+        changes = []
+
+        for block in range(max(self._block_at(start), 0), len(self._blocks) // 3):
+            for change in self._decode(block):
+                if change[0] > end:
+                    return changes
+                if change[0] >= start:
+                    changes.append(change)
+
+        return changes
+
+
+class InventoryHistory:
+    """
+    Records the price and stock history of products from the uncoalesced change-feed.
+    Products are identified by id, their history outlives their removal from the store.
+    """
+
+    __slots__ = ("_store", "_feed", "_lock", "_products", "_prices", "_stock")
+
+    def __init__(self, store, feed: ChangeFeed = FEED):
+        """
+        Records the current state of the store products, subscribes to the change-feed and
+        watches the store for added and removed products. Closing the store closes the recorder.
+        :param store: The store whose products are recorded.
+        :param feed: [Optional]: The change-feed publishing the product changes.
+        """
+        self._store = store
+        self._feed = feed
+        self._lock = Lock()
+        # Ids of the recorded products of the store mapped to the products.
+        self._products = {}
+        # Product ids mapped to their time series.
+        self._prices = {}
+        self._stock = {}
+
+        with self._lock:
+            self._add(store.products)
+
+        feed.subscribe(
+            self._on_changes,
+            (changefeed.StockDecremented, changefeed.Restocked, changefeed.PriceChanged),
+            coalesced=False
+        )
+        store.watch(self)
+
+    def _record(self, series: dict, product_id: int, when: float, value) -> None:
+        """ Appends a change to the series of a product, unlimited stock isn't recorded. """
+        if isinstance(value, float) and isinf(value):
+            return
+
+        if product_id not in series:
+            series[product_id] = TimeSeries()
+
+        series[product_id].append(_milliseconds(when), value)
+
+    def _record_state(self, products, when: float) -> None:
+        """ Records the current price and stock of products. Expects the lock to be held. """
+        for product in products:
+            if product.id is not None:
+                self._record(self._prices, product.id, when, product.price_cents)
+                self._record(self._stock, product.id, when, product.quantity)
+
+    def _add(self, products) -> None:
+        """ Starts recording products with their current state. Expects the lock to be held. """
+        for product in products:
+            if product.id is not None:
+                self._products[product.id] = product
+        self._record_state(products, time())
+
+    def track(self, product: Product) -> None:
+        """ Starts recording a product with its current state, the store calls it for added products. """
+        with self._lock:
+            self._add((product,))
+
+    def untrack(self, product: Product) -> None:
+        """ Stops recording a product, its history is kept. The store calls it for removed products. """
+        with self._lock:
+            if self._products.get(product.id) is product:
+                del self._products[product.id]
+
+    def _on_changes(self, events: list) -> None:
+        """ Records every change of a batch of events in publishing order. """
+        with self._lock:
+            overflow = False
+
+            for event in events:
+                if isinstance(event, changefeed.FeedOverflow):
+                    overflow = True
+                    continue
+
+                # Only products of the store are recorded, e.g. not those of another store.
+                product_id = event.product.id
+                if self._products.get(product_id) is not event.product:
+                    continue
+
+                if isinstance(event, changefeed.PriceChanged):
+                    self._record(self._prices, product_id, event.time, money.to_cents(event.new))
+                elif isinstance(event, changefeed.StockDecremented):
+                    self._record(self._stock, product_id, event.time, event.remaining)
+                else:
+                    self._record(self._stock, product_id, event.time, event.quantity)
+
+            if overflow:
+                # Changes were lost, the current state is right as of now.
+                self._record_state(self._store.products, time())
+
+    def refresh(self) -> None:
+        """ Delivers pending change-feed events so the history reflects the current products. """
+        self._feed.flush()
+
+    def _series(self, series: dict, product: Product | int) -> TimeSeries | None:
+        """ Returns the series of a product or product id, None if it has no history. """
+        if isinstance(product, Product):
+            product = product.id
+        elif not isinstance(product, int):
+            raise TypeError("Product or product-id needed to look up the history.")
+
+        return series.get(product)
+
+    def price_at(self, product: Product | int, when: float) -> float | None:
+        """
+        Returns the price of a product at a time.
+        :param product: The product or its id.
+        :param when: The time in seconds since the epoch, as time.time().
+        :return: The price, None if there is no history before the time.
+        """
+        self.refresh()
+
+        with self._lock:
+            series = self._series(self._prices, product)
+            cents = series.at(_milliseconds(when)) if series is not None else None
+
+        return None if cents is None else money.from_cents(cents)
+
+    def stock_at(self, product: Product | int, when: float) -> int | None:
+        """
+        Returns the stock of a product at a time.
+        :param product: The product or its id.
+        :param when: The time in seconds since the epoch, as time.time().
+        :return: The stock, None if there is no history before the time or the stock is unlimited.
+        """
+        self.refresh()
+
+        with self._lock:
+            series = self._series(self._stock, product)
+            return series.at(_milliseconds(when)) if series is not None else None
+
+    def price_changes(self, product: Product | int, start: float, end: float) -> list[tuple[float, float]]:
+        """
+        Returns the price changes of a product from start to end, both inclusive.
+        :return: (time, price) pairs in time order.
+        """
+        self.refresh()
+
+        with self._lock:
+            series = self._series(self._prices, product)
+            changes = series.between(_milliseconds(start), _milliseconds(end)) if series is not None else []
+
+        return [(when / 1000, money.from_cents(cents)) for when, cents in changes]
+
+    def stock_changes(self, product: Product | int, start: float, end: float) -> list[tuple[float, int]]:
+        """
+        Returns the stock changes of a product from start to end, both inclusive.
+        :return: (time, stock) pairs in time order.
+        """
+        self.refresh()
+
+        with self._lock:
+            series = self._series(self._stock, product)
+            changes = series.between(_milliseconds(start), _milliseconds(end)) if series is not None else []
+
+        return [(when / 1000, quantity) for when, quantity in changes]
+
+    @property
+    def nbytes(self) -> int:
+        """ Returns the bytes taken by the encoded changes of all products. """
+        with self._lock:
+            return sum(series.nbytes for series in (*self._prices.values(), *self._stock.values()))
+
+    def close(self) -> None:
+        """ Unsubscribes from the change-feed and stops watching the store. """
+        self._feed.unsubscribe(self._on_changes)
+        self._store.unwatch(self)
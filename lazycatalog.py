@@ -0,0 +1,332 @@
+"""
+lazycatalog module
+
+This module loads the products of a JSON-lines catalog on demand. Opening a catalog only
+scans the file for the offset and the type of every line, no product is parsed. The products
+are lazy products: instances of subclasses of Product, NonStockedProduct and LimitedProduct
+whose name, price, stock, promotion, status and tags are left unset. The first access to one
+of them loads the product's line through the catalog, so lazy products work everywhere a
+product does, e.g. in a Store, carts and checkouts.
+
+Loaded products are kept in an LRU of capacity products. Evicting a product unsets its fields
+again, unless it changed since it was loaded, e.g. by a purchase, then it is pinned instead,
+the catalog file doesn't have the change. Products loaded hot_loads times are pinned as well,
+so the products in demand stay in memory and the LRU holds the long tail. Memory grows with
+the products in use, a product that isn't loaded takes its object and the ids of the store.
+
+Listings of the whole catalog, read views and the catalog index visit every product and load
+them all in turn, lazy catalogs suit lookups by id, carts and checkouts. The catalog file must
+not change while the catalog is open.
+
+Classes:
+    LazyProduct
+    LazyNonStockedProduct
+    LazyLimitedProduct
+    LazyCatalog
+
+Class LazyCatalog:
+    Hands out lazy products of a JSON-lines catalog and keeps the loaded ones in an LRU.
+
+    Methods:
+        __init__(self, path: str, capacity: int = 10000, hot_loads: int = 3):
+            Scans the catalog file and opens it for loading products.
+
+        __len__(self) -> int:
+            Returns the number of products in the catalog.
+
+        __getitem__(self, position: int) -> Product:
+            Returns the lazy product of a catalog line, marking it recently used.
+
+        products(self) -> list[Product]:
+            Returns the lazy products of all catalog lines, e.g. for a Store.
+
+        pin(self, product: Product) -> None:
+            Keeps a product loaded until it's unpinned.
+
+        unpin(self, product: Product) -> None:
+            Returns a pinned product to the LRU.
+
+        loaded(self) -> int:
+            Returns the number of loaded products.
+
+        pinned(self) -> int:
+            Returns the number of pinned products.
+
+        loads(self) -> int:
+            Returns the number of product loads.
+
+        evictions(self) -> int:
+            Returns the number of products evicted from the LRU.
+
+        close(self) -> None:
+            Closes the catalog file.
+"""
+
+import json
+from array import array
+from collections import OrderedDict
+from itertools import accumulate
+from threading import RLock
+
+from products import Product, NonStockedProduct, LimitedProduct
+from serialization import product_from_dict
+
+# The fields loaded on demand, the id and the stock per location stay set.
+_FIELDS = ("_name", "_price", "_quantity", "_promotion", "_active", "_tags")
+_LIMITED_FIELDS = _FIELDS + ("_maximum",)
+_FIELD_NAMES = frozenset(_LIMITED_FIELDS)
+
+# The product kind of a catalog line, lines with stock per location are flagged.
+_KINDS = {"product": 0, "non_stocked": 1, "limited": 2}
+# Lines written by the serialization module start with the type, the first letters tell them apart.
+_PREFIX_LENGTH = 14
+_PREFIXES = {f'{{"type": "{kind}"'.encode()[:_PREFIX_LENGTH]: code for kind, code in _KINDS.items()}
+_HAS_LOCATIONS = 4
+
+
+class _Lazy:
+    """ Loads the fields of a lazy product on their first access. """
+
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        # Only called for unset attributes.
+        if name not in _FIELD_NAMES:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        self._catalog._load(self)
+        return object.__getattribute__(self, name)
+
+
+class LazyProduct(_Lazy, Product):
+    """ A Product loaded from its catalog on first access. """
+    __slots__ = ("_catalog", "_position")
+
+
+class LazyNonStockedProduct(_Lazy, NonStockedProduct):
+    """ A NonStockedProduct loaded from its catalog on first access. """
+    __slots__ = ("_catalog", "_position")
+
+
+class LazyLimitedProduct(_Lazy, LimitedProduct):
+    """ A LimitedProduct loaded from its catalog on first access. """
+    __slots__ = ("_catalog", "_position")
+
+
+_CLASSES = (LazyProduct, LazyNonStockedProduct, LazyLimitedProduct)
+
+
+def _kind(line: bytes) -> int:
+    """ Returns the kind of a catalog line, from its prefix as written by the serialization module. """
+    code = _PREFIXES.get(line[:_PREFIX_LENGTH])
+    if code is None:
+        code = _KINDS[json.loads(line).get("type") or "product"]
+
+    if b'"locations"' in line:
+        code |= _HAS_LOCATIONS
+
+    return code
+
+
+class LazyCatalog:
+    """
+    Hands out lazy products of a JSON-lines catalog, see the module description.
+    Every catalog line has one lazy product, it's the same object on every access.
+    """
+
+    __slots__ = (
+        "_file", "_offsets", "_kinds", "_faults", "_products", "_loaded", "_pinned",
+        "_capacity", "_hot_loads", "_lock", "_loads", "_evictions"
+    )
+
+    def __init__(self, path: str, capacity: int = 10000, hot_loads: int = 3):
+        """
+        Scans the catalog file and opens it for loading products.
+        :param path: A JSON-lines catalog, e.g. written by serialization.save_products.
+        :param capacity: The number of unpinned products kept loaded.
+        :param hot_loads: Pin products once they were loaded this many times, 0 never pins.
+        """
+        if not isinstance(capacity, int) or capacity < 1:
+            raise ValueError("The capacity should be a positive int.")
+
+        if not isinstance(hot_loads, int) or hot_loads < 0:
+            raise ValueError("hot_loads should be an int of at least 0.")
+
+        self._file = open(path, "rb")
+        self._offsets = array("q")
+        self._kinds = bytearray()
+
+        # Lines are scanned in chunks of about 16 MB, blank lines are skipped.
+        offset = 0
+        while lines := self._file.readlines(1 << 24):
+            starts = accumulate(map(len, lines), initial=offset)
+            kept = [(start, line) for start, line in zip(starts, lines) if not line.isspace()]
+            self._offsets.extend([start for start, _ in kept])
+            self._kinds.extend([_kind(line) for _, line in kept])
+            offset += sum(map(len, lines))
+
+        # Loads per product, saturating at 255.
+        self._faults = bytearray(len(self._offsets))
+        self._products = [None] * len(self._offsets)
+        # Position -> (product, field values as loaded) in the order of use.
+        self._loaded = OrderedDict()
+        self._pinned = {}
+        self._capacity = capacity
+        self._hot_loads = hot_loads
+        self._lock = RLock()
+        self._loads = 0
+        self._evictions = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def __len__(self) -> int:
+        """ Returns the number of products in the catalog. """
+        return len(self._offsets)
+
+    def _read(self, position: int) -> Product:
+        """ Parses the line of a position into a new product. """
+        self._file.seek(self._offsets[position])
+        return product_from_dict(json.loads(self._file.readline()))
+
+    def _product(self, position: int) -> Product:
+        """ Returns the lazy product of a position, created on first request. Expects the lock to be held. """
+        product = self._products[position]
+        if product is not None:
+            return product
+
+        kind = self._kinds[position]
+        cls = _CLASSES[kind & ~_HAS_LOCATIONS]
+        product = cls.__new__(cls)
+        product._id = None
+        product._catalog = self
+        product._position = position
+        # The store reads the stock per location when a product is added, it stays set.
+        product._locations = self._read(position)._locations if kind & _HAS_LOCATIONS else None
+
+        self._products[position] = product
+        return product
+
+    def __getitem__(self, position: int) -> Product:
+        """ Returns the lazy product of a catalog line, it's marked as recently used if it's loaded. """
+        if not -len(self) <= position < len(self):
+            raise IndexError("Catalog position out of range.")
+
+        position %= len(self)
+
+        with self._lock:
+            if position in self._loaded:
+                self._loaded.move_to_end(position)
+            return self._product(position)
+
+    def products(self) -> list[Product]:
+        """ Returns the lazy products of all catalog lines, none of them is loaded. """
+        with self._lock:
+            return [self._product(position) for position in range(len(self))]
+
+    @staticmethod
+    def _fields(product: Product) -> tuple:
+        """ Returns the names of the lazily loaded fields of a product. """
+        return _LIMITED_FIELDS if isinstance(product, LimitedProduct) else _FIELDS
+
+    def _load(self, product: Product) -> None:
+        """
+        Sets the unset fields of a lazy product from its catalog line and evicts the least
+        recently used products over capacity.
+        """
+        with self._lock:
+            position = product._position
+            if position in self._loaded or position in self._pinned:
+                return
+
+            source = self._read(position)
+            fields = self._fields(product)
+            values = tuple(getattr(source, field) for field in fields)
+
+            for field, value in zip(fields, values):
+                # A field written while the product was being evicted keeps its value.
+                try:
+                    object.__getattribute__(product, field)
+                except AttributeError:
+                    setattr(product, field, value)
+
+            self._loads += 1
+            faults = self._faults[position] = min(self._faults[position] + 1, 255)
+
+            if self._hot_loads and faults >= self._hot_loads:
+                self._pinned[position] = product
+                return
+
+            self._loaded[position] = (product, values)
+            self._evict()
+
+    def _evict(self) -> None:
+        """ Unsets the fields of the least recently used products over capacity. Expects the lock to be held. """
+        while len(self._loaded) > self._capacity:
+            position, (product, values) = self._loaded.popitem(last=False)
+            fields = self._fields(product)
+
+            if tuple(getattr(product, field) for field in fields) != values:
+                # Changed since it was loaded, unsetting the fields would lose the change.
+                self._pinned[position] = product
+                continue
+
+            for field in fields:
+                delattr(product, field)
+            self._evictions += 1
+
+    def _check(self, product: Product) -> int:
+        """ Returns the position of a lazy product of this catalog. """
+        if not isinstance(product, _Lazy) or product._catalog is not self:
+            raise ValueError("The product isn't a lazy product of this catalog.")
+
+        return product._position
+
+    def pin(self, product: Product) -> None:
+        """ Loads a product and keeps it loaded until it's unpinned. """
+        position = self._check(product)
+
+        with self._lock:
+            self._load(product)
+            self._loaded.pop(position, None)
+            self._pinned[position] = product
+
+    def unpin(self, product: Product) -> None:
+        """ Returns a pinned product to the LRU, it's evicted in turn if it didn't change since it was read. """
+        position = self._check(product)
+
+        with self._lock:
+            if self._pinned.pop(position, None) is None:
+                return
+
+            source = self._read(position)
+            self._loaded[position] = (product, tuple(getattr(source, field) for field in self._fields(product)))
+            self._evict()
+
+    @property
+    def loaded(self) -> int:
+        """ Returns the number of loaded products, pinned ones included. """
+        return len(self._loaded) + len(self._pinned)
+
+    @property
+    def pinned(self) -> int:
+        """ Returns the number of pinned products. """
+        return len(self._pinned)
+
+    @property
+    def loads(self) -> int:
+        """ Returns the number of product loads. """
+        return self._loads
+
+    @property
+    def evictions(self) -> int:
+        """ Returns the number of products evicted from the LRU. """
+        return self._evictions
+
+    def close(self) -> None:
+        """ Closes the catalog file, products that aren't loaded can't be loaded anymore. """
+        self._file.close()
@@ -0,0 +1,320 @@
+"""
+lowstock module
+
+This module provides a low-stock monitor and replenishment planner. Every finite-stock product
+of a store is kept in an indexed min-heap ordered by its headroom (stock minus reorder point).
+The heap is updated incrementally from the change-feed and the monitor watches the store, so
+products added to or removed from the store are tracked accordingly. Finding the products that need
+restocking never scans the whole catalog. Plans are applied in one pass with Store.restock.
+
+Classes:
+    IndexedMinHeap
+    LowStockMonitor
+
+Class IndexedMinHeap:
+    A binary min-heap with a position index, allowing key updates and removals in O(log n).
+
+    Methods:
+        __len__(self) -> int:
+            Returns the number of items in the heap.
+
+        __contains__(self, item) -> bool:
+            Checks if an item is in the heap.
+
+        push(self, item, key) -> None:
+            Adds an item or updates the key of an existing item.
+
+        remove(self, item) -> None:
+            Removes an item from the heap.
+
+        peek(self):
+            Returns the (key, item) pair with the smallest key.
+
+        items_up_to(self, limit):
+            Returns all (key, item) pairs with a key up to limit, smallest first.
+
+Class LowStockMonitor:
+    Watches the stock of a store against per-product reorder points.
+
+    Methods:
+        __init__(self, store, default_reorder_point: int = 10, feed: ChangeFeed = FEED):
+            Builds the heap from the store products, subscribes to the change-feed and watches the store.
+
+        set_reorder_point(self, product, reorder_point: int, target: int | None = None) -> None:
+            Sets the reorder point and optionally the target stock of a product.
+
+        track(self, product) -> None:
+            Starts monitoring a product, called by the store for added products.
+
+        untrack(self, product) -> None:
+            Stops monitoring a product, called by the store for removed products.
+
+        refresh(self) -> None:
+            Delivers pending change-feed events so the heap is up to date.
+
+        low_stock(self) -> list[Product]:
+            Returns all products at or below their reorder point, lowest headroom first.
+
+        plan(self) -> dict[Product, int]:
+            Returns the restock quantity of every low-stock product.
+
+        replenish(self) -> int:
+            Applies the plan to the store and returns the number of units added.
+
+        close(self) -> None:
+            Unsubscribes from the change-feed and stops watching the store.
+"""
+
+from math import isinf
+from threading import Lock
+
+import changefeed
+from changefeed import FEED, ChangeFeed
+
+
+class IndexedMinHeap:
+    """ A binary min-heap of (key, item) pairs with an index of item positions. """
+
+    __slots__ = ("_heap", "_positions")
+
+    def __init__(self):
+        self._heap = []
+        # Maps every item to its index in _heap.
+        self._positions = {}
+
+    def __len__(self) -> int:
+        """ Returns the number of items in the heap. """
+        return len(self._heap)
+
+    def __contains__(self, item) -> bool:
+        """ Checks if an item is in the heap. """
+        return item in self._positions
+
+    def push(self, item, key) -> None:
+        """ Adds an item, or updates its key if it is already in the heap. """
+        position = self._positions.get(item)
+
+        if position is None:
+            self._heap.append([key, item])
+            position = len(self._heap) - 1
+            self._positions[item] = position
+            self._sift_up(position)
+            return
+
+        old_key = self._heap[position][0]
+        self._heap[position][0] = key
+
+        if key < old_key:
+            self._sift_up(position)
+        else:
+            self._sift_down(position)
+
+    def remove(self, item) -> None:
+        """ Removes an item from the heap. Does nothing if the item is not in the heap. """
+        position = self._positions.pop(item, None)
+        if position is None:
+            return
+
+        last = self._heap.pop()
+        if position == len(self._heap):
+            return
+
+        self._heap[position] = last
+        self._positions[last[1]] = position
+        self._sift_up(position)
+        self._sift_down(self._positions[last[1]])
+
+    def peek(self):
+        """ Returns the (key, item) pair with the smallest key, None if the heap is empty. """
+        if not self._heap:
+            return None
+
+        key, item = self._heap[0]
+        return key, item
+
+    def items_up_to(self, limit) -> list:
+        """
+        Returns all (key, item) pairs with key <= limit, smallest key first.
+        Only the part of the heap above the limit is visited.
+        """
+        found = []
+        stack = [0] if self._heap else []
+
+        while stack:
+            position = stack.pop()
+            key, item = self._heap[position]
+
+            if key > limit:
+                continue
+
+            found.append((key, item))
+            stack.extend(
+                child for child in (2 * position + 1, 2 * position + 2)
+                if child < len(self._heap)
+            )
+
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+    def _swap(self, first: int, second: int) -> None:
+        """ Swaps two heap entries and updates their positions. """
+        heap = self._heap
+        heap[first], heap[second] = heap[second], heap[first]
+        self._positions[heap[first][1]] = first
+        self._positions[heap[second][1]] = second
+
+    def _sift_up(self, position: int) -> None:
+        """ Moves an entry up until its parent has a smaller key. """
+        heap = self._heap
+        while position > 0:
+            parent = (position - 1) // 2
+            if heap[parent][0] <= heap[position][0]:
+                return
+
+            self._swap(parent, position)
+            position = parent
+
+    def _sift_down(self, position: int) -> None:
+        """ Moves an entry down until its children have larger keys. """
+        heap = self._heap
+        size = len(heap)
+
+        while True:
+            smallest = position
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < size and heap[child][0] < heap[smallest][0]:
+                    smallest = child
+
+            if smallest == position:
+                return
+
+            self._swap(position, smallest)
+            position = smallest
+
+
+class LowStockMonitor:
+    """
+    Monitors the finite-stock products of a store against reorder points.
+    Products with unlimited stock are ignored.
+    """
+
+    __slots__ = (
+        "_store", "_feed", "_heap", "_reorder_points", "_targets",
+        "_default_reorder_point", "_lock"
+    )
+
+    def __init__(self, store, default_reorder_point: int = 10, feed: ChangeFeed = FEED):
+        """
+        Builds the heap from the store products, subscribes to the change-feed and watches
+        the store for added and removed products. Closing the store closes the monitor.
+        :param store: The store to monitor.
+        :param default_reorder_point: Reorder point of products without an explicit one.
+        :param feed: [Optional]: The change-feed publishing the stock changes.
+        """
+        if not isinstance(default_reorder_point, int) or default_reorder_point < 0:
+            raise ValueError("The reorder point should be an int of at least 0.")
+
+        self._store = store
+        self._feed = feed
+        self._heap = IndexedMinHeap()
+        self._reorder_points = {}
+        self._targets = {}
+        self._default_reorder_point = default_reorder_point
+        self._lock = Lock()
+
+        for product in store.products:
+            self.track(product)
+
+        feed.subscribe(
+            self._on_changes, (changefeed.StockDecremented, changefeed.Restocked)
+        )
+        store.watch(self)
+
+    def _headroom(self, product) -> int | float:
+        """ Returns the stock above the reorder point, negative if below. """
+        reorder_point = self._reorder_points.get(product, self._default_reorder_point)
+        return product.quantity - reorder_point
+
+    def set_reorder_point(self, product, reorder_point: int, target: int | None = None) -> None:
+        """
+        Sets the reorder point of a product.
+        :param product: A tracked product.
+        :param reorder_point: Products at or below this stock are low on stock.
+        :param target: [Optional]: The stock to replenish to. Defaults to twice the reorder point.
+        """
+        if not isinstance(reorder_point, int) or reorder_point < 0:
+            raise ValueError("The reorder point should be an int of at least 0.")
+
+        if target is not None and (not isinstance(target, int) or target <= reorder_point):
+            raise ValueError("The target should be an int larger than the reorder point.")
+
+        with self._lock:
+            self._reorder_points[product] = reorder_point
+            if target is not None:
+                self._targets[product] = target
+
+            if product in self._heap:
+                self._heap.push(product, self._headroom(product))
+
+    def track(self, product) -> None:
+        """ Starts monitoring a product. Unlimited products are ignored. """
+        if isinf(product.quantity):
+            return
+
+        with self._lock:
+            self._heap.push(product, self._headroom(product))
+
+    def untrack(self, product) -> None:
+        """ Stops monitoring a product, the store calls it for removed products. """
+        with self._lock:
+            self._heap.remove(product)
+            self._reorder_points.pop(product, None)
+            self._targets.pop(product, None)
+
+    def _on_changes(self, events: list) -> None:
+        """ Updates the heap keys of all changed products. """
+        with self._lock:
+            if any(isinstance(event, changefeed.FeedOverflow) for event in events):
+                # Events were lost, every key could be stale.
+                products = [item for _, item in self._heap.items_up_to(float("inf"))]
+            else:
+                products = [event.product for event in events]
+
+            for product in products:
+                if product in self._heap:
+                    self._heap.push(product, self._headroom(product))
+
+    def refresh(self) -> None:
+        """ Delivers pending change-feed events so the heap reflects the current stock. """
+        self._feed.flush()
+
+    def low_stock(self) -> list:
+        """ Returns all products at or below their reorder point, lowest headroom first. """
+        self.refresh()
+
+        with self._lock:
+            return [product for _, product in self._heap.items_up_to(0)]
+
+    def plan(self) -> dict:
+        """
+        Returns a replenishment plan mapping every low-stock product to the quantity
+        needed to reach its target stock.
+        """
+        plan = {}
+
+        for product in self.low_stock():
+            reorder_point = self._reorder_points.get(product, self._default_reorder_point)
+            target = self._targets.get(product, max(2 * reorder_point, 1))
+            if target > product.quantity:
+                plan[product] = target - product.quantity
+
+        return plan
+
+    def replenish(self) -> int:
+        """ Applies the current plan to the store. Returns the number of units added. """
+        return self._store.restock(self.plan())
+
+    def close(self) -> None:
+        """ Unsubscribes from the change-feed and stops watching the store. """
+        self._feed.unsubscribe(self._on_changes)
+        self._store.unwatch(self)
@@ -11,9 +11,24 @@ Functions:
     main():
         Initializes the store instance with initial products and promotions,
         and starts the store program.
+
+Called with arguments, the headless subcommands of the cli module are run instead,
+e.g. python main.py totals catalog.jsonl
 """
 
+import atexit
+import os
+import sys
+
+if __name__ == '__main__' and len(sys.argv) > 1:
+    # Headless subcommands are dispatched before the store modules are imported,
+    # the cli module imports only what the command needs.
+    import cli
+    sys.exit(cli.main(sys.argv[1:]))
+
+import metrics
 import prompts
+import tracing
 from products import Product, NonStockedProduct, LimitedProduct
 from promotion import PromotionEveryXFree, PromotionDiscountPercent
 from store import Store
@@ -93,6 +108,30 @@ def main():
     ]
 
     best_buy = Store(product_list)
+
+    # Opt-in instrumentation, e.g. BEST_BUY_METRICS_PORT=9100 python main.py
+    if os.environ.get("BEST_BUY_METRICS_PORT"):
+        metrics.enable()
+        metrics.serve(int(os.environ["BEST_BUY_METRICS_PORT"]))
+
+    # Opt-in tracing, e.g. BEST_BUY_TRACE=trace.json BEST_BUY_TRACE_SAMPLE=0.1 python main.py
+    # The trace is written on exit and opens in chrome://tracing or Perfetto.
+    if os.environ.get("BEST_BUY_TRACE"):
+        slow = os.environ.get("BEST_BUY_TRACE_SLOW")
+        tracing.enable(
+            sample_rate=float(os.environ.get("BEST_BUY_TRACE_SAMPLE", 1)),
+            slow_threshold=float(slow) if slow else None
+        )
+        atexit.register(tracing.write_chrome, os.environ["BEST_BUY_TRACE"])
+
+    # Opt-in cart persistence, e.g. BEST_BUY_SESSIONS=sessions.db BEST_BUY_SESSION=alice python main.py
+    # The cart is saved on every change and restored on the next start.
+    if os.environ.get("BEST_BUY_SESSIONS"):
+        from sessions import SessionStore
+        sessions = SessionStore(os.environ["BEST_BUY_SESSIONS"], best_buy)
+        best_buy.shopping_cart = sessions.cart(os.environ.get("BEST_BUY_SESSION", "default"))
+        atexit.register(sessions.close)
+
     start(best_buy)
 
 
@@ -0,0 +1,289 @@
+"""
+metrics module
+
+This module provides a small instrumentation layer for the store. It keeps counters,
+gauges and latency histograms in a registry and renders them in the Prometheus text format,
+either into a file or served on a local HTTP endpoint.
+Instrumentation is disabled by default. While disabled, every instrumented call costs a single
+flag check.
+
+Classes:
+    Counter
+    Gauge
+    Histogram
+    Registry
+
+Functions:
+    enable() -> None:
+        Enables the collection of metrics.
+
+    disable() -> None:
+        Disables the collection of metrics.
+
+    is_enabled() -> bool:
+        Returns whether metrics are collected.
+
+    timed(name: str, documentation: str, labels: dict | None = None):
+        Decorator observing the latency of the decorated function in a histogram.
+
+    write_prometheus(path: str, registry: Registry = REGISTRY) -> None:
+        Writes the metrics in Prometheus text format to a file.
+
+    serve(port: int = 9100, host: str = "127.0.0.1", registry: Registry = REGISTRY):
+        Serves the metrics on a local HTTP endpoint in a background thread.
+
+Class Counter:
+    A monotonically increasing value.
+
+Class Gauge:
+    A value that can go up and down, e.g. stock or cart size.
+
+Class Histogram:
+    Counts observations into fixed, cumulative buckets.
+
+Class Registry:
+    Holds all metrics and renders them in the Prometheus text format.
+"""
+
+import os
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock, Thread
+from time import perf_counter
+
+# Exponential latency buckets from 10 microseconds to 10 seconds.
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_enabled = False
+
+
+def _escape(value) -> str:
+    """ Escapes a label value for the Prometheus text format. """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple) -> str:
+    """ Returns the labels in Prometheus notation, e.g. {action="Make an order"}. """
+    if not labels:
+        return ""
+
+    pairs = ",".join(
+        f'{key}="{_escape(value)}"'
+        for key, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """ A monotonically increasing value. """
+
+    __slots__ = ("value",)
+    kind = "counter"
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int | float = 1) -> None:
+        """ Increases the counter by amount. """
+        self.value += amount
+
+    def samples(self, name: str, labels: tuple):
+        """ Yields the Prometheus sample lines. """
+        yield f"{name}{_format_labels(labels)} {self.value}"
+
+
+class Gauge:
+    """ A value that can go up and down. """
+
+    __slots__ = ("value",)
+    kind = "gauge"
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: int | float) -> None:
+        """ Sets the gauge to value. """
+        self.value = value
+
+    def samples(self, name: str, labels: tuple):
+        """ Yields the Prometheus sample lines. """
+        yield f"{name}{_format_labels(labels)} {self.value}"
+
+
+class Histogram:
+    """
+    Counts observations into fixed buckets. Observing is a binary search and a
+    list increment, the cumulative counts are only computed when rendering.
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+    kind = "histogram"
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # The last slot counts the observations above the largest bucket (+Inf).
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """ Adds an observation. """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str, labels: tuple):
+        """ Yields the Prometheus sample lines. """
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            yield f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}"
+
+        yield f"{name}_sum{_format_labels(labels)} {self.sum}"
+        yield f"{name}_count{_format_labels(labels)} {self.count}"
+
+
+class Registry:
+    """ Holds all metrics, keyed by name and labels. """
+
+    __slots__ = ("_metrics", "_documentation", "_lock")
+
+    def __init__(self):
+        self._metrics = {}
+        self._documentation = {}
+        self._lock = Lock()
+
+    def _get(self, cls, name: str, documentation: str, labels: dict | None):
+        """ Returns the metric for name and labels, creates it on first use. """
+        key = (name, tuple(sorted(labels.items())) if labels else ())
+        metric = self._metrics.get(key)
+
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(key, cls())
+                self._documentation.setdefault(name, (cls.kind, documentation))
+
+        if not isinstance(metric, cls):
+            raise TypeError(f"Metric {name} is already registered as {metric.kind}.")
+
+        return metric
+
+    def counter(self, name: str, documentation: str = "", labels: dict | None = None) -> Counter:
+        """ Returns the counter for name and labels. """
+        return self._get(Counter, name, documentation, labels)
+
+    def gauge(self, name: str, documentation: str = "", labels: dict | None = None) -> Gauge:
+        """ Returns the gauge for name and labels. """
+        return self._get(Gauge, name, documentation, labels)
+
+    def histogram(self, name: str, documentation: str = "", labels: dict | None = None) -> Histogram:
+        """ Returns the histogram for name and labels. """
+        return self._get(Histogram, name, documentation, labels)
+
+    def clear(self) -> None:
+        """ Removes all metrics. """
+        with self._lock:
+            self._metrics.clear()
+            self._documentation.clear()
+
+    def render(self) -> str:
+        """ Returns all metrics in the Prometheus text format. """
+        lines = []
+
+        for name, (kind, documentation) in sorted(self._documentation.items()):
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+
+            for (metric_name, labels), metric in list(self._metrics.items()):
+                if metric_name == name:
+                    lines.extend(metric.samples(name, labels))
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def enable() -> None:
+    """ Enables the collection of metrics. """
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    """ Disables the collection of metrics. """
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    """ Returns whether metrics are collected. """
+    return _enabled
+
+
+def timed(name: str, documentation: str, labels: dict | None = None):
+    """
+    Decorator observing the latency of every call in the histogram name.
+    While metrics are disabled the decorated function is called directly.
+    :param name: The histogram name, should end with _seconds.
+    :param documentation: The help-text of the histogram.
+    :param labels: [Optional]: Labels of the histogram.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                REGISTRY.histogram(name, documentation, labels).observe(perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def write_prometheus(path: str, registry: Registry = REGISTRY) -> None:
+    """
+    Writes the metrics in Prometheus text format to path, e.g. for the node-exporter
+    textfile collector. The file is replaced atomically.
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        file.write(registry.render())
+
+    os.replace(temporary, path)
+
+
+def serve(port: int = 9100, host: str = "127.0.0.1", registry: Registry = REGISTRY):
+    """
+    Serves the metrics on http://host:port/metrics in a daemon thread.
+    :return: The running server, call shutdown() to stop it.
+    """
+    # Imported on use, http.server pulls in email and ssl, every import of the store would pay for them.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """ Answers every GET request with the rendered metrics. """
+
+        def do_GET(self):
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            """ Keeps the interactive store output clean. """
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
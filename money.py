@@ -0,0 +1,86 @@
+"""
+money module
+
+This module provides the integer-cents core used for bills. Amounts are kept as whole cents
+in ints, so totals are exact and can be compared and aggregated without drift.
+Fractions of a cent only appear when a promotion discounts by a percentage, the discount
+of each order line is rounded half-up to whole cents.
+
+Functions:
+    to_cents(amount: int | float) -> int:
+        Converts a dollar amount to whole cents.
+
+    from_cents(cents: int) -> float:
+        Converts cents to a dollar amount.
+
+    format_cents(cents: int) -> str:
+        Formats cents as dollar string with two decimals.
+
+    ratio(percent: int | float) -> tuple[int, int]:
+        Returns a percentage as exact (numerator, denominator) fraction of one.
+
+    apply_ratio(cents: int, numerator: int, denominator: int) -> int:
+        Multiplies cents by a fraction, rounding half-up to whole cents.
+
+    bill_cents(lines) -> int:
+        Sums the promotion prices of many order lines in batch.
+"""
+
+from fractions import Fraction
+
+
+def to_cents(amount: int | float) -> int:
+    """
+    Converts a dollar amount to whole cents. Prices with fractions of a cent are
+    rounded to the nearest cent.
+    """
+    if isinstance(amount, int):
+        return amount * 100
+
+    return round(amount * 100)
+
+
+def from_cents(cents: int) -> float:
+    """ Converts cents to a dollar amount, e.g. for display. """
+    return cents / 100
+
+
+def format_cents(cents: int) -> str:
+    """ Formats cents as dollar string with two decimals, e.g. 123456 -> "1234.56". """
+    sign = "-" if cents < 0 else ""
+    dollars, rest = divmod(abs(cents), 100)
+    return f"{sign}{dollars}.{rest:02d}"
+
+
+def ratio(percent: int | float) -> tuple[int, int]:
+    """
+    Returns percent / 100 as exact fraction, e.g. 20 -> (1, 5) and 12.5 -> (1, 8).
+    Float percentages are taken by their decimal notation.
+    """
+    fraction = Fraction(str(percent)) / 100
+    return fraction.numerator, fraction.denominator
+
+
+def apply_ratio(cents: int, numerator: int, denominator: int) -> int:
+    """ Returns cents * numerator / denominator rounded half-up to whole cents. """
+    return (2 * cents * numerator + denominator) // (2 * denominator)
+
+
+def bill_cents(lines) -> int:
+    """
+    Sums the prices of many order lines. Lines sharing a promotion are priced together
+    by the promotion's apply_promotion_cents_many.
+    :param lines: Iterable of (promotion, price in cents, quantity).
+    :return: The total in cents.
+    """
+    groups = {}
+
+    for promotion, price, quantity in lines:
+        prices, quantities = groups.setdefault(id(promotion), (promotion, [], []))[1:]
+        prices.append(price)
+        quantities.append(quantity)
+
+    return sum(
+        sum(promotion.apply_promotion_cents_many(prices, quantities))
+        for promotion, prices, quantities in groups.values()
+    )
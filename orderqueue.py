@@ -0,0 +1,214 @@
+"""
+orderqueue module
+
+This module provides an intake queue for bursts of orders. Submitted orders are collected
+for a short window or until a batch is full and then settled together by Store.settle_orders:
+every product is looked up once per batch, the sold quantities of all orders are merged into
+one stock decrement per product and every distinct line is priced in one promotion call.
+Each order gets a future resolving to its own result. A longer window makes larger batches
+and raises throughput, at the cost of the time an order waits for its batch. Orders for
+products limited by the admission control of the store are admitted before they are queued.
+
+Classes:
+    OrderResult
+    OrderQueue
+
+Class OrderResult:
+    The outcome of one order, amounts in cents.
+
+Class OrderQueue:
+    Collects orders and settles them in micro-batches on a worker thread.
+
+    Methods:
+        __init__(self, store: Store, window: float = 0.002, max_batch: int = 256):
+            Starts the worker thread settling the orders of the store.
+
+        submit(self, items: dict[Product | int, int]) -> Future:
+            Queues an order and returns the future of its OrderResult.
+
+        order(self, items: dict[Product | int, int]) -> OrderResult:
+            Queues an order and waits for its result.
+
+        batches(self) -> int:
+            Returns the number of settled batches.
+
+        orders(self) -> int:
+            Returns the number of settled orders.
+
+        close(self) -> None:
+            Settles the queued orders and stops the worker thread.
+"""
+
+from collections import deque
+from concurrent.futures import Future
+from threading import Condition, Thread
+from time import monotonic
+from typing import NamedTuple
+
+import metrics
+from products import Product
+
+
+class OrderResult(NamedTuple):
+    """
+    The outcome of one order. total is in cents, lines maps product ids to the sold
+    quantities, rejected the lines that weren't sold, e.g. because the stock ran out.
+    """
+    total: int
+    lines: dict
+    rejected: dict
+
+
+class OrderQueue:
+    """
+    Collects orders and settles them in micro-batches. A batch is settled once window seconds
+    passed since its first order or max_batch orders are queued, whichever comes first.
+    Orders are served in the order they were submitted.
+    """
+
+    __slots__ = (
+        "_store", "_window", "_max_batch", "_pending", "_condition", "_closed", "_thread",
+        "_batches", "_orders"
+    )
+
+    def __init__(self, store, window: float = 0.002, max_batch: int = 256):
+        """
+        Starts the worker thread.
+        :param store: The store taking the orders.
+        :param window: Seconds to collect orders for a batch, 0 settles whatever is queued.
+        :param max_batch: The most orders settled in one batch.
+        """
+        if not isinstance(window, (int, float)) or window < 0:
+            raise ValueError("The window should be a number of seconds of at least 0.")
+
+        if not isinstance(max_batch, int) or max_batch < 1:
+            raise ValueError("The batch size should be a positive int.")
+
+        self._store = store
+        self._window = window
+        self._max_batch = max_batch
+        # (order lines, future) in order of submission.
+        self._pending = deque()
+        self._condition = Condition()
+        self._closed = False
+        self._batches = 0
+        self._orders = 0
+
+        self._thread = Thread(target=self._run, name="order-queue", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    @property
+    def batches(self) -> int:
+        """ Returns the number of settled batches. """
+        return self._batches
+
+    @property
+    def orders(self) -> int:
+        """ Returns the number of settled orders. """
+        return self._orders
+
+    def _lines(self, items: dict) -> dict:
+        """ Checks an order and returns it keyed by product id. Raises a KeyError for unknown products. """
+        lines = {}
+
+        for product, quantity in items.items():
+            product_id = product.id if isinstance(product, Product) else product
+            self._store.get_product(product_id)
+
+            if not isinstance(quantity, int) or isinstance(quantity, bool):
+                raise TypeError("Please provide the quantities as int.")
+
+            if quantity < 1:
+                raise ValueError("Please provide quantities of at least 1.")
+
+            lines[product_id] = lines.get(product_id, 0) + quantity
+
+        return lines
+
+    def submit(self, items: dict) -> Future:
+        """
+        Queues an order. The order is checked right away, stock is taken when its batch is settled.
+        :param items: Maps products or product ids to quantities.
+        :return: A future resolving to the OrderResult.
+        :raises AdmissionRejected: If the admission control of the store rejects a line.
+        """
+        lines = self._lines(items)
+
+        admission = self._store.admission
+        if admission is not None:
+            for product_id in lines:
+                admission.admit(self._store.get_product(product_id))
+        future = Future()
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The order queue is closed.")
+
+            self._pending.append((lines, future))
+            if len(self._pending) == 1 or len(self._pending) >= self._max_batch:
+                self._condition.notify()
+
+        return future
+
+    def order(self, items: dict) -> OrderResult:
+        """ Queues an order and waits for its result. """
+        return self.submit(items).result()
+
+    def _next_batch(self) -> list | None:
+        """ Waits for the next batch, None once the queue is closed and drained. """
+        with self._condition:
+            while not self._pending and not self._closed:
+                self._condition.wait()
+
+            if not self._pending:
+                return None
+
+            deadline = monotonic() + self._window
+            while len(self._pending) < self._max_batch and not self._closed:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            size = min(len(self._pending), self._max_batch)
+            return [self._pending.popleft() for _ in range(size)]
+
+    def _run(self) -> None:
+        """ Settles batches until the queue is closed. """
+        while (batch := self._next_batch()) is not None:
+            # Cancelled orders are left out.
+            batch = [(lines, future) for lines, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self._store.settle_orders([lines for lines, _ in batch])
+            except Exception as error:
+                for _, future in batch:
+                    future.set_exception(error)
+                continue
+
+            self._batches += 1
+            self._orders += len(batch)
+
+            if metrics.is_enabled():
+                metrics.REGISTRY.counter("order_queue_batches_total", "Settled order batches.").inc()
+                metrics.REGISTRY.counter("order_queue_orders_total", "Orders settled in batches.").inc(len(batch))
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def close(self) -> None:
+        """ Settles the queued orders and stops the worker thread. """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+        self._thread.join()
@@ -12,8 +12,13 @@ Classes:
     LimitedProduct
 
 Functions:
+    _publish_stock_change(product, previous, quantity)
+    _tag_set(tags)
     _check_initialization(name, price, quantity, active)
 
+Stock, status, price, promotion and tag changes are published to the change-feed,
+see the changefeed module.
+
 Class Product:
     Represents a store product with attributes name, price, quantity, and active status.
 
@@ -37,6 +42,9 @@ Class Product:
         __le__(self, other):
             Compares the price with a different product instance.
 
+        id(self) -> int | None:
+            Returns the stable id assigned by the store.
+
         name(self):
             Returns the private property name.
 
@@ -49,12 +57,48 @@ Class Product:
         price(self, new_price):
             Sets the private property price.
 
+        price_cents(self) -> int:
+            Returns the price in whole cents.
+
         quantity(self) -> float:
             Returns the current stock.
 
         quantity(self, new_quantity):
             Sets the current stock.
 
+        _set_total_quantity(self, new_quantity):
+            Sets the total stock and (de)activates the product.
+
+        locations(self) -> dict[str, int]:
+            Returns the stock per location.
+
+        set_location_stock(self, location: str, quantity: int):
+            Sets the stock of a location.
+
+        _spread_over_locations(self, difference: int):
+            Applies a change of the total stock to the locations.
+
+        _take_from_locations(self, quantity: int, allocation: dict[str, int] | None):
+            Removes stock from the locations.
+
+        tags(self) -> frozenset[str]:
+            Returns the categories and "key=value" attributes of the product.
+
+        set_tags(self, tags):
+            Replaces the tags of the product.
+
+        add_tag(self, tag: str):
+            Adds a tag to the product.
+
+        remove_tag(self, tag: str):
+            Removes a tag from the product.
+
+        attributes(self) -> dict[str, str]:
+            Returns the "key=value" tags as dictionary.
+
+        set_attribute(self, key: str, value: str | None):
+            Sets or removes an attribute.
+
         promotion(self):
             Returns the private property promotion.
 
@@ -67,8 +111,8 @@ Class Product:
         deactivate(self):
             Deactivates the product for the store.
 
-        buy(self, quantity) -> float:
-            Updates the stock and returns the price of the order.
+        buy(self, quantity, allocation: dict[str, int] | None = None) -> float:
+            Updates the stock (of the allocated locations) and returns the price of the order.
 
         set_promotion(self, promotion):
             Sets a product promotion of type Promotion.
@@ -103,11 +147,23 @@ Class LimitedProduct:
         _check_and_set_maximum_value(self, maximum):
             Avoids repeated code, checks the type and value of maximum and sets it.
 
+Function _publish_stock_change:
+    Publishes a stock change of the quantity-setter to the change-feed.
+
+Function _tag_set:
+    Returns the shared frozenset of the checked tags.
+
 Function _check_initialization:
     Validates the initialization arguments for the Product class.
 """
 
-from math import inf
+import sys
+from math import inf, isinf
+from time import time
+import changefeed
+import metrics
+import money
+import tracing
 from promotion import Promotion, NoPromotion
 
 
@@ -118,25 +174,32 @@ class Product:
     """
 
     # Memory + speed optimization
-    __slots__ = ("_name", "_price", "_quantity", "_promotion", "_active")
+    __slots__ = ("_id", "_name", "_price", "_quantity", "_promotion", "_active", "_locations", "_tags")
 
     def __init__(
             self,
             name: str,
             price: int | float,
             quantity: int | float,
-            promotion: Promotion = NoPromotion("No Promotion"),
+            promotion: Promotion = NoPromotion.shared("No Promotion"),
             active=True
     ):
         """ Checks the validity of inputs and sets instance attributes. """
         # Assert correct inputs
         _check_initialization(name, price, quantity, active)
 
-        self._name = name
+        # Stable integer id, assigned when the product is first added to a store.
+        self._id = None
+        # Interned, equal names of different stores share one string.
+        self._name = sys.intern(name)
         self._price = price
         self._quantity = quantity
         self._promotion = promotion
         self._active = active
+        # Stock per location, None while the stock isn't split across locations.
+        self._locations = None
+        # Categories and "key=value" attributes, equal tag sets are shared, see _tag_set.
+        self._tags = _NO_TAGS
 
     def __str__(self):
         """ Returns a printable string of all product information. """
@@ -187,6 +250,11 @@ class Product:
 
         return self.price <= other.price
 
+    @property
+    def id(self) -> int | None:
+        """ Returns the id assigned by the store, None if the product isn't in a store. """
+        return self._id
+
     @property
     def name(self):
         """ Returns the private property name. """
@@ -201,7 +269,7 @@ class Product:
         if not isinstance(new_name, str):
             raise TypeError("Please provide a str.")
 
-        self._name = new_name
+        self._name = sys.intern(new_name)
 
     @property
     def price(self):
@@ -217,8 +285,16 @@ class Product:
         if not new_price >= 0:
             raise ValueError("Please provide a price larger than or equal to 0.")
 
+        if changefeed.FEED.active:
+            changefeed.FEED.publish(changefeed.PriceChanged(self, self._price, new_price, time()))
+
         self._price = new_price
 
+    @property
+    def price_cents(self) -> int:
+        """ Returns the price in whole cents. """
+        return money.to_cents(self._price)
+
     @property
     def quantity(self) -> float:
         """ Returns the current stock. """
@@ -233,6 +309,16 @@ class Product:
         if not new_quantity >= 0:
             raise ValueError("Please provide a quantity of at least 0.")
 
+        if self._locations:
+            self._spread_over_locations(new_quantity - self._quantity)
+
+        self._set_total_quantity(new_quantity)
+
+    def _set_total_quantity(self, new_quantity):
+        """ Sets the total stock and (de)activates the product accordingly. """
+        if changefeed.FEED.active:
+            _publish_stock_change(self, self._quantity, new_quantity)
+
         self._quantity = new_quantity
 
         if new_quantity == 0:
@@ -242,6 +328,123 @@ class Product:
         if not self.is_active():
             self.activate()
 
+    @property
+    def locations(self) -> dict[str, int]:
+        """ Returns a copy of the stock per location. Empty if the stock isn't split. """
+        return dict(self._locations) if self._locations else {}
+
+    def set_location_stock(self, location: str, quantity: int):
+        """
+        Sets the stock of a location. The total stock becomes the sum of all locations.
+        Stock set before locations were used is kept in DEFAULT_LOCATION.
+        """
+        if not isinstance(location, str) or not location:
+            raise ValueError("Please provide a location name.")
+
+        if not isinstance(quantity, int):
+            raise TypeError("Please provide the quantity as an int.")
+
+        if quantity < 0:
+            raise ValueError("Please provide a quantity of at least 0.")
+
+        if isinf(self._quantity):
+            raise ValueError(f"{self._name} has unlimited stock and can't be split across locations.")
+
+        if self._locations is None:
+            self._locations = {DEFAULT_LOCATION: self._quantity} if self._quantity else {}
+
+        previous = self._locations.get(location, 0)
+        self._locations[location] = quantity
+        self._set_total_quantity(self._quantity - previous + quantity)
+
+    def _spread_over_locations(self, difference: int):
+        """
+        Applies a change of the total stock to the locations. Added stock goes to the
+        first location, removed stock is taken from the locations in insertion order.
+        """
+        if difference > 0:
+            first = next(iter(self._locations))
+            self._locations[first] += difference
+        elif difference < 0:
+            self._take_from_locations(-difference, None)
+
+    def _take_from_locations(self, quantity: int, allocation: dict[str, int] | None):
+        """
+        Removes quantity from the locations. Validates the whole allocation before
+        changing any stock.
+        :param allocation: Location names mapped to the quantity taken from each.
+            Takes from the locations in insertion order if None.
+        """
+        locations = self._locations
+
+        if allocation is None:
+            allocation = {}
+            missing = quantity
+            for name, stock in locations.items():
+                if missing == 0:
+                    break
+                allocation[name] = min(stock, missing)
+                missing -= allocation[name]
+
+        if sum(allocation.values()) != quantity:
+            raise ValueError(f"The allocation of {self._name} doesn't add up to {quantity}.")
+
+        for name, taken in allocation.items():
+            if locations.get(name, 0) < taken:
+                raise ValueError(f"Stock of {self._name} at {name} is insufficient to take {taken}.")
+
+        for name, taken in allocation.items():
+            locations[name] -= taken
+
+    @property
+    def tags(self) -> frozenset[str]:
+        """ Returns the categories and "key=value" attributes of the product. """
+        return self._tags
+
+    def set_tags(self, tags):
+        """
+        Replaces the tags of the product.
+        :param tags: Non-empty strings, e.g. "audio" or "brand=acme".
+        """
+        tags = _tag_set(tags)
+
+        if tags != self._tags:
+            if changefeed.FEED.active:
+                changefeed.FEED.publish(changefeed.TagsChanged(self, self._tags, tags, time()))
+
+            self._tags = tags
+
+    def add_tag(self, tag: str):
+        """ Adds a tag to the product. """
+        self.set_tags(self._tags | {tag})
+
+    def remove_tag(self, tag: str):
+        """ Removes a tag from the product, missing tags are ignored. """
+        self.set_tags(self._tags - {tag})
+
+    @property
+    def attributes(self) -> dict[str, str]:
+        """ Returns the "key=value" tags as dictionary. """
+        return dict(tag.split("=", 1) for tag in self._tags if "=" in tag)
+
+    def set_attribute(self, key: str, value: str | None):
+        """
+        Sets an attribute, stored as the tag "key=value". A previous value is replaced.
+        :param value: The new value, None removes the attribute.
+        """
+        if not isinstance(key, str) or not key or "=" in key:
+            raise ValueError("Please provide an attribute key without \"=\".")
+
+        if value is not None and not isinstance(value, str):
+            raise TypeError("Please provide the attribute value as a str.")
+
+        prefix = f"{key}="
+        tags = {tag for tag in self._tags if not tag.startswith(prefix)}
+        if value is not None:
+            tags.add(prefix + value)
+
+        self.set_tags(tags)
+
     @property
     def promotion(self):
         """ Returns the private property promotion. """
@@ -253,24 +456,47 @@ class Product:
 
     def activate(self):
         """ Activates the product for the store. """
+        if changefeed.FEED.active and not self._active:
+            changefeed.FEED.publish(changefeed.Activated(self, time()))
+
         self._active = True
 
     def deactivate(self):
         """ Deactivates the product for the store. """
+        if changefeed.FEED.active and self._active:
+            changefeed.FEED.publish(changefeed.Deactivated(self, time()))
+
         self._active = False
 
-    def buy(self, quantity) -> float:
+    @tracing.traced("Product.buy")
+    @metrics.timed("product_buy_seconds", "Latency of Product.buy.")
+    def buy(self, quantity, allocation: dict[str, int] | None = None) -> float:
         """
         Updates the stock and return the price of the order.
         Throws an error if out of stock.
+        :param allocation: [Optional]: For stock split across locations, the quantity taken
+            from each location, see the allocation module. Defaults to insertion order.
         """
 
         if self._quantity >= quantity:
+            if self._locations:
+                self._take_from_locations(quantity, allocation)
+
             self._quantity -= quantity
 
+            if changefeed.FEED.active:
+                changefeed.FEED.publish(
+                    changefeed.StockDecremented(self, quantity, self._quantity, time())
+                )
+
             if self._quantity == 0:
                 self.deactivate()
 
+            if metrics.is_enabled():
+                metrics.REGISTRY.counter(
+                    "product_units_sold_total", "Units sold through Product.buy."
+                ).inc(quantity)
+
             return quantity * self._price
 
         raise ValueError(
@@ -282,6 +508,11 @@ class Product:
         if not isinstance(promotion, Promotion):
             raise TypeError("The promotion should be of type Promotion or descendant child")
 
+        if changefeed.FEED.active:
+            changefeed.FEED.publish(
+                changefeed.PromotionChanged(self, self._promotion, promotion, time())
+            )
+
         self._promotion = promotion
 
 
@@ -290,12 +521,14 @@ class NonStockedProduct(Product):
     Represents a store-product with unlimited quantity. Requires name, price and quantity.
     Will be initialized as active.
     """
+    # No extra properties, keeps the product without instance-dict.
+    __slots__ = ()
 
     def __init__(
             self,
             name: str,
             price: int | float,
-            promotion: Promotion = NoPromotion("No Promotion"),
+            promotion: Promotion = NoPromotion.shared("No Promotion"),
             active=True
     ):
         """ Calls the Base class init-function and sets quantity to infinity. """
@@ -323,14 +556,14 @@ class LimitedProduct(Product):
     Requires name, price, quantity and maximum. Will be initialized as active.
     """
     # Adds slot for extra property
-    __slots__ = "_maximum"
+    __slots__ = ("_maximum",)
 
     def __init__(
             self,
             name: str,
             price: int | float,
             maximum: int,
-            promotion: Promotion = NoPromotion("No Promotion"),
+            promotion: Promotion = NoPromotion.shared("No Promotion"),
             quantity=inf,
             active=True,
     ):
@@ -375,6 +608,48 @@ class LimitedProduct(Product):
         self._maximum = maximum
 
 
+DEFAULT_LOCATION = "default"
+
+_NO_TAGS = frozenset()
+
+# Tag set -> the shared instance, catalogs hold few distinct combinations of tags.
+_TAG_SETS = {_NO_TAGS: _NO_TAGS}
+
+
+def _tag_set(tags) -> frozenset[str]:
+    """
+    Returns the shared frozenset of the tags, checking and interning every tag.
+    """
+    if isinstance(tags, str):
+        raise TypeError("Please provide the tags as an iterable of str.")
+
+    tags = frozenset(tags)
+    shared = _TAG_SETS.get(tags)
+    if shared is not None:
+        return shared
+
+    for tag in tags:
+        if not isinstance(tag, str):
+            raise TypeError("Tags should be of type str.")
+        if not tag:
+            raise ValueError("Tags should not be empty.")
+
+    tags = frozenset(sys.intern(tag) for tag in tags)
+    return _TAG_SETS.setdefault(tags, tags)
+
+
+def _publish_stock_change(product, previous, quantity):
+    """
+    Publishes a stock change of the quantity-setter to the change-feed.
+    """
+    if quantity < previous:
+        changefeed.FEED.publish(
+            changefeed.StockDecremented(product, previous - quantity, quantity, time())
+        )
+    elif quantity > previous:
+        changefeed.FEED.publish(changefeed.Restocked(product, previous, quantity, time()))
+
+
 def _check_initialization(name, price, quantity, active):
     """
     Checks the validity of the __init__ arguments.
@@ -5,6 +5,8 @@ This module provides abstract and concrete classes for different types
 of promotions that can be applied to products in a store.
 It includes a base `Promotion` class and specific implementations for no promotion,
 percentage discount promotions, and "buy X get one free" promotions.
+Every promotion can be applied to float prices or to integer cents (see the money module),
+discounts in cents are rounded half-up per order line.
 
 Classes:
     Promotion
@@ -25,9 +27,18 @@ Class Promotion:
         name(self, new_name):
             Sets the name of the promotion.
 
+        shared(cls, name: str, *args):
+            Returns a cached (flyweight) instance of the promotion type.
+
         apply_promotion(self, price: int | float, quantity: int | float) -> int | float:
             Abstract method to apply the promotion to a given price and quantity.
 
+        apply_promotion_cents(self, price: int, quantity: int) -> int:
+            Applies the promotion to a price in cents, returns the total in cents.
+
+        apply_promotion_cents_many(self, prices: list[int], quantities: list[int]) -> list[int]:
+            Applies the promotion to many order lines in batch.
+
 Class NoPromotion:
     A concrete class for no promotion.
 
@@ -42,6 +53,9 @@ Class PromotionDiscountPercent:
         __init__(self, name: str, percent: int):
             Initializes the percentage discount promotion with a name and discount percent.
 
+        percent(self) -> int:
+            Returns the discount as whole percent.
+
         apply_promotion(self, price: int | float, quantity: int | float) -> int | float:
             Applies the percentage discount to the total price.
 
@@ -52,16 +66,46 @@ Class PromotionEveryXFree:
         __init__(self, name: str, x: int, percent=100):
             Initializes the "buy X get one free" promotion with a name, X value, and optional discount percent.
 
+        x(self) -> int:
+            Returns every how many items the discount applies.
+
+        percent(self) -> int | float:
+            Returns the discount of every x-th item as whole percent.
+
         apply_promotion(self, price: int | float, quantity: int | float) -> int | float:
             Applies the "buy X get one free" promotion to the total price.
 """
 
+import sys
 from abc import ABC, abstractmethod
 
+import money
+
+# Flyweight cache of the shared promotions, see Promotion.shared.
+_SHARED = {}
+
 
 class Promotion(ABC):
+    # Promotions are shared by many products, no instance-dict needed.
+    __slots__ = ("_name",)
+
     def __init__(self, name: str):
-        self._name = name
+        self._name = sys.intern(name)
+
+    @classmethod
+    def shared(cls, name: str, *args):
+        """
+        Returns the shared instance of this promotion type with the given arguments,
+        creating it on first use. Products of a large catalog can then reference
+        one promotion instead of each holding an equal copy.
+        """
+        key = (cls, name, args)
+        promotion = _SHARED.get(key)
+
+        if promotion is None:
+            promotion = _SHARED.setdefault(key, cls(name, *args))
+
+        return promotion
 
     @property
     def name(self):
@@ -75,19 +119,41 @@ class Promotion(ABC):
         if not isinstance(new_name, str):
             raise TypeError("Provide the new name as a string.")
 
-        self._name = new_name
+        self._name = sys.intern(new_name)
 
     @abstractmethod
     def apply_promotion(self, price: int | float, quantity: int | float) -> int | float:
         pass
 
+    def apply_promotion_cents(self, price: int, quantity: int) -> int:
+        """
+        Applies the promotion to a price in cents and returns the total in cents.
+        Falls back to the float calculation, rounded to whole cents.
+        """
+        return money.to_cents(self.apply_promotion(money.from_cents(price), quantity))
+
+    def apply_promotion_cents_many(self, prices: list[int], quantities: list[int]) -> list[int]:
+        """ Applies the promotion to many order lines, prices and totals in cents. """
+        apply = self.apply_promotion_cents
+        return [apply(price, quantity) for price, quantity in zip(prices, quantities)]
+
 
 class NoPromotion(Promotion):
+    __slots__ = ()
+
     def apply_promotion(self, price, quantity):
         return price * quantity
 
+    def apply_promotion_cents(self, price, quantity):
+        return price * quantity
+
+    def apply_promotion_cents_many(self, prices, quantities):
+        return [price * quantity for price, quantity in zip(prices, quantities)]
+
 
 class PromotionDiscountPercent(Promotion):
+    __slots__ = ("_percent", "_whole_percent", "_numerator", "_denominator")
+
     def __init__(self, name: str, percent: int):
         """
         Initializes the Discount-Percent class.
@@ -101,13 +167,34 @@ class PromotionDiscountPercent(Promotion):
         if not 0 < percent <= 100:
             raise ValueError("Please provide a percent value between 0 and 100.")
 
+        self._whole_percent = percent
         self._percent = (100 - percent) / 100
+        self._numerator, self._denominator = money.ratio(percent)
+
+    @property
+    def percent(self) -> int:
+        """ Returns the discount as whole percent, as given on initialization. """
+        return self._whole_percent
 
     def apply_promotion(self, price, quantity):
         return price * quantity * self._percent
 
+    def apply_promotion_cents(self, price, quantity):
+        """ The discount of the order line is rounded half-up to whole cents. """
+        total = price * quantity
+        return total - money.apply_ratio(total, self._numerator, self._denominator)
+
+    def apply_promotion_cents_many(self, prices, quantities):
+        numerator, denominator = 2 * self._numerator, 2 * self._denominator
+        return [
+            price * quantity - (price * quantity * numerator + self._denominator) // denominator
+            for price, quantity in zip(prices, quantities)
+        ]
+
 
 class PromotionEveryXFree(Promotion):
+    __slots__ = ("_x", "_percent", "_whole_percent", "_numerator", "_denominator")
+
     def __init__(self, name: str, x: int, percent=100):
         super().__init__(name)
 
@@ -118,10 +205,35 @@ class PromotionEveryXFree(Promotion):
             raise ValueError("Please provide a number > 1.")
 
         self._x = x
+        self._whole_percent = percent
         self._percent = percent / 100
+        self._numerator, self._denominator = money.ratio(percent)
+
+    @property
+    def x(self) -> int:
+        """ Returns every how many items the discount applies. """
+        return self._x
+
+    @property
+    def percent(self) -> int | float:
+        """ Returns the discount of every x-th item as whole percent. """
+        return self._whole_percent
 
     def apply_promotion(self, price, quantity):
         bill = quantity * price
         promotion = (quantity // self._x) * price * self._percent
 
         return bill - promotion
+
+    def apply_promotion_cents(self, price, quantity):
+        """ The discount of the order line is rounded half-up to whole cents. """
+        discounted = (quantity // self._x) * price
+        return price * quantity - money.apply_ratio(discounted, self._numerator, self._denominator)
+
+    def apply_promotion_cents_many(self, prices, quantities):
+        x = self._x
+        numerator, denominator = 2 * self._numerator, 2 * self._denominator
+        return [
+            price * quantity - ((quantity // x) * price * numerator + self._denominator) // denominator
+            for price, quantity in zip(prices, quantities)
+        ]
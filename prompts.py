@@ -21,6 +21,7 @@ Functions:
         Prompts the user for an integer input and returns the converted integer.
 """
 
+import tracing
 from dispatcher import DispatcherList
 from products import Product
 
@@ -50,6 +51,7 @@ def prompt_store_menu(dispatcher: DispatcherList) -> int:
         return choice
 
 
+@tracing.traced("prompt_order_item")
 def prompt_order_item(store) -> Product | None:
     """
     Prompts the user for the item(s) he wants to buy. Loops until an empty string is given.
@@ -63,7 +65,7 @@ def prompt_order_item(store) -> Product | None:
         # Fetch product quantity every time the user gets prompted for accurate in-stock-data.
         available_products: list[Product] = list(
             filter(
-                lambda item: (item.quantity - shopping_cart[item.name]) > 0,
+                lambda item: (item.quantity - shopping_cart[item]) > 0,
                 store.get_all_available_products_for_current_cart()
             )
         )
@@ -87,9 +89,11 @@ def prompt_order_item(store) -> Product | None:
             print(f"Select a product within 1 and {len(available_products)}")
             continue
 
-        return available_products[choice - 1]
+        # The listing holds frozen copies of a read view, the cart takes the live product.
+        return store.get_product(available_products[choice - 1].id)
 
 
+@tracing.traced("prompt_order_item_quantity")
 def prompt_order_item_quantity(product: Product) -> int | None:
     """
     Prompts the user for a quantity he wants to buy. Zero is allowed to easier compensate for
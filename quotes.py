@@ -0,0 +1,310 @@
+"""
+quotes module
+
+This module answers quote queries over the available products of a store, such as
+"what's the cheapest way to get at least N" or "the most items for a budget of B".
+Quantity-break promotions like PromotionEveryXFree make the price of a line jump at
+multiples of x, so the cheapest cart isn't found greedily. The queries are solved with a
+knapsack over quantities: the price curve of every product is built once with the exact
+cent prices of its promotion, capped by stock and LimitedProduct.maximum, and the curves
+are combined by a dynamic program over the number of units. It takes the products by their
+least price per item and keeps only the non-dominated (units, cost) states that can still
+beat a greedy cart, bounding the rest of a cart by the least price per item of the remaining
+products. Quotes over dozens of products take milliseconds.
+
+Classes:
+    Quote
+
+Class Quote:
+    A priced cart, amounts in cents.
+
+Functions:
+    line_cost(product: Product, quantity: int) -> int:
+        Returns the price of an order line in cents.
+
+    quote_each(store: Store, wanted: dict[Product, int]) -> Quote:
+        Returns the cheapest cart holding at least the wanted quantity of every product.
+
+    quote_at_least(store: Store, units: int, products=None) -> Quote:
+        Returns the cheapest cart of at least units items of any of the products.
+
+    quote_budget(store: Store, budget: int, products=None) -> Quote:
+        Returns the cart with the most items for at most budget cents.
+"""
+
+from math import inf, isinf
+from typing import NamedTuple
+
+from products import LimitedProduct, Product
+
+
+class Quote(NamedTuple):
+    """ A priced cart. items maps products to quantities, total is in cents. """
+    items: dict
+    total: int
+    units: int
+
+
+def line_cost(product: Product, quantity: int) -> int:
+    """ Returns the price of an order line in cents, promotion applied. """
+    return product.promotion.apply_promotion_cents(product.price_cents, quantity)
+
+
+def _cap(product: Product) -> int | float:
+    """ Returns the most items of the product a single cart may hold. """
+    cap = product.quantity
+    if isinstance(product, LimitedProduct):
+        cap = min(cap, product.maximum)
+    return cap
+
+
+def _candidates(store, products) -> list[Product]:
+    """ Returns the live available products of the store, restricted to products if given. """
+    available = [store.get_product(product.id) for product in store.get_all_available_products()]
+    if products is None:
+        return available
+
+    wanted = {id(product) for product in products}
+    return [product for product in available if id(product) in wanted]
+
+
+def _curve(product: Product, limit: int, budget: int | float = inf) -> list[tuple[int, int]]:
+    """
+    Returns the non-dominated (quantity, cost) pairs of a product up to limit items.
+    A quantity is dominated if a larger one doesn't cost more, e.g. the x-1st item of
+    "x for the price of x-1".
+    :param budget: Quantities costing more than budget are left out.
+    """
+    limit = min(_cap(product), limit)
+    costs = []
+    for quantity in range(int(limit) + 1):
+        cost = line_cost(product, quantity)
+        if cost > budget:
+            break
+        costs.append(cost)
+
+    curve = []
+    cheapest = inf
+    for quantity in range(len(costs) - 1, -1, -1):
+        if costs[quantity] < cheapest:
+            cheapest = costs[quantity]
+            curve.append((quantity, cheapest))
+
+    return curve[::-1]
+
+
+def _rate(curve: list) -> float:
+    """ Returns the least price per item of a curve, inf if it holds no items. """
+    return min((cost / quantity for quantity, cost in curve if quantity), default=inf)
+
+
+def _plan(curves: list) -> tuple[list, list, list]:
+    """
+    Orders the curves by their least price per item.
+    :return: The order of the curve indices, the least price per item of the curves after
+        every position and the most items they hold together.
+    """
+    order = sorted(range(len(curves)), key=lambda idx: _rate(curves[idx]))
+    rates = [_rate(curves[idx]) for idx in order[1:]] + [inf]
+    left = [0] * len(order)
+    for position in range(len(order) - 2, -1, -1):
+        left[position] = left[position + 1] + curves[order[position + 1]][-1][0]
+
+    return order, rates, left
+
+
+def _dominance(states: dict) -> dict:
+    """
+    Drops the dominated states of a layer, a state is dominated if another one holds at least
+    as many items for at most the same cost.
+    :param states: Maps the items of a state to (cost, items of the previous state, quantity).
+    """
+    kept = {}
+    cheapest = inf
+    for units in sorted(states, reverse=True):
+        entry = states[units]
+        if entry[0] < cheapest:
+            cheapest = entry[0]
+            kept[units] = entry
+
+    return kept
+
+
+def _backtrack(layers: list, order: list, units: int) -> dict:
+    """ Recovers the quantity of every curve leading to the state holding units in the last layer. """
+    quantities = {}
+    for position in range(len(layers) - 1, 0, -1):
+        _, units, quantity = layers[position][units]
+        if quantity:
+            quantities[order[position - 1]] = quantity
+
+    return quantities
+
+
+def _cheapest_at_least(curves: list, units: int) -> dict:
+    """
+    Returns the quantity per curve index of the cheapest combination of at least units items.
+    States only keep the items up to units. A greedy combination gives the first upper bound
+    of the cost, states whose cost plus the missing items at the least price of the remaining
+    curves exceeds it are dropped.
+    """
+    order, rates, left = _plan(curves)
+
+    # Greedy: fill up with the curves by price per item.
+    bound, spent, missing = inf, 0, units
+    for idx in order:
+        curve = curves[idx]
+        finish = min((cost for quantity, cost in curve if quantity >= missing), default=inf)
+        bound = min(bound, spent + finish)
+        spent += curve[-1][1]
+        missing -= curve[-1][0]
+
+    layers = [{0: (0, None, 0)}]
+    for position, idx in enumerate(order):
+        rate, rest = rates[position], left[position]
+        states = {}
+
+        for have, (cost, _, _) in layers[-1].items():
+            for quantity, price in curves[idx]:
+                total = cost + price
+                reached = min(have + quantity, units)
+                missing = units - reached
+
+                if missing > rest or (missing and total + missing * rate > bound):
+                    continue
+                if not missing and total < bound:
+                    bound = total
+
+                entry = states.get(reached)
+                if entry is None or total < entry[0]:
+                    states[reached] = (total, have, quantity)
+
+        layers.append(_dominance(states))
+
+    return _backtrack(layers, order, units)
+
+
+def _most_items(curves: list, budget: int) -> dict:
+    """
+    Returns the quantity per curve index of the combination with the most items for at most
+    budget, the cheapest of those. States that can't reach the most items found so far, even
+    buying the rest at the least price per item of the remaining curves, are dropped.
+    """
+    order, rates, left = _plan(curves)
+
+    # Greedy: the most items of every curve by price per item the rest of the budget buys.
+    most, spent = 0, 0
+    for idx in order:
+        quantity, cost = max(
+            (quantity, cost) for quantity, cost in curves[idx] if spent + cost <= budget
+        )
+        most += quantity
+        spent += cost
+
+    layers = [{0: (0, None, 0)}]
+    for position, idx in enumerate(order):
+        rate, rest = rates[position], left[position]
+        states = {}
+
+        for have, (cost, _, _) in layers[-1].items():
+            for quantity, price in curves[idx]:
+                total = cost + price
+                if total > budget:
+                    break
+
+                reached = have + quantity
+                # A small margin keeps the bound from rounding below the exact quotient.
+                more = rest if rate == 0 else 0 if isinf(rate) else int((budget - total) / rate + 1e-6)
+                if reached + min(more, rest) < most:
+                    continue
+                most = max(most, reached)
+
+                entry = states.get(reached)
+                if entry is None or total < entry[0]:
+                    states[reached] = (total, have, quantity)
+
+        layers.append(_dominance(states))
+
+    return _backtrack(layers, order, max(layers[-1]))
+
+
+def _quote(items: dict) -> Quote:
+    """ Prices a cart. """
+    return Quote(
+        items=items,
+        total=sum(line_cost(product, quantity) for product, quantity in items.items()),
+        units=sum(items.values())
+    )
+
+
+def quote_each(store, wanted: dict) -> Quote:
+    """
+    Returns the cheapest cart holding at least the wanted quantity of every product.
+    Buying a few more items can be cheaper at the price cliffs of a promotion.
+    :param wanted: Maps products to the least quantity wanted.
+    :raises ValueError: If a product isn't available in the wanted quantity.
+    """
+    available = {id(product) for product in _candidates(store, None)}
+    items = {}
+
+    for product, at_least in wanted.items():
+        if id(product) not in available or _cap(product) < at_least:
+            raise ValueError(f"{product.name} is not available in a quantity of {at_least}.")
+
+        horizon = getattr(product.promotion, "x", 1)
+        curve = _curve(product, at_least + horizon - 1)
+        quantity, _ = min(
+            ((quantity, cost) for quantity, cost in curve if quantity >= at_least),
+            key=lambda pair: pair[1]
+        )
+        items[product] = quantity
+
+    return _quote(items)
+
+
+def quote_at_least(store, units: int, products=None) -> Quote:
+    """
+    Returns the cheapest cart of at least units items, mixing any of the products.
+    :param units: The least number of items.
+    :param products: [Optional]: The interchangeable products, all available products by default.
+    :raises ValueError: If the products don't have enough stock.
+    """
+    if not isinstance(units, int) or units < 1:
+        raise ValueError("The number of units should be a positive int.")
+
+    candidates = _candidates(store, products)
+    if sum(_cap(product) for product in candidates) < units:
+        raise ValueError(f"The products don't have {units} items in stock.")
+
+    # More than units + x - 1 items of one product is never cheaper, a whole promotion
+    # bundle could be left out.
+    curves = [
+        _curve(product, units + getattr(product.promotion, "x", 1) - 1)
+        for product in candidates
+    ]
+    quantities = _cheapest_at_least(curves, units)
+
+    return _quote({candidates[idx]: quantity for idx, quantity in sorted(quantities.items())})
+
+
+def quote_budget(store, budget: int, products=None) -> Quote:
+    """
+    Returns the cart with the most items for at most budget, the cheapest of those if
+    several carts hold as many items.
+    :param budget: The budget in cents.
+    :param products: [Optional]: The products to choose from, all available products by default.
+    :raises ValueError: If free products with unlimited stock make the cart unbounded.
+    """
+    if not isinstance(budget, int) or budget < 0:
+        raise ValueError("The budget should be a positive int of cents.")
+
+    candidates = _candidates(store, products)
+    for product in candidates:
+        if isinf(_cap(product)) and product.price_cents == 0:
+            raise ValueError(f"{product.name} is free and unlimited, the cart is unbounded.")
+
+    # Without a cap every unit costs at least one cent.
+    curves = [_curve(product, budget, budget) for product in candidates]
+    quantities = _most_items(curves, budget)
+
+    return _quote({candidates[idx]: quantity for idx, quantity in sorted(quantities.items())})
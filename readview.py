@@ -0,0 +1,154 @@
+"""
+readview module
+
+This module provides versioned, immutable read views of a store's catalog. A view holds
+frozen copies of the products, split into fixed-size chunks. The store publishes a new view
+after every committed mutation batch, copying only the chunks of the changed products and
+sharing all others with the previous version. Readers take the current view with a single
+attribute read and never block writers. Old versions are reclaimed by the garbage collector
+once no reader references them.
+
+Classes:
+    CatalogView
+
+Class CatalogView:
+    An immutable version of the catalog.
+
+    Methods:
+        build(cls, products, version: int = 0) -> CatalogView:
+            Creates a view of frozen copies of the products.
+
+        replaced(self, entries: dict[int, Product], size: int) -> CatalogView:
+            Returns the next version with the frozen products at the given positions replaced.
+
+        version(self) -> int:
+            Returns the version number, incremented with every publication.
+
+        __len__(self) -> int:
+            Returns the number of products.
+
+        __iter__(self):
+            Iterates over the frozen products in catalog order.
+
+        get_all_products(self) -> list[Product]:
+            Returns all frozen products.
+
+        get_all_active_products(self) -> list[Product]:
+            Returns the active frozen products.
+
+        get_all_available_products(self) -> list[Product]:
+            Returns the frozen products in stock.
+
+Functions:
+    freeze(product: Product) -> Product:
+        Returns a private copy of the product for a view.
+"""
+
+import copy
+from collections import defaultdict
+from itertools import chain
+
+# Products per chunk, a publication copies the chunks of the changed products only.
+CHUNK_SIZE = 1024
+
+
+def freeze(product):
+    """
+    Returns a private copy of the product for a view. The copy keeps the id, so it can be
+    added to a shopping-cart, and is never changed after it is published.
+    """
+    frozen = copy.copy(product)
+    if product.locations:
+        frozen._locations = product.locations
+
+    return frozen
+
+
+class CatalogView:
+    """
+    An immutable version of the catalog. Don't change the products of a view,
+    look up the live product with Store.get_product(product.id) to change it.
+    """
+
+    __slots__ = ("_version", "_chunks", "_size", "__weakref__")
+
+    def __init__(self, version: int, chunks: tuple, size: int):
+        """ Use CatalogView.build or Store.read_view to create views. """
+        self._version = version
+        self._chunks = chunks
+        self._size = size
+
+    @classmethod
+    def build(cls, products, version: int = 0, frozen: bool = False):
+        """
+        Creates a view of the products.
+        :param products: The products in catalog order.
+        :param version: The version number of the view.
+        :param frozen: Whether the products are already frozen copies.
+        """
+        entries = list(products) if frozen else [freeze(product) for product in products]
+        chunks = tuple(
+            tuple(entries[start:start + CHUNK_SIZE])
+            for start in range(0, len(entries), CHUNK_SIZE)
+        )
+        return cls(version, chunks, len(entries))
+
+    def replaced(self, entries: dict, size: int):
+        """
+        Returns the next version. Chunks without changes are shared with this version.
+        :param entries: Maps catalog positions to frozen products. Positions from len(self)
+            on append to the catalog and must be contiguous.
+        :param size: The number of products of the new version.
+        """
+        chunks = list(self._chunks)
+        by_chunk = defaultdict(dict)
+        for position, entry in entries.items():
+            by_chunk[position // CHUNK_SIZE][position % CHUNK_SIZE] = entry
+
+        for number in sorted(by_chunk):
+            chunk = list(chunks[number]) if number < len(chunks) else []
+
+            for offset, entry in sorted(by_chunk[number].items()):
+                if offset < len(chunk):
+                    chunk[offset] = entry
+                else:
+                    chunk.append(entry)
+
+            if number < len(chunks):
+                chunks[number] = tuple(chunk)
+            else:
+                chunks.append(tuple(chunk))
+
+        return CatalogView(self._version + 1, tuple(chunks), size)
+
+    @property
+    def version(self) -> int:
+        """ Returns the version number, incremented with every publication. """
+        return self._version
+
+    def __len__(self) -> int:
+        """ Returns the number of products. """
+        return self._size
+
+    def __iter__(self):
+        """ Iterates over the frozen products in catalog order. """
+        return chain.from_iterable(self._chunks)
+
+    def __getitem__(self, position: int):
+        """ Returns the frozen product at a catalog position. """
+        if not 0 <= position < self._size:
+            raise IndexError("Catalog position out of range.")
+
+        return self._chunks[position // CHUNK_SIZE][position % CHUNK_SIZE]
+
+    def get_all_products(self) -> list:
+        """ Returns all frozen products. """
+        return list(self)
+
+    def get_all_active_products(self) -> list:
+        """ Returns the active frozen products. """
+        return [product for product in self if product.is_active()]
+
+    def get_all_available_products(self) -> list:
+        """ Returns the active frozen products in stock. """
+        return [product for product in self if product.is_active() and product.quantity > 0]
@@ -0,0 +1,192 @@
+"""
+repricing module
+
+This module changes the prices and promotions of many products in one operation, e.g. a
+markdown of a category or a supplier's price list. Changes are given as mappings of product
+ids or names, or as a rule computing the new price of a product. The whole operation is
+validated before any product is changed and then applied chunk by chunk. Every chunk is one
+store batch, so the read view is published and the catalog index updated once per chunk
+instead of once per product. Carts hold quantities only and are priced at checkout, they
+pick up the new prices without being touched. Rules can be evaluated on worker processes.
+
+Classes:
+    PercentChange
+
+Class PercentChange:
+    A picklable pricing rule changing prices by a percentage.
+
+    Methods:
+        __init__(self, percent: int | float, tags=()):
+            Checks and stores the change and the tags a product needs to be repriced.
+
+        __call__(self, product: Product) -> int | float | None:
+            Returns the new price of a product, None to keep its price.
+
+Functions:
+    reprice(store: Store, prices: dict | None = None, promotions: dict | None = None, rule=None,
+            chunk_size: int = 10000, processes: int | None = None) -> int:
+        Changes the prices and promotions of many products, returns the number of changed products.
+"""
+
+from itertools import chain
+
+import money
+import tracing
+from products import Product
+from promotion import Promotion
+
+
+class PercentChange:
+    """
+    A pricing rule changing prices by a percentage, rounded half-up to whole cents.
+    Int prices stay ints while the new price is a whole amount.
+    Module-level classes are picklable, so the rule can run on worker processes.
+    """
+
+    __slots__ = ("_numerator", "_denominator", "_tags")
+
+    def __init__(self, percent: int | float, tags=()):
+        """
+        Checks and stores the change.
+        :param percent: The change in percent, e.g. -20 for a 20% markdown.
+        :param tags: [Optional]: Only products with all of these tags are repriced.
+        """
+        if not isinstance(percent, (int, float)) or not percent >= -100:
+            raise ValueError("The percentage should be a number of at least -100.")
+
+        self._numerator, self._denominator = money.ratio(100 + percent)
+        self._tags = frozenset(tags)
+
+    def __call__(self, product: Product) -> int | float | None:
+        """ Returns the new price of a product, None if it lacks a tag of the rule. """
+        if not self._tags <= product.tags:
+            return None
+
+        cents = money.apply_ratio(product.price_cents, self._numerator, self._denominator)
+        if isinstance(product.price, int) and not cents % 100:
+            return cents // 100
+
+        return money.from_cents(cents)
+
+
+def _resolve(store, mapping: dict) -> dict:
+    """
+    Maps the products of the store to the values of a mapping keyed by product, id or name.
+    :raises KeyError: Naming all keys that aren't products of the store.
+    """
+    by_name = None
+    resolved = {}
+    missing = []
+
+    for key, value in mapping.items():
+        product = None
+
+        if isinstance(key, (Product, int)):
+            try:
+                product = store.get_product(key.id if isinstance(key, Product) else key)
+            except KeyError:
+                pass
+            if isinstance(key, Product) and product is not key:
+                product = None
+        else:
+            if by_name is None:
+                by_name = {product.name: product for product in store.products}
+            product = by_name.get(key)
+
+        if product is None:
+            missing.append(str(key))
+        else:
+            resolved[product] = value
+
+    if missing:
+        raise KeyError(f"Products not in the store: {', '.join(missing)}")
+
+    return resolved
+
+
+def _evaluate(rule, products: list) -> list:
+    """ Returns the rule's price of every product, runs on the worker processes. """
+    return [rule(product) for product in products]
+
+
+def _rule_prices(store, rule, chunk_size: int, processes: int | None) -> dict:
+    """ Evaluates a pricing rule over the catalog, chunks are spread over processes if given. """
+    products = list(store.products)
+
+    if processes and processes > 1 and len(products) > chunk_size:
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunks = [products[start:start + chunk_size] for start in range(0, len(products), chunk_size)]
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            prices = list(chain.from_iterable(pool.map(_evaluate, [rule] * len(chunks), chunks)))
+    else:
+        prices = _evaluate(rule, products)
+
+    return {product: price for product, price in zip(products, prices) if price is not None}
+
+
+def reprice(store, prices: dict | None = None, promotions: dict | None = None, rule=None,
+            chunk_size: int = 10000, processes: int | None = None) -> int:
+    """
+    Changes the prices and promotions of many products. All changes are validated before
+    any product is changed.
+    :param store: The store to reprice.
+    :param prices: [Optional]: Maps products, product ids or names to their new price.
+        Takes precedence over the rule.
+    :param promotions: [Optional]: Maps products, product ids or names to their new promotion.
+    :param rule: [Optional]: A callable returning the new price of a product, or None to keep it.
+        Needs to be picklable to run on worker processes, e.g. a PercentChange.
+    :param chunk_size: The number of products changed per store batch. Readers see every chunk
+        applied as a whole, writers like checkouts can run between chunks.
+    :param processes: [Optional]: Evaluate the rule on this many worker processes.
+    :return: The number of changed products.
+    :raises KeyError: If a product isn't in the store.
+    :raises ValueError: If a price isn't a number of at least 0.
+    :raises TypeError: If a promotion isn't a Promotion.
+    """
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        raise ValueError("The chunk size should be a positive int.")
+
+    new_prices = _rule_prices(store, rule, chunk_size, processes) if rule is not None else {}
+    new_prices.update(_resolve(store, prices or {}))
+    new_promotions = _resolve(store, promotions or {})
+
+    invalid = [
+        product.name for product, price in new_prices.items()
+        if isinstance(price, bool) or not isinstance(price, (int, float)) or not price >= 0
+    ]
+    if invalid:
+        raise ValueError(f"The prices should be numbers of at least 0: {', '.join(invalid)}")
+
+    invalid = [
+        product.name for product, promotion in new_promotions.items()
+        if not isinstance(promotion, Promotion)
+    ]
+    if invalid:
+        raise TypeError(f"The promotions should be of type Promotion: {', '.join(invalid)}")
+
+    changes = {}
+    for product, price in new_prices.items():
+        if price != product.price:
+            changes[product] = (price, None)
+    for product, promotion in new_promotions.items():
+        if promotion is not product.promotion:
+            changes[product] = (changes.get(product, (None, None))[0], promotion)
+
+    changed = list(changes.items())
+
+    for start in range(0, len(changed), chunk_size):
+        chunk = changed[start:start + chunk_size]
+
+        with tracing.span("reprice_chunk", products=len(chunk)), store.batch():
+            # Validated above, the setters can't fail halfway through a chunk.
+            for product, (price, promotion) in chunk:
+                if price is not None:
+                    product.price = price
+
+                if promotion is not None:
+                    product.set_promotion(promotion)
+
+            store.touch(*(product for product, _ in chunk))
+
+    return len(changed)
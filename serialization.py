@@ -0,0 +1,265 @@
+"""
+serialization module
+
+This module converts products and promotions to plain dictionaries and back, and reads and
+writes product catalogs as JSON, JSON-lines or CSV. JSON-lines and CSV are read and written
+one product at a time, so large catalogs are streamed.
+
+Functions:
+    promotion_to_dict(promotion: Promotion) -> dict:
+        Returns the promotion as dictionary.
+
+    promotion_from_dict(data: dict | None) -> Promotion:
+        Returns the shared promotion described by the dictionary.
+
+    product_to_dict(product: Product) -> dict:
+        Returns the product as dictionary.
+
+    product_from_dict(data: dict) -> Product:
+        Creates a product from a dictionary.
+
+    detect_format(path: str) -> str:
+        Returns "json", "jsonl" or "csv" depending on the file extension.
+
+    read_products(path: str, file_format: str | None = None):
+        Yields the products of a catalog file.
+
+    write_products(products, stream, file_format: str = "jsonl") -> None:
+        Writes products to an open text stream.
+
+    save_products(products, path: str, file_format: str | None = None) -> None:
+        Replaces a catalog file atomically.
+"""
+
+import csv
+import json
+import os
+import sys
+from math import inf, isinf
+
+from products import Product, NonStockedProduct, LimitedProduct
+from promotion import Promotion, NoPromotion, PromotionDiscountPercent, PromotionEveryXFree
+
+FORMATS = ("json", "jsonl", "csv")
+
+CSV_FIELDS = (
+    "type", "name", "price", "quantity", "maximum", "active",
+    "promotion_type", "promotion_name", "promotion_percent", "promotion_x",
+)
+
+PROMOTION_TYPES = {
+    "no_promotion": NoPromotion,
+    "discount_percent": PromotionDiscountPercent,
+    "every_x_free": PromotionEveryXFree,
+}
+
+
+def promotion_to_dict(promotion: Promotion) -> dict:
+    """ Returns the promotion as dictionary, e.g. {"type": "discount_percent", "name": ..., "percent": 20}. """
+    if isinstance(promotion, PromotionEveryXFree):
+        return {"type": "every_x_free", "name": promotion.name, "x": promotion.x, "percent": promotion.percent}
+
+    if isinstance(promotion, PromotionDiscountPercent):
+        return {"type": "discount_percent", "name": promotion.name, "percent": promotion.percent}
+
+    if isinstance(promotion, NoPromotion):
+        return {"type": "no_promotion", "name": promotion.name}
+
+    raise TypeError(f"Promotions of type {type(promotion).__name__} can't be serialized.")
+
+
+def promotion_from_dict(data: dict | None) -> Promotion:
+    """ Returns the shared (flyweight) promotion described by the dictionary. """
+    if not data or not data.get("type"):
+        return NoPromotion.shared("No Promotion")
+
+    if data["type"] not in PROMOTION_TYPES:
+        raise ValueError(f"Unknown promotion type {data['type']}.")
+
+    if data["type"] == "every_x_free":
+        return PromotionEveryXFree.shared(data["name"], int(data["x"]), _number(data.get("percent", 100)))
+
+    if data["type"] == "discount_percent":
+        return PromotionDiscountPercent.shared(data["name"], int(data["percent"]))
+
+    return NoPromotion.shared(data["name"])
+
+
+def product_to_dict(product: Product) -> dict:
+    """ Returns the product as dictionary. Unlimited stock is stored as None. """
+    data = {
+        "type": "product",
+        "name": product.name,
+        "price": product.price,
+        "quantity": None if isinf(product.quantity) else product.quantity,
+        "active": product.is_active(),
+        "promotion": promotion_to_dict(product.promotion),
+    }
+
+    if isinstance(product, NonStockedProduct):
+        data["type"] = "non_stocked"
+    elif isinstance(product, LimitedProduct):
+        data["type"] = "limited"
+        data["maximum"] = product.maximum
+
+    if product.locations:
+        data["locations"] = product.locations
+
+    if product.tags:
+        data["tags"] = sorted(product.tags)
+
+    return data
+
+
+def product_from_dict(data: dict) -> Product:
+    """ Creates a product from a dictionary written by product_to_dict. """
+    kind = data.get("type") or "product"
+    promotion = promotion_from_dict(data.get("promotion"))
+    price = _number(data["price"])
+    quantity = inf if data.get("quantity") in (None, "") else _number(data["quantity"])
+    locations = data.get("locations") or {}
+    if locations:
+        # The total stock is the sum of the locations, it's added location by location below.
+        quantity = 0
+    active = data.get("active", True)
+    if isinstance(active, str):
+        active = active.lower() in ("true", "1", "yes")
+
+    if kind == "non_stocked":
+        product = NonStockedProduct(data["name"], price=price, promotion=promotion, active=active)
+    elif kind == "limited":
+        product = LimitedProduct(
+            data["name"], price=price, maximum=int(data["maximum"]),
+            promotion=promotion, quantity=quantity, active=active
+        )
+    elif kind == "product":
+        product = Product(data["name"], price=price, quantity=quantity, promotion=promotion, active=active)
+    else:
+        raise ValueError(f"Unknown product type {kind}.")
+
+    for location, stock in locations.items():
+        product.set_location_stock(location, int(stock))
+
+    if locations and not active:
+        # Setting stock activates the product.
+        product.deactivate()
+
+    if data.get("tags"):
+        product.set_tags(data["tags"])
+
+    return product
+
+
+def _number(value) -> int | float:
+    """ Converts CSV strings to int if possible, float otherwise. """
+    if isinstance(value, (int, float)):
+        return value
+
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def _to_csv_row(product: Product) -> dict:
+    """ Flattens a product for the CSV format. Locations and tags are not part of the CSV format. """
+    data = product_to_dict(product)
+    promotion = data.pop("promotion")
+    data.pop("locations", None)
+    data.pop("tags", None)
+
+    return {
+        **data,
+        "promotion_type": promotion["type"],
+        "promotion_name": promotion["name"],
+        "promotion_percent": promotion.get("percent", ""),
+        "promotion_x": promotion.get("x", ""),
+    }
+
+
+def _from_csv_row(row: dict) -> Product:
+    """ Creates a product from a flat CSV row. """
+    promotion = None
+    if row.get("promotion_type"):
+        promotion = {
+            "type": row["promotion_type"],
+            "name": row["promotion_name"],
+            "percent": row.get("promotion_percent") or 100,
+            "x": row.get("promotion_x") or 0,
+        }
+
+    return product_from_dict({**row, "promotion": promotion})
+
+
+def detect_format(path: str) -> str:
+    """ Returns the catalog format of a file by its extension. """
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    if extension == "ndjson":
+        return "jsonl"
+
+    if extension not in FORMATS:
+        raise ValueError(f"Unknown catalog format of {path}, use one of {', '.join(FORMATS)}.")
+
+    return extension
+
+
+def read_products(path: str, file_format: str | None = None):
+    """
+    Yields the products of a catalog file. JSON-lines and CSV are streamed.
+    :param path: The catalog file, "-" reads JSON-lines from stdin.
+    :param file_format: [Optional]: Overrides the format detected from the extension.
+    """
+    if path == "-":
+        file_format = file_format or "jsonl"
+        yield from _read_stream(sys.stdin, file_format)
+        return
+
+    with open(path, encoding="utf-8", newline="") as stream:
+        yield from _read_stream(stream, file_format or detect_format(path))
+
+
+def _read_stream(stream, file_format: str):
+    """ Yields the products of an open text stream. """
+    if file_format == "json":
+        for data in json.load(stream):
+            yield product_from_dict(data)
+    elif file_format == "jsonl":
+        for line in stream:
+            if line.strip():
+                yield product_from_dict(json.loads(line))
+    elif file_format == "csv":
+        for row in csv.DictReader(stream):
+            yield _from_csv_row(row)
+    else:
+        raise ValueError(f"Unknown catalog format {file_format}.")
+
+
+def write_products(products, stream, file_format: str = "jsonl") -> None:
+    """
+    Writes products to an open text stream.
+    :param products: Any iterable of products, consumed one at a time.
+    :param stream: The text stream to write to.
+    :param file_format: "json", "jsonl" or "csv".
+    """
+    if file_format == "json":
+        json.dump([product_to_dict(product) for product in products], stream, indent=2)
+        stream.write("\n")
+    elif file_format == "jsonl":
+        for product in products:
+            stream.write(json.dumps(product_to_dict(product)) + "\n")
+    elif file_format == "csv":
+        writer = csv.DictWriter(stream, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for product in products:
+            writer.writerow(_to_csv_row(product))
+    else:
+        raise ValueError(f"Unknown catalog format {file_format}.")
+
+
+def save_products(products, path: str, file_format: str | None = None) -> None:
+    """ Writes products to path, replacing the file atomically. """
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8", newline="") as stream:
+        write_products(products, stream, file_format or detect_format(path))
+
+    os.replace(temporary, path)
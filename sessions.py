@@ -0,0 +1,365 @@
+"""
+sessions module
+
+This module persists shopping carts across clears and restarts. Carts are encoded in a
+compact binary format: a version byte, the number of lines and per line the difference to
+the previous product id and the quantity, all as variable-length ints. A cart of a few
+lines takes a few bytes, e.g. 8 bytes for three lines, against 21 for its str.
+
+A SessionStore keeps one row per session in a sqlite database. A cart handed out by the
+session store saves itself on every change, e.g. on add_item or clear, as one row upsert,
+and writes are committed every commit_every changes or on flush and close. Opening a
+session store reads no carts, each cart is loaded on its first access, so a database of
+hundreds of thousands of sessions opens instantly and only the carts in use take memory.
+
+Product ids are local to a process, so the session database keeps its own product keys,
+each mapped to a product name in the products table. Carts are stored by these keys and
+restored to the products of the store with the same names, in any process and whatever the
+order the catalog is loaded in. Lines of products the store doesn't have are dropped on
+restore. Without a store the keys aren't mapped, carts hold the stored product keys. The
+products of the store are mapped by name once, on the first restore, and the session store
+watches the store for added and removed products, so restoring a cart doesn't scan the catalog.
+
+Classes:
+    SessionStore
+
+Class SessionStore:
+    Persists the shopping carts of sessions in a sqlite database.
+
+    Methods:
+        __init__(self, path: str, store: Store | None = None, commit_every: int = 100):
+            Opens or creates the session database.
+
+        __len__(self) -> int:
+            Returns the number of stored sessions.
+
+        __contains__(self, session: str) -> bool:
+            Checks if a session has a stored cart.
+
+        sessions(self) -> list[str]:
+            Returns the ids of the stored sessions.
+
+        cart(self, session: str) -> ShoppingCart:
+            Returns the cart of a session, loaded on first access and saved on every change.
+
+        save(self, session: str, cart: ShoppingCart) -> None:
+            Stores the cart of a session.
+
+        delete(self, session: str) -> None:
+            Drops the cart of a session.
+
+        flush(self) -> None:
+            Commits the pending writes.
+
+        close(self) -> None:
+            Commits the pending writes, stops watching the store and closes the database.
+
+Functions:
+    encode_cart(cart: dict[int, int | float]) -> bytes:
+        Encodes a cart mapping product keys to quantities.
+
+    decode_cart(data: bytes) -> dict[int, int | float]:
+        Decodes an encoded cart.
+"""
+
+import sqlite3
+from functools import partial
+from struct import Struct, error as StructError
+from threading import RLock
+from weakref import WeakValueDictionary
+
+from shoppingcart import ShoppingCart
+from varint import read_varint, unzigzag, write_varint, zigzag
+
+FORMAT_VERSION = 1
+
+# Quantities that aren't ints are stored as marker followed by a double.
+_FLOAT_MARKER = 1
+_DOUBLE = Struct("<d")
+
+
+def encode_cart(cart: dict) -> bytes:
+    """
+    Encodes a cart, keeping the order of its lines.
+    :param cart: Product keys mapped to quantities, e.g. ShoppingCart.cart.
+    :return: The encoded cart.
+    """
+    buffer = bytearray((FORMAT_VERSION,))
+    write_varint(buffer, len(cart))
+
+    previous = 0
+    for product_id, quantity in cart.items():
+        if not isinstance(product_id, int):
+            raise TypeError("The cart should be keyed by int product keys.")
+
+        write_varint(buffer, zigzag(product_id - previous))
+        previous = product_id
+
+        if isinstance(quantity, float) and quantity.is_integer():
+            quantity = int(quantity)
+
+        if isinstance(quantity, int):
+            # Even values are ints, the lowest bit is left for the float marker.
+            write_varint(buffer, zigzag(quantity) << 1)
+        elif isinstance(quantity, float):
+            write_varint(buffer, _FLOAT_MARKER)
+            buffer += _DOUBLE.pack(quantity)
+        else:
+            raise TypeError("The quantities should be numbers.")
+
+    return bytes(buffer)
+
+
+def decode_cart(data: bytes) -> dict:
+    """
+    Decodes a cart encoded by encode_cart.
+    :param data: The encoded cart.
+    :return: Product keys mapped to quantities.
+    :raises ValueError: If the data isn't an encoded cart.
+    """
+    if not data or data[0] != FORMAT_VERSION:
+        raise ValueError("Unknown cart format.")
+
+    try:
+        size, offset = read_varint(data, 1)
+        cart = {}
+        product_id = 0
+
+        for _ in range(size):
+            delta, offset = read_varint(data, offset)
+            product_id += unzigzag(delta)
+
+            value, offset = read_varint(data, offset)
+            if value == _FLOAT_MARKER:
+                cart[product_id] = _DOUBLE.unpack_from(data, offset)[0]
+                offset += _DOUBLE.size
+            else:
+                cart[product_id] = unzigzag(value >> 1)
+    except (IndexError, StructError) as error:
+        raise ValueError("Truncated cart data.") from error
+
+    if offset != len(data):
+        raise ValueError("Trailing bytes after the cart data.")
+
+    return cart
+
+
+class SessionStore:
+    """
+    Persists the carts of sessions in a sqlite database, one row per session.
+    Carts are loaded on first access and saved on every change. Safe to use from many threads.
+    """
+
+    __slots__ = (
+        "_connection", "_store", "_products", "_commit_every", "_pending", "_carts", "_keys", "_names", "_lock"
+    )
+
+    def __init__(self, path: str, store=None, commit_every: int = 100):
+        """
+        Opens or creates the session database.
+        :param path: The database file, ":memory:" keeps the sessions in memory.
+        :param store: [Optional]: The store of the products, carts are stored by product name
+            and lines of other products are dropped when a cart is loaded.
+        :param commit_every: The number of changes committed together. Changes since the last
+            commit are lost if the process crashes, flush or close commit them.
+        """
+        if not isinstance(commit_every, int) or commit_every < 1:
+            raise ValueError("commit_every should be a positive int.")
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS carts (session TEXT PRIMARY KEY, data BLOB NOT NULL) WITHOUT ROWID"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS products (key INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)"
+        )
+        self._connection.commit()
+
+        self._store = store
+        self._products = _ProductNames(store) if store is not None else None
+        self._commit_every = commit_every
+        self._pending = 0
+        # Loaded carts, dropped once no one holds them. Every change is saved, a dropped
+        # cart is loaded again on its next access.
+        self._carts = WeakValueDictionary()
+        # Product names mapped to their stored keys and back, read on first use.
+        self._keys = None
+        self._names = None
+        self._lock = RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def __len__(self) -> int:
+        """ Returns the number of stored sessions, sessions with empty carts aren't stored. """
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM carts").fetchone()[0]
+
+    def __contains__(self, session: str) -> bool:
+        """ Checks if a session has a stored cart. """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT 1 FROM carts WHERE session = ?", (session,)
+            ).fetchone() is not None
+
+    def sessions(self) -> list[str]:
+        """ Returns the ids of the stored sessions. """
+        with self._lock:
+            return [row[0] for row in self._connection.execute("SELECT session FROM carts")]
+
+    def _read_keys(self) -> None:
+        """ Reads the stored product keys once, the table grows with the catalog, not the sessions. """
+        if self._keys is None:
+            self._keys = dict(self._connection.execute("SELECT name, key FROM products"))
+            self._names = {key: name for name, key in self._keys.items()}
+
+    def _key(self, name: str) -> int:
+        """ Returns the stored key of a product name, a new name gets the next key. """
+        self._read_keys()
+        key = self._keys.get(name)
+        if key is None:
+            key = self._connection.execute("INSERT INTO products (name) VALUES (?)", (name,)).lastrowid
+            self._keys[name] = key
+            self._names[key] = name
+
+        return key
+
+    def _load(self, session: str) -> dict:
+        """ Reads the stored cart of a session, lines of products not in the store are dropped. """
+        row = self._connection.execute("SELECT data FROM carts WHERE session = ?", (session,)).fetchone()
+        if row is None:
+            return {}
+
+        items = decode_cart(row[0])
+        if self._store is None:
+            return items
+
+        self._read_keys()
+        cart = {}
+        for key, quantity in items.items():
+            product = self._products.get(self._names.get(key))
+            if product is not None:
+                cart[product.id] = quantity
+
+        return cart
+
+    def cart(self, session: str) -> ShoppingCart:
+        """
+        Returns the cart of a session, an empty cart for new sessions. The cart is loaded on
+        first access and saved on every change, e.g. store.shopping_cart = sessions.cart(session).
+        :param session: The session id.
+        """
+        if not isinstance(session, str):
+            raise TypeError("The session id should be a str.")
+
+        with self._lock:
+            cart = self._carts.get(session)
+            if cart is None:
+                cart = ShoppingCart(self._load(session))
+                cart.set_listener(partial(self.save, session))
+                self._carts[session] = cart
+
+            return cart
+
+    def save(self, session: str, cart: ShoppingCart) -> None:
+        """ Stores the cart of a session, an empty cart deletes the session. """
+        with self._lock:
+            items = cart.cart
+            if self._store is not None:
+                items = {}
+                for product_id, quantity in cart.cart.items():
+                    try:
+                        product = self._store.get_product(product_id)
+                    except KeyError:
+                        continue
+                    self._products.track(product)
+                    items[self._key(product.name)] = quantity
+
+            if not items:
+                self.delete(session)
+                return
+
+            self._connection.execute(
+                "INSERT INTO carts (session, data) VALUES (?, ?) "
+                "ON CONFLICT (session) DO UPDATE SET data = excluded.data",
+                (session, encode_cart(items))
+            )
+            self._written()
+
+    def delete(self, session: str) -> None:
+        """ Drops the stored cart of a session, a loaded cart of the session is kept. """
+        with self._lock:
+            self._connection.execute("DELETE FROM carts WHERE session = ?", (session,))
+            self._written()
+
+    def _written(self) -> None:
+        """ Counts a write and commits every commit_every writes. """
+        self._pending += 1
+        if self._pending >= self._commit_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """ Commits the pending writes. """
+        with self._lock:
+            self._connection.commit()
+            self._pending = 0
+
+    def close(self) -> None:
+        """ Commits the pending writes, stops watching the store and closes the database. """
+        with self._lock:
+            self.flush()
+            self._connection.close()
+            if self._store is not None:
+                self._store.unwatch(self._products)
+
+
+class _ProductNames:
+    """
+    The products of a store mapped by name, built on first use and kept up to date as a
+    watcher of the store. A product renamed since it was mapped is mapped again under its
+    new name when it's found under the old one or saved in a cart.
+    """
+
+    __slots__ = ("_store", "_by_name")
+
+    def __init__(self, store):
+        self._store = store
+        self._by_name = None
+
+    def get(self, name: str | None):
+        """ Returns the product of the store with the given name, None if there is none. """
+        if self._by_name is None:
+            self._by_name = {product.name: product for product in self._store.products}
+            self._store.watch(self)
+
+        product = self._by_name.get(name)
+        if product is not None and product.name != name:
+            del self._by_name[name]
+            try:
+                if self._store.get_product(product.id) is product:
+                    self._by_name[product.name] = product
+            except KeyError:
+                pass
+            return None
+
+        return product
+
+    def track(self, product) -> None:
+        """ Maps an added or saved product by its name. """
+        if self._by_name is not None:
+            self._by_name[product.name] = product
+
+    def untrack(self, product) -> None:
+        """ Drops a removed product. """
+        if self._by_name is not None and self._by_name.get(product.name) is product:
+            del self._by_name[product.name]
+
+    def close(self) -> None:
+        """ Drops the map when the store is closed, it's built again on next use. """
+        self._by_name = None
@@ -0,0 +1,303 @@
+"""
+sharedstock module
+
+This module provides a stock table in shared memory, so several local store processes sell from
+one inventory. Quantities and active flags of all products live in one
+multiprocessing.shared_memory segment. A purchase checks and decrements the stock under a
+striped process lock, no two processes can oversell a product.
+
+Classes:
+    SharedStockTable
+    SharedStockProduct
+
+Class SharedStockTable:
+    Quantities and active flags of products in a shared memory segment.
+
+    Methods:
+        create(cls, size: int, stripes: int = 16, context=None) -> SharedStockTable:
+            Creates a new table with room for size products.
+
+        share(self, products: list[Product]) -> list[SharedStockProduct]:
+            Copies the stock of products into the table and returns products bound to it.
+
+        quantity(self, slot: int) -> int | float:
+            Returns the stock of a slot.
+
+        is_active(self, slot: int) -> bool:
+            Returns the active flag of a slot.
+
+        set_quantity(self, slot: int, quantity: int | float) -> None:
+            Sets the stock of a slot and (de)activates it.
+
+        set_active(self, slot: int, active: bool) -> None:
+            Sets the active flag of a slot.
+
+        try_decrement(self, slot: int, quantity: int) -> int | float:
+            Atomically checks and decrements the stock, returns the remaining stock.
+
+        close(self) -> None:
+            Detaches this process from the segment.
+
+        unlink(self) -> None:
+            Destroys the segment, called once by the creating process.
+
+Class SharedStockProduct:
+    A product whose stock and active flag are read from and written to a SharedStockTable.
+"""
+
+import multiprocessing
+import struct
+from math import inf, isinf
+from multiprocessing.shared_memory import SharedMemory
+from time import time
+
+import changefeed
+import metrics
+import tracing
+from products import Product, _publish_stock_change
+
+# Stock of non-stocked products, the table stores integers only.
+UNLIMITED = -1
+
+# Every slot holds the quantity and the active flag as int64.
+_SLOT = struct.Struct("qq")
+_VALUE = struct.Struct("q")
+
+
+class SharedStockTable:
+    """
+    Quantities and active flags of products in shared memory. Usable by every process
+    the table is passed to, e.g. as multiprocessing.Process argument.
+    """
+
+    __slots__ = ("_memory", "_locks", "_size", "_owner")
+
+    def __init__(self, memory: SharedMemory, size: int, locks: list, owner: bool):
+        """ Use SharedStockTable.create to create a table. """
+        self._memory = memory
+        self._locks = locks
+        self._size = size
+        self._owner = owner
+
+    @classmethod
+    def create(cls, size: int, stripes: int = 16, context=None):
+        """
+        Creates a table with room for size products.
+        :param size: The number of product slots.
+        :param stripes: The number of locks, slots share the lock slot % stripes.
+        :param context: [Optional]: The multiprocessing context the worker processes are
+            started with, the locks must come from the same context.
+        """
+        if not isinstance(size, int) or size < 1:
+            raise ValueError("The size should be a positive int.")
+
+        if not isinstance(stripes, int) or stripes < 1:
+            raise ValueError("The stripes should be a positive int.")
+
+        memory = SharedMemory(create=True, size=size * _SLOT.size)
+        context = context or multiprocessing.get_context()
+        return cls(memory, size, [context.Lock() for _ in range(stripes)], owner=True)
+
+    def __len__(self) -> int:
+        """ Returns the number of product slots. """
+        return self._size
+
+    def __getstate__(self):
+        return self._memory.name, self._size, self._locks
+
+    def __setstate__(self, state):
+        name, size, locks = state
+        memory = _attach(name)
+        self.__init__(memory, size, locks, owner=False)
+
+    def share(self, products: list[Product]) -> list:
+        """
+        Copies the stock of the products into the table.
+        :param products: Up to len(table) products, product i gets slot i.
+        :return: SharedStockProducts with the name, price and promotion of the products.
+        """
+        if len(products) > self._size:
+            raise ValueError(f"The table has room for {self._size} products only.")
+
+        shared = []
+        for slot, product in enumerate(products):
+            _SLOT.pack_into(
+                self._memory.buf, slot * _SLOT.size,
+                UNLIMITED if isinf(product.quantity) else product.quantity,
+                int(product.is_active())
+            )
+            shared.append(SharedStockProduct(product, self, slot))
+
+        return shared
+
+    def _check_slot(self, slot: int) -> None:
+        """ Raises an IndexError for slots outside the table. """
+        if not 0 <= slot < self._size:
+            raise IndexError(f"Slot {slot} is outside the table.")
+
+    def quantity(self, slot: int) -> int | float:
+        """ Returns the stock of a slot, inf for unlimited stock. """
+        self._check_slot(slot)
+        quantity, = _VALUE.unpack_from(self._memory.buf, slot * _SLOT.size)
+        return inf if quantity == UNLIMITED else quantity
+
+    def is_active(self, slot: int) -> bool:
+        """ Returns the active flag of a slot. """
+        self._check_slot(slot)
+        return bool(_VALUE.unpack_from(self._memory.buf, slot * _SLOT.size + _VALUE.size)[0])
+
+    def set_quantity(self, slot: int, quantity: int | float) -> None:
+        """ Sets the stock of a slot. Zero stock deactivates, any other stock activates it. """
+        self._check_slot(slot)
+        with self._locks[slot % len(self._locks)]:
+            _SLOT.pack_into(
+                self._memory.buf, slot * _SLOT.size,
+                UNLIMITED if isinf(quantity) else quantity,
+                int(quantity != 0)
+            )
+
+    def set_active(self, slot: int, active: bool) -> None:
+        """ Sets the active flag of a slot. """
+        self._check_slot(slot)
+        with self._locks[slot % len(self._locks)]:
+            _VALUE.pack_into(self._memory.buf, slot * _SLOT.size + _VALUE.size, int(active))
+
+    def try_decrement(self, slot: int, quantity: int) -> int | float:
+        """
+        Atomically checks and decrements the stock of a slot.
+        Deactivates the slot when the stock reaches zero.
+        :return: The remaining stock.
+        :raises ValueError: If the stock is insufficient, nothing is decremented then.
+        """
+        self._check_slot(slot)
+        buffer = self._memory.buf
+        offset = slot * _SLOT.size
+
+        with self._locks[slot % len(self._locks)]:
+            stock, active = _SLOT.unpack_from(buffer, offset)
+
+            if stock == UNLIMITED:
+                return inf
+
+            if stock < quantity:
+                raise ValueError(f"Stock is insufficient ({stock}) to buy {quantity}.")
+
+            _SLOT.pack_into(buffer, offset, stock - quantity, int(active and stock != quantity))
+
+            return stock - quantity
+
+    def close(self) -> None:
+        """ Detaches this process from the shared segment. """
+        self._memory.close()
+
+    def unlink(self) -> None:
+        """ Destroys the shared segment. Call once, from the creating process. """
+        if self._owner:
+            self._memory.unlink()
+
+
+def _attach(name: str) -> SharedMemory:
+    """
+    Attaches to an existing segment. Only the creating process may destroy it.
+    """
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always tracks attached segments. Worker processes share the
+        # resource tracker of their parent, the segment is still destroyed only once.
+        return SharedMemory(name=name)
+
+
+class SharedStockProduct(Product):
+    """
+    A product whose stock and active flag live in a SharedStockTable.
+    Name, price and promotion stay local to the process.
+    Stock split across locations isn't supported.
+    """
+
+    __slots__ = ("_table", "_slot")
+
+    def __init__(self, product: Product, table: SharedStockTable, slot: int):
+        """ Copies name, price and promotion of product and binds it to a table slot. """
+        super().__init__(
+            name=product.name,
+            price=product.price,
+            quantity=product.quantity,
+            promotion=product.promotion,
+            active=product.is_active()
+        )
+        self._table = table
+        self._slot = slot
+
+    @property
+    def quantity(self) -> float:
+        """ Returns the current stock from the shared table. """
+        return self._table.quantity(self._slot)
+
+    @quantity.setter
+    def quantity(self, new_quantity):
+        """ Sets the current stock in the shared table. """
+        if not isinstance(new_quantity, int):
+            raise TypeError("Please provide the new quantity as an int.")
+
+        if not new_quantity >= 0:
+            raise ValueError("Please provide a quantity of at least 0.")
+
+        previous = self.quantity
+        self._table.set_quantity(self._slot, new_quantity)
+
+        if changefeed.FEED.active:
+            _publish_stock_change(self, previous, new_quantity)
+
+            if new_quantity == 0 and previous != 0:
+                changefeed.FEED.publish(changefeed.Deactivated(self, time()))
+            elif new_quantity != 0 and previous == 0:
+                changefeed.FEED.publish(changefeed.Activated(self, time()))
+
+    def set_location_stock(self, location: str, quantity: int):
+        """ Locations aren't supported for shared stock. """
+        raise ValueError("Shared stock can't be split across locations.")
+
+    def is_active(self) -> bool:
+        """ Returns whether the product is shown in the store. """
+        return self._table.is_active(self._slot)
+
+    def activate(self):
+        """ Activates the product for all processes. """
+        if changefeed.FEED.active and not self.is_active():
+            changefeed.FEED.publish(changefeed.Activated(self, time()))
+
+        self._table.set_active(self._slot, True)
+
+    def deactivate(self):
+        """ Deactivates the product for all processes. """
+        if changefeed.FEED.active and self.is_active():
+            changefeed.FEED.publish(changefeed.Deactivated(self, time()))
+
+        self._table.set_active(self._slot, False)
+
+    @tracing.traced("SharedStockProduct.buy")
+    @metrics.timed("product_buy_seconds", "Latency of Product.buy.")
+    def buy(self, quantity, allocation: dict[str, int] | None = None) -> float:
+        """
+        Atomically updates the shared stock and returns the price of the order.
+        Throws an error if out of stock.
+        """
+        try:
+            remaining = self._table.try_decrement(self._slot, quantity)
+        except ValueError:
+            raise ValueError(
+                f"Stock of {self._name} is insufficient ({self.quantity}) to buy {quantity}."
+            ) from None
+
+        if changefeed.FEED.active:
+            changefeed.FEED.publish(changefeed.StockDecremented(self, quantity, remaining, time()))
+            if remaining == 0:
+                changefeed.FEED.publish(changefeed.Deactivated(self, time()))
+
+        if metrics.is_enabled():
+            metrics.REGISTRY.counter(
+                "product_units_sold_total", "Units sold through Product.buy."
+            ).inc(quantity)
+
+        return quantity * self._price
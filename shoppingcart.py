@@ -12,8 +12,8 @@ Class ShoppingCart:
     Represents a shopping cart that holds products and their quantities.
 
     Methods:
-        __init__(self):
-            Initializes the Shopping-Cart class instance.
+        __init__(self, items: dict[int, int | float] | None = None):
+            Initializes the Shopping-Cart class instance, optionally with restored items.
 
         __str__(self) -> str:
             Returns the dictionary representing the cart as a string.
@@ -21,29 +21,41 @@ Class ShoppingCart:
         __len__(self) -> int:
             Gets the number of different items in the shopping cart.
 
-        __getitem__(self, product_name: str) -> int | float:
+        __getitem__(self, product: Product | int) -> int | float:
             Gets the quantity of a specific product in the shopping cart.
 
         cart(self):
-            Returns the private property _cart.
+            Returns the private property _cart, mapping product ids to quantities.
 
         add_item(self, product: Product, quantity: int | float) -> None:
             Adds an item to the shopping cart.
 
         clear(self) -> None:
             Clears the shopping cart.
+
+        set_listener(self, listener) -> None:
+            Sets a callable called with the cart after every change, e.g. to persist it.
+
+        set_admission(self, admission: AdmissionControl | None) -> None:
+            Sets the admission control every add of a limited product has to pass.
 """
 
+from admission import AdmissionRejected
 from products import Product
 
 
 class ShoppingCart:
-    __slots__ = ["_cart"]
+    __slots__ = ["_cart", "_listener", "_admission", "__weakref__"]
 
-    def __init__(self):
-        """ Initializes the Shopping-Cart class-instance. """
-        self._cart = {}
-        pass
+    def __init__(self, items: dict[int, int | float] | None = None):
+        """
+        Initializes the Shopping-Cart class-instance.
+        :param items: [Optional]: Product ids mapped to quantities, e.g. a restored session.
+        """
+        # Product ids mapped to quantities, ids are stable even if a product is renamed.
+        self._cart = dict(items) if items else {}
+        self._listener = None
+        self._admission = None
 
     def __str__(self) -> str:
         """
@@ -60,19 +72,23 @@ class ShoppingCart:
         """
         return len(self._cart)
 
-    def __getitem__(self, product_name: str) -> int | float:
+    def __getitem__(self, product: Product | int) -> int | float:
         """
         Gets the amount of a product in the shopping cart.
-        :param product_name: The name of the product you want to get the amount of.
+        :param product: The product (or its id) you want to get the amount of.
         :return: The amount of product. Returns zero if not in the list
         """
-        if not isinstance(product_name, str):
-            raise TypeError("Product-name needed to fetch quantity.")
+        if isinstance(product, Product):
+            return self._cart.get(product.id, 0)
 
-        return self._cart.get(product_name, 0)
+        if not isinstance(product, int):
+            raise TypeError("Product or product-id needed to fetch quantity.")
+
+        return self._cart.get(product, 0)
 
     @property
-    def cart(self):
+    def cart(self) -> dict[int, int | float]:
+        """ Returns the cart, mapping product ids to quantities. """
         return self._cart
 
     def add_item(self, product: Product, quantity: int | float) -> None:
@@ -86,7 +102,11 @@ class ShoppingCart:
             print("Provide a valid quantity to add to the shopping-cart.")
             return
 
-        updated_cart_value = self._cart.get(product.name, 0) + quantity
+        if product.id is None:
+            print(f"{product.name} isn't sold in a store.")
+            return
+
+        updated_cart_value = self._cart.get(product.id, 0) + quantity
 
         if hasattr(product, "maximum"):
             if quantity > product.maximum:
@@ -97,8 +117,39 @@ class ShoppingCart:
                 print(f"The maximum of {product.name} has been reached.")
                 return
 
-        self._cart[product.name] = updated_cart_value
+        if self._admission is not None:
+            try:
+                self._admission.admit(product)
+            except AdmissionRejected as error:
+                print(error)
+                return
+
+        self._cart[product.id] = updated_cart_value
+        self._changed()
 
     def clear(self) -> None:
         """ Clears the shopping-cart. """
         self._cart = {}
+        self._changed()
+
+    def set_listener(self, listener) -> None:
+        """
+        Sets the listener of the cart.
+        :param listener: A callable called with the cart after every change, None removes it.
+        """
+        if listener is not None and not callable(listener):
+            raise TypeError("The listener should be callable.")
+
+        self._listener = listener
+
+    def set_admission(self, admission) -> None:
+        """
+        Sets the admission control of the cart, e.g. the one of the store.
+        :param admission: An AdmissionControl every add has to pass, None admits every add.
+        """
+        self._admission = admission
+
+    def _changed(self) -> None:
+        """ Notifies the listener of a change. """
+        if self._listener is not None:
+            self._listener(self)
@@ -0,0 +1,344 @@
+"""
+simulator module
+
+This module estimates what a promotion does to revenue before it is enabled. Monte Carlo order
+streams are drawn from a demand distribution and settled against the catalog's stock and
+promotions. Orders of a product are settled as whole arrays: the first stock-out is found by
+bisecting the running demand, every order before it is served. Less stock than the largest
+quantity is left after it, the rest of the stream is scanned for the smaller orders that still
+fit, like checkouts serve them one by one. The served orders are grouped by quantity and every
+distinct quantity is priced once. Orders above the maximum of a LimitedProduct are rejected,
+as by the shopping-cart. numpy is used for sampling if it is installed, independent runs can be
+spread over a process pool.
+
+Classes:
+    Demand
+    SimulationReport
+
+Class Demand:
+    How often each product is ordered and in which quantities.
+
+    Methods:
+        __init__(self, weights: dict[str, float], quantities: dict[str, dict[int, float]]):
+            Checks and stores the distributions.
+
+        synthetic(cls, products, max_quantity: int = 5, seed: int = 0) -> Demand:
+            Returns a long-tailed random demand for the products.
+
+        from_ledger(cls, ledger: Ledger) -> Demand:
+            Returns the demand recorded in a ledger.
+
+Class SimulationReport:
+    Totals over all simulated orders, amounts in cents.
+
+Functions:
+    simulate(products, demand: Demand, orders: int = 10 ** 6, runs: int = 1,
+             promotion=None, seed: int = 0, processes: int | None = None) -> SimulationReport:
+        Runs Monte Carlo order streams and returns the summed report.
+"""
+
+import random
+from bisect import bisect_right
+from collections import Counter
+from itertools import accumulate
+from math import inf, isinf
+from statistics import mean, pstdev
+from typing import NamedTuple
+
+from promotion import Promotion
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Demand:
+    """
+    The demand of a catalog. Product weights give the share of orders of every product,
+    quantity weights the distribution of the ordered quantity per product.
+    """
+
+    __slots__ = ("_weights", "_quantities")
+
+    def __init__(self, weights: dict, quantities: dict):
+        """
+        Checks and stores the distributions.
+        :param weights: Product name -> relative order frequency.
+        :param quantities: Product name -> {quantity: relative frequency}.
+        """
+        if not weights or any(weight < 0 for weight in weights.values()) or not sum(weights.values()) > 0:
+            raise ValueError("The product weights should be positive numbers.")
+
+        for name in weights:
+            distribution = quantities.get(name)
+            if not distribution:
+                raise ValueError(f"The quantity distribution of {name} is missing.")
+
+            if any(not isinstance(quantity, int) or quantity < 1 for quantity in distribution):
+                raise ValueError(f"The quantities of {name} should be ints larger than 0.")
+
+        self._weights = dict(weights)
+        self._quantities = {name: dict(quantities[name]) for name in weights}
+
+    @property
+    def weights(self) -> dict:
+        """ Returns a copy of the product weights. """
+        return dict(self._weights)
+
+    def quantities(self, name: str) -> dict:
+        """ Returns a copy of the quantity distribution of a product. """
+        return dict(self._quantities[name])
+
+    @classmethod
+    def synthetic(cls, products, max_quantity: int = 5, seed: int = 0):
+        """
+        Returns a long-tailed demand: a few products take most orders and small
+        quantities are ordered more often than large ones.
+        :param products: The products of the catalog.
+        :param max_quantity: The largest ordered quantity.
+        :param seed: Seed for the random generator.
+        """
+        rng = random.Random(seed)
+        names = [product.name for product in products]
+        rng.shuffle(names)
+
+        weights = {name: 1 / rank for rank, name in enumerate(names, 1)}
+        quantities = {
+            name: {quantity: 1 / quantity ** rng.uniform(1, 3) for quantity in range(1, max_quantity + 1)}
+            for name in names
+        }
+
+        return cls(weights, quantities)
+
+    @classmethod
+    def from_ledger(cls, ledger):
+        """ Returns the demand recorded in a ledger, counting every sold line as one order. """
+        weights = Counter()
+        quantities = {}
+
+        for record in ledger.records():
+            weights[record.product] += 1
+            distribution = quantities.setdefault(record.product, Counter())
+            distribution[record.quantity] += 1
+
+        return cls(weights, quantities)
+
+
+class SimulationReport(NamedTuple):
+    """ Totals over all simulated orders. Amounts are in cents. """
+    runs: int
+    orders: int
+    served: int
+    stockouts: int
+    rejected: int
+    units: int
+    list_revenue: int
+    revenue: int
+    run_revenues: tuple
+
+    @property
+    def discount(self) -> int:
+        """ Returns the revenue given away by the promotions. """
+        return self.list_revenue - self.revenue
+
+    @property
+    def stockout_rate(self) -> float:
+        """ Returns the share of orders that hit a product out of stock. """
+        return self.stockouts / self.orders if self.orders else 0.0
+
+    @property
+    def mean_revenue(self) -> float:
+        """ Returns the mean revenue of a run. """
+        return mean(self.run_revenues)
+
+    @property
+    def revenue_stdev(self) -> float:
+        """ Returns the standard deviation of the revenue between runs. """
+        return pstdev(self.run_revenues)
+
+    def to_dict(self) -> dict:
+        """ Returns the report with the derived values as flat dictionary. """
+        data = self._asdict()
+        del data["run_revenues"]
+        data.update(
+            discount=self.discount,
+            stockout_rate=self.stockout_rate,
+            revenue_stdev=self.revenue_stdev,
+        )
+        return data
+
+
+def _settle(quantities: list, stock: int | float) -> tuple[Counter, int]:
+    """
+    Settles the orders of a product in order of arrival. An order is served if the stock
+    left covers it, a later smaller order may still be served after a stock-out.
+    :return: The served orders counted by quantity and the number of stock-outs.
+    """
+    if isinf(stock):
+        return Counter(quantities), 0
+
+    totals = list(accumulate(quantities))
+    served = bisect_right(totals, stock)
+    by_quantity = Counter(quantities[:served])
+    left = stock - totals[served - 1] if served else stock
+    smallest = min(quantities, default=0)
+
+    for quantity in quantities[served + 1:]:
+        if left < smallest:
+            break
+        if quantity <= left:
+            by_quantity[quantity] += 1
+            left -= quantity
+            served += 1
+
+    return by_quantity, len(quantities) - served
+
+
+def _settle_numpy(quantities, stock: int | float) -> tuple[dict, int]:
+    """ Settles the orders of a product like _settle, on a numpy array. """
+    if isinf(stock):
+        values, counts = numpy.unique(quantities, return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist())), 0
+
+    totals = numpy.cumsum(quantities)
+    served = int(numpy.searchsorted(totals, stock, side="right"))
+    values, counts = numpy.unique(quantities[:served], return_counts=True)
+    by_quantity = Counter(dict(zip(values.tolist(), counts.tolist())))
+    left = stock - int(totals[served - 1]) if served else stock
+
+    # Every step serves one order, at most the stock left of the first stock-out.
+    tail = quantities[served + 1:]
+    while left and len(tail):
+        fits = numpy.flatnonzero(tail <= left)
+        if not len(fits):
+            break
+        quantity = int(tail[fits[0]])
+        by_quantity[quantity] += 1
+        left -= quantity
+        served += 1
+        tail = tail[fits[0] + 1:]
+
+    return by_quantity, len(quantities) - served
+
+
+def _run(catalog: list, orders: int, seed: int) -> tuple:
+    """
+    Simulates one order stream.
+    :param catalog: (price in cents, stock, promotion, quantities, quantity weights, weight,
+        maximum per order) for every product in demand.
+    :return: (orders, served, stockouts, rejected, units, list revenue, revenue)
+    """
+    weights = [row[5] for row in catalog]
+    served = stockouts = rejected = units = list_revenue = revenue = 0
+
+    if numpy is not None:
+        rng = numpy.random.default_rng(seed)
+        probabilities = numpy.asarray(weights, dtype=float)
+        counts = rng.multinomial(orders, probabilities / probabilities.sum()).tolist()
+    else:
+        rng = random.Random(seed)
+        drawn = Counter(rng.choices(range(len(catalog)), weights=weights, k=orders))
+        counts = [drawn[idx] for idx in range(len(catalog))]
+
+    for (price, stock, promotion, quantities, quantity_weights, _, maximum), count in zip(catalog, counts):
+        if not count:
+            continue
+
+        if numpy is not None:
+            probabilities = numpy.asarray(quantity_weights, dtype=float)
+            stream = rng.choice(quantities, size=count, p=probabilities / probabilities.sum())
+            if not isinf(maximum):
+                stream = stream[stream <= maximum]
+            by_quantity, missed = _settle_numpy(stream, stock)
+        else:
+            stream = rng.choices(quantities, weights=quantity_weights, k=count)
+            if not isinf(maximum):
+                stream = [quantity for quantity in stream if quantity <= maximum]
+            by_quantity, missed = _settle(stream, stock)
+
+        # Orders above the maximum are rejected by the shopping-cart.
+        rejected += count - len(stream)
+
+        # Every distinct quantity is priced once.
+        distinct = list(by_quantity)
+        nets = promotion.apply_promotion_cents_many([price] * len(distinct), distinct)
+        for quantity, net in zip(distinct, nets):
+            times = by_quantity[quantity]
+            served += times
+            units += times * quantity
+            list_revenue += times * quantity * price
+            revenue += times * net
+
+        stockouts += missed
+
+    return orders, served, stockouts, rejected, units, list_revenue, revenue
+
+
+def simulate(products, demand: Demand, orders: int = 10 ** 6, runs: int = 1,
+             promotion=None, seed: int = 0, processes: int | None = None) -> SimulationReport:
+    """
+    Runs Monte Carlo order streams against the catalog. Stock is taken from the current
+    stock of the products, the products themselves are not changed.
+    :param products: The products of the catalog, e.g. Store.products.
+    :param demand: The demand distribution. Products without demand are never ordered.
+    :param orders: The number of orders of every run.
+    :param runs: The number of independent runs.
+    :param promotion: [Optional]: A Promotion applied to every product, or a dictionary of
+        product name -> Promotion. Products keep their own promotion otherwise.
+    :param seed: Seed of the first run, run i uses seed + i.
+    :param processes: [Optional]: Spread the runs over this many worker processes.
+    :return: The report summed over all runs.
+    """
+    if not isinstance(orders, int) or orders < 1:
+        raise ValueError("The number of orders should be a positive int.")
+
+    if not isinstance(runs, int) or runs < 1:
+        raise ValueError("The number of runs should be a positive int.")
+
+    if promotion is not None and not isinstance(promotion, (Promotion, dict)):
+        raise TypeError("The promotion should be a Promotion or a dictionary of Promotions.")
+
+    weights = demand.weights
+    catalog = []
+
+    for product in products:
+        weight = weights.get(product.name, 0)
+        if not weight or not product.is_active():
+            continue
+
+        applied = product.promotion
+        if isinstance(promotion, Promotion):
+            applied = promotion
+        elif promotion:
+            applied = promotion.get(product.name, applied)
+
+        distribution = demand.quantities(product.name)
+        catalog.append((
+            product.price_cents,
+            inf if isinf(product.quantity) else product.quantity,
+            applied,
+            list(distribution),
+            list(distribution.values()),
+            weight,
+            getattr(product, "maximum", inf),
+        ))
+
+    if not catalog:
+        raise ValueError("None of the active products is in demand.")
+
+    seeds = [seed + run for run in range(runs)]
+
+    if processes and processes > 1 and runs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_run, [catalog] * runs, [orders] * runs, seeds))
+    else:
+        results = [_run(catalog, orders, run_seed) for run_seed in seeds]
+
+    totals = [sum(column) for column in zip(*results)]
+
+    return SimulationReport(
+        runs, *totals, run_revenues=tuple(result[6] for result in results)
+    )
@@ -0,0 +1,260 @@
+"""
+snapshot module
+
+This module provides copy-on-write views of a store for what-if pricing. A snapshot is taken
+of the store's current read view (see the readview module), the immutable frozen products of
+one point in time, and shares them. Changes to the store after the snapshot was taken don't
+show in it. A product is copied into the snapshot the first time its price, promotion or stock
+is changed in the snapshot, the store and its stock are never touched. Taking a snapshot only
+publishes the pending changes of the read view, many snapshots can be compared side by side.
+
+Classes:
+    StoreSnapshot
+
+Class StoreSnapshot:
+    A copy-on-write view of a store.
+
+    Methods:
+        __init__(self, store: Store, view: CatalogView, positions: dict[int, int]):
+            Creates an empty overlay over a read view of the store.
+
+        __len__(self) -> int:
+            Returns the sum of all product stock as seen by the snapshot.
+
+        __contains__(self, item: Product | int) -> bool:
+            Checks if a product is part of the snapshot.
+
+        store(self) -> Store:
+            Returns the store the snapshot is taken of.
+
+        products(self) -> list[Product]:
+            Returns the products as seen by the snapshot.
+
+        materialized(self) -> list[Product]:
+            Returns the products copied into the snapshot.
+
+        get_product(self, product: Product | int) -> Product:
+            Returns the snapshot's version of a product.
+
+        set_price(self, product: Product | int, price: int | float) -> None:
+            Sets the price of a product in the snapshot only.
+
+        set_promotion(self, product: Product | int, promotion: Promotion) -> None:
+            Sets the promotion of a product in the snapshot only.
+
+        set_quantity(self, product: Product | int, quantity: int) -> None:
+            Sets the stock of a product in the snapshot only.
+
+        get_all_active_products(self) -> list[Product]:
+            Returns all active products as seen by the snapshot.
+
+        get_all_available_products(self) -> list[Product]:
+            Returns all products in stock as seen by the snapshot.
+
+        bill(self, items: dict) -> int:
+            Returns the total in cents of an order at the snapshot's prices and promotions.
+
+        order(self, items: dict) -> int:
+            Takes an order from the snapshot's stock and returns the total in cents.
+"""
+
+import copy
+from math import isinf
+
+import money
+from products import Product, _check_initialization
+from promotion import Promotion
+
+
+class StoreSnapshot:
+    """
+    A copy-on-write view of a store. Products changed in the snapshot are copied on
+    their first change, all others are read from the read view the snapshot was taken of.
+    """
+
+    __slots__ = ("_store", "_view", "_positions", "_overlay")
+
+    def __init__(self, store, view, positions: dict):
+        """
+        Creates an empty overlay over a read view of the store, use Store.snapshot.
+        :param store: The store to take the snapshot of.
+        :param view: The store's current read view.
+        :param positions: Maps the product ids of the view to their positions. Ids added
+            to the store later map to positions beyond the view.
+        """
+        self._store = store
+        self._view = view
+        self._positions = positions
+        # Product id -> the snapshot's copy of the product.
+        self._overlay = {}
+
+    def __len__(self) -> int:
+        """ Returns the sum of all product stock as seen by the snapshot. """
+        return sum(
+            product.quantity
+            if not isinf(product.quantity)
+            else 0
+            for product in self.products
+        )
+
+    def __contains__(self, item) -> bool:
+        """ Checks if a product (or product id) is part of the snapshot. """
+        product_id = item.id if isinstance(item, Product) else item
+        try:
+            self._frozen(product_id)
+        except KeyError:
+            return False
+        return True
+
+    @property
+    def store(self):
+        """ Returns the store the snapshot is taken of. """
+        return self._store
+
+    @property
+    def products(self) -> list[Product]:
+        """ Returns the products of the snapshot, changed products replaced by their copies. """
+        overlay = self._overlay
+        if not overlay:
+            return self._view.get_all_products()
+
+        return [overlay.get(product.id, product) for product in self._view]
+
+    @property
+    def materialized(self) -> list[Product]:
+        """ Returns the products copied into the snapshot. """
+        return list(self._overlay.values())
+
+    def _frozen(self, product_id: int) -> Product:
+        """ Returns the frozen product of the view. Raises a KeyError if it isn't in the view. """
+        position = self._positions.get(product_id)
+        if position is None or position >= len(self._view):
+            raise KeyError(product_id)
+
+        return self._view[position]
+
+    def get_product(self, product) -> Product:
+        """
+        Returns the snapshot's version of a product, a frozen product or the snapshot's copy.
+        Raises a KeyError if the product wasn't in the store when the snapshot was taken.
+        """
+        product_id = product.id if isinstance(product, Product) else product
+        copied = self._overlay.get(product_id)
+        if copied is not None:
+            return copied
+
+        return self._frozen(product_id)
+
+    def _materialize(self, product) -> Product:
+        """ Returns the snapshot's copy of a product, copying it on first use. """
+        original = self.get_product(product)
+        if original.id in self._overlay:
+            return original
+
+        copied = copy.copy(original)
+        if original.locations:
+            copied._locations = original.locations
+        self._overlay[original.id] = copied
+
+        return copied
+
+    def set_price(self, product, price: int | float) -> None:
+        """ Sets the price of a product in the snapshot, the store is not changed. """
+        original = self.get_product(product)
+        _check_initialization(original.name, price, original.quantity, original.is_active())
+        self._materialize(original)._price = price
+
+    def set_promotion(self, product, promotion: Promotion) -> None:
+        """ Sets the promotion of a product in the snapshot, the store is not changed. """
+        if not isinstance(promotion, Promotion):
+            raise TypeError("The promotion should be of type Promotion or descendant child")
+
+        self._materialize(product)._promotion = promotion
+
+    def set_quantity(self, product, quantity: int) -> None:
+        """
+        Sets the stock of a product in the snapshot, the store is not changed.
+        Zero stock deactivates the product, as in the store.
+        """
+        original = self.get_product(product)
+
+        if not isinstance(quantity, int):
+            raise TypeError("Please provide the new quantity as an int.")
+
+        if not quantity >= 0:
+            raise ValueError("Please provide a quantity of at least 0.")
+
+        if isinf(original.quantity):
+            raise ValueError(f"{original.name} has unlimited stock.")
+
+        if type(original).quantity is not Product.quantity:
+            raise ValueError(f"The stock of {original.name} can't be changed in a snapshot.")
+
+        copied = self._materialize(original)
+        if copied._locations:
+            copied._spread_over_locations(quantity - copied._quantity)
+        copied._quantity = quantity
+        copied._active = quantity != 0
+
+    def get_all_active_products(self) -> list[Product]:
+        """ Returns all active products as seen by the snapshot. """
+        return [product for product in self.products if product.is_active()]
+
+    def get_all_available_products(self) -> list[Product]:
+        """ Returns all products in stock as seen by the snapshot. """
+        return [product for product in self.products if product.is_active() and product.quantity > 0]
+
+    def _lines(self, items: dict) -> list:
+        """
+        Resolves and checks the order lines against the snapshot's stock.
+        :return: (product, quantity) for every line.
+        """
+        lines = []
+
+        for product, quantity in items.items():
+            product = self.get_product(product)
+
+            if not product.is_active():
+                raise ValueError(f"{product.name} is not active.")
+
+            maximum = getattr(product, "maximum", None)
+            if maximum is not None and quantity > maximum:
+                raise ValueError(f"You can only have {maximum} of {product.name}.")
+
+            if product.quantity < quantity:
+                raise ValueError(
+                    f"Stock of {product.name} is insufficient ({product.quantity}) to buy {quantity}."
+                )
+
+            lines.append((product, quantity))
+
+        return lines
+
+    def bill(self, items: dict) -> int:
+        """
+        Returns the total of an order at the snapshot's prices and promotions, no stock is taken.
+        :param items: Maps products or product ids to quantities, e.g. a shopping-cart's cart.
+        :return: The total in cents.
+        """
+        return money.bill_cents(
+            (product.promotion, product.price_cents, quantity)
+            for product, quantity in self._lines(items)
+        )
+
+    def order(self, items: dict) -> int:
+        """
+        Takes an order from the snapshot's stock, the store's stock is not changed.
+        The whole order is checked before any stock is taken.
+        :param items: Maps products or product ids to quantities.
+        :return: The total in cents.
+        """
+        lines = self._lines(items)
+        total = money.bill_cents(
+            (product.promotion, product.price_cents, quantity) for product, quantity in lines
+        )
+
+        for product, quantity in lines:
+            if not isinf(product.quantity):
+                self.set_quantity(product, product.quantity - quantity)
+
+        return total
@@ -4,6 +4,9 @@ store module
 This module provides a `Store` class to manage a collection of products.
 It includes methods to add and remove products, check stock, and merge stores.
 The store also maintains a shopping cart for managing customer purchases.
+Listings read immutable, versioned views of the catalog, published after every batch of
+changes (see the readview module). Changes made through the product setters arrive through
+the change-feed once the first view is built, listings publish them before they read.
 
 Classes:
     Store
@@ -12,8 +15,11 @@ Class Store:
     Represents a store containing Product instances.
 
     Methods:
-        __init__(self, products: list[Product]):
-            Initializes the Store instance with a list of products.
+        __init__(self, products: list[Product], ledger: Ledger | None = None,
+                allocator: Allocator | None = None, admission: AdmissionControl | None = None):
+            Initializes the Store instance with a list of products, an optional order ledger,
+            an optional allocator for products stocked in several locations and an optional
+            admission control for cart adds of hot products.
 
         __len__(self) -> int:
             Returns the sum of all product stock.
@@ -25,7 +31,28 @@ Class Store:
             Merges two stores together, combining their products.
 
         shopping_cart(self) -> ShoppingCart:
-            Returns the shopping cart of the store.
+            Returns the shopping cart of the store, can be set, e.g. to a restored session cart.
+
+        location_totals(self) -> dict[str, int]:
+            Returns the stock per location over all products.
+
+        _update_location_totals(self, after: dict[str, int], before: dict[str, int] | None = None):
+            Adds the difference of a product's location stock to the store totals.
+
+        set_location_stock(self, product: Product, location: str, quantity: int) -> None:
+            Sets the stock of a product at a location.
+
+        ledger(self):
+            Returns the ledger recording the sold order lines.
+
+        admission(self) -> AdmissionControl | None:
+            Returns the admission control of cart adds and queued orders.
+
+        _register(self, product: Product) -> None:
+            Assigns a stable id to a product and indexes it.
+
+        get_product(self, product_id: int) -> Product:
+            Returns the product with the given id.
 
         products(self):
             Returns the list of products in the store.
@@ -36,17 +63,60 @@ Class Store:
         remove_product(self, product: Product) -> str:
             Removes a product from the store.
 
+        remove_products(self, products) -> int:
+            Removes many products and their cart lines in one pass.
+
+        restock(self, plan: dict[Product, int]) -> int:
+            Adds stock to many products in one pass and re-activates them.
+
+        read_view(self) -> CatalogView:
+            Returns the current immutable, versioned read view of the catalog.
+
+        _on_changes(self, events: list) -> None:
+            Collects the products changed by their setters for the next read view.
+
+        _refresh_view(self) -> CatalogView:
+            Publishes the pending changes of the change-feed and returns the current read view.
+
+        batch(self):
+            Context manager grouping catalog changes into one published read view.
+
+        touch(self, *products: Product) -> None:
+            Reports products changed outside the store methods.
+
+        catalog_index(self) -> CatalogIndex:
+            Returns the bitmap index of tags, status and prices, built on first use.
+
+        watch(self, watcher) -> None:
+            Tells a watcher, e.g. an index of the catalog, about added and removed products.
+
+        unwatch(self, watcher) -> None:
+            Stops telling a watcher about added and removed products.
+
+        close(self) -> None:
+            Closes the watchers and the read view of the store, ending their change-feed subscriptions.
+
+        find_products(self, **filters) -> list[Product]:
+            Returns the products matching the filters of the catalog index.
+
+        snapshot(self) -> StoreSnapshot:
+            Returns a point-in-time copy-on-write view of the store for what-if pricing.
+
+        memory_report(self) -> dict[str, dict[str, int]]:
+            Reports the memory footprint of the catalog per type.
+
         get_all_products(self):
             Returns all products in the store.
 
         get_all_active_products(self) -> list[Product]:
-            Returns all active products in the store.
+            Returns all active products in the store, from the current read view.
 
         get_all_available_products(self) -> list[Product]:
-            Returns all items in stock.
+            Returns all items in stock, from the current read view.
 
         get_all_available_products_for_current_cart(self):
-            Returns all available products that aren't already fully added to the cart.
+            Returns all available products that aren't already fully added to the cart, from the
+            current read view.
 
         show_all_products(self) -> None:
             Prints an unrestricted list of all products.
@@ -55,18 +125,45 @@ Class Store:
             Prompts the user for a shopping list by listing all
             available products and prompting the quantity the user wants to acquire.
 
-        _order(self) -> float:
-            Removes the shopping-list item's quantities and returns the total price.
+        _order(self, rejected: dict[int, int] | None = None) -> int:
+            Removes the shopping-list item's quantities, records the sold lines in the ledger
+            and returns the total price in cents. Lines out of stock are collected in rejected.
+
+        settle_orders(self, orders: list[dict[int, int]]) -> list[OrderResult]:
+            Takes many orders in one pass, merging the stock decrements per product.
+
+        _take(self, product: Product, lines: list, rejected: list) -> list:
+            Takes the summed quantity of a product's order lines from its stock.
 
         _finalize_order(self) -> None:
             Finishes the order by printing the bill and the amount of items bought
             and resetting the shopping-cart.
 """
 
+import sys
+from contextlib import contextmanager
+from itertools import count
 from math import inf, isinf
+from threading import Lock, RLock
+
+import changefeed
+import metrics
+import money
 import prompts
+import tracing
+from catalogindex import CatalogIndex
+from orderqueue import OrderResult
 from products import Product
+from readview import CatalogView, freeze
 from shoppingcart import ShoppingCart
+from snapshot import StoreSnapshot
+
+
+# The product changes a read view is refreshed for.
+_PRODUCT_EVENTS = (
+    changefeed.StockDecremented, changefeed.Restocked, changefeed.Activated, changefeed.Deactivated,
+    changefeed.PriceChanged, changefeed.PromotionChanged, changefeed.TagsChanged,
+)
 
 
 class Store:
@@ -75,10 +172,27 @@ class Store:
     Provide list of products for instantiation.
     """
 
-    __slots__ = ("_products", "_shopping_cart")
+    __slots__ = (
+        "_products", "_by_id", "_shopping_cart", "_ledger", "_allocator", "_location_totals",
+        "_view", "_positions", "_dirty", "_restructured", "_batch_depth", "_write_lock",
+        "_index", "_admission", "_watchers", "_stale", "_stale_lock"
+    )
 
-    def __init__(self, products: list[Product]):
-        """ Initializes the Store Instance with validity check. """
+    # Product ids are unique over all stores, a product keeps its id when it's
+    # added to a second store.
+    _ids = count()
+
+    def __init__(self, products: list[Product], ledger=None, allocator=None, admission=None):
+        """
+        Initializes the Store Instance with validity check.
+        :param products: The products of the store.
+        :param ledger: [Optional]: A Ledger recording every sold order line.
+        :param allocator: [Optional]: An Allocator splitting order lines of products
+            stocked in several locations.
+        :param admission: [Optional]: An AdmissionControl limiting the cart adds and queued
+            orders of hot products, e.g. during a flash sale. Lines are admitted once, when
+            they're added to the cart, checkout doesn't admit them again.
+        """
         if not isinstance(products, list):
             raise ValueError("The products should be of type list.")
 
@@ -87,9 +201,38 @@ class Store:
                 raise ValueError("Store products must be instances of Product")
 
         self._products = products
+        self._by_id = {}
+        for product in products:
+            self._register(product)
+
         # I'm aware the cart should be connected to the user and not the store, but
         # for this single-user store it's sufficient.
         self._shopping_cart = ShoppingCart()
+        self._shopping_cart.set_admission(admission)
+        self._ledger = ledger
+        self._allocator = allocator
+        self._admission = admission
+
+        # Stock per location over all products, kept up to date by the store operations.
+        self._location_totals = {}
+        for product in products:
+            self._update_location_totals(product.locations)
+
+        # Read views are built on first use, see read_view. Until then no changes are tracked.
+        self._view = None
+        self._positions = {}
+        self._dirty = set()
+        self._restructured = False
+        self._batch_depth = 0
+        self._write_lock = RLock()
+        # Ids of products changed by their setters, reported by the change-feed.
+        self._stale = set()
+        self._stale_lock = Lock()
+
+        # The bitmap index is built on first use, see catalog_index.
+        self._index = None
+        # Told about added and removed products and closed with the store, see watch.
+        self._watchers = []
 
     def __len__(self) -> int:
         """
@@ -120,23 +263,26 @@ class Store:
         # Stock is added together.
         # Shopping Cart is reset (on purpose).
 
-        # Get a set of unique product-names.
-        all_products = set(
-            list(p.name for p in self._products) + list(p.name for p in other.products)
-        )
+        # Index both stores by name, products of only one store are taken over as they are.
+        own_products = {p.name: p for p in self._products}
+        other_products = {p.name: p for p in other.products}
+        all_products = list(own_products) + [name for name in other_products if name not in own_products]
 
         # Loop the product names to create a new list of products to pass to the new store
         new_products = []
         for p_name in all_products:
             # Get current product
-            product_store = next(
-                product for product in self._products if product.name == p_name
-            )
+            product_store = own_products.get(p_name)
 
             # Get product of the store to merge
-            product_other_store = next(
-                product for product in other.products if product.name == p_name
-            )
+            product_other_store = other_products.get(p_name)
+
+            if product_store is None or product_other_store is None:
+                product = product_store or product_other_store
+                new_products.append(
+                    Product(p_name, price=product.price, quantity=product.quantity, promotion=product.promotion)
+                )
+                continue
 
             price = product_store.price or product_other_store.price
             quantity = (product_store.quantity or 0) + (product_other_store.quantity or 0)
@@ -153,6 +299,66 @@ class Store:
         """
         return self._shopping_cart
 
+    @shopping_cart.setter
+    def shopping_cart(self, shopping_cart: ShoppingCart) -> None:
+        """
+        Replaces the Shopping-Cart of the store, e.g. with a cart of a SessionStore.
+        :param shopping_cart: The new Shopping-Cart.
+        """
+        if not isinstance(shopping_cart, ShoppingCart):
+            raise TypeError("The shopping cart should be of type ShoppingCart.")
+
+        shopping_cart.set_admission(self._admission)
+        self._shopping_cart = shopping_cart
+
+    def _register(self, product: Product) -> None:
+        """ Assigns an id to products that don't have one yet and indexes the product by id. """
+        if product.id is None:
+            product._id = next(Store._ids)
+
+        self._by_id[product.id] = product
+
+    def get_product(self, product_id: int) -> Product:
+        """ Returns the product with the given id. Raises a KeyError if it isn't in the store. """
+        return self._by_id[product_id]
+
+    @property
+    def location_totals(self) -> dict[str, int]:
+        """
+        Returns the stock per location over all products. Only changes made through
+        the store (orders, restock, set_location_stock, adding and removing products)
+        are counted.
+        """
+        return dict(self._location_totals)
+
+    def _update_location_totals(self, after: dict[str, int], before: dict[str, int] | None = None):
+        """ Adds the difference of a product's location stock to the store totals. """
+        totals = self._location_totals
+
+        for name, quantity in after.items():
+            totals[name] = totals.get(name, 0) + quantity
+
+        for name, quantity in (before or {}).items():
+            totals[name] = totals.get(name, 0) - quantity
+
+    def set_location_stock(self, product: Product, location: str, quantity: int) -> None:
+        """ Sets the stock of a product at a location and updates the store totals. """
+        with self.batch():
+            before = product.locations
+            product.set_location_stock(location, quantity)
+            self._update_location_totals(product.locations, before)
+            self._mark(product)
+
+    @property
+    def ledger(self):
+        """ Returns the ledger recording the sold order lines, None if sales aren't recorded. """
+        return self._ledger
+
+    @property
+    def admission(self):
+        """ Returns the admission control of cart adds and queued orders, None if everything is admitted. """
+        return self._admission
+
     @property
     def products(self):
         """ Returns the private property products. """
@@ -161,43 +367,346 @@ class Store:
     def add_product(self, product: Product) -> str:
         """ Adds a product to the store. Must be of type Product. """
         if isinstance(product, Product):
-            self._products.append(product)
+            # Appended products are published with the next read view.
+            with self.batch():
+                self._products.append(product)
+                self._register(product)
+                self._update_location_totals(product.locations)
+                for watcher in self._watchers:
+                    watcher.track(product)
             return product.name
 
         raise ValueError("Store products must be instances of Product")
 
     def remove_product(self, product) -> str:
-        """ Removes given Product from Store """
+        """ Removes given Product from Store, its cart line is dropped. """
         if not isinstance(product, Product):
             raise ValueError("Store products must be instances of Product")
 
         if any(p == product for p in self._products):
-            self._products.remove(product)
+            with self.batch():
+                self._products.remove(product)
+                self._by_id.pop(product.id, None)
+                self._shopping_cart.cart.pop(product.id, None)
+                self._update_location_totals({}, product.locations)
+                self._restructured = True
+                for watcher in self._watchers:
+                    watcher.untrack(product)
 
         return product.name
 
+    def remove_products(self, products) -> int:
+        """
+        Removes many products in one pass over the catalog. Their cart lines are dropped.
+        :param products: The products to remove, products not in the store are ignored.
+        :return: The number of removed products.
+        """
+        removed = {id(product): product for product in products}
+        if not removed:
+            return 0
+
+        count_before = len(self._products)
+
+        with self.batch():
+            self._products[:] = [product for product in self._products if id(product) not in removed]
+
+            cart = self._shopping_cart.cart
+            for product in removed.values():
+                if self._by_id.get(product.id) is product:
+                    del self._by_id[product.id]
+                    cart.pop(product.id, None)
+                    self._update_location_totals({}, product.locations)
+                    for watcher in self._watchers:
+                        watcher.untrack(product)
+
+            self._restructured = True
+
+        return count_before - len(self._products)
+
+    def restock(self, plan: dict[Product, int]) -> int:
+        """
+        Adds stock to many products in one pass, e.g. a plan of the LowStockMonitor.
+        The whole plan is validated before any stock changes. Sold out products are
+        re-activated by the quantity-setter.
+        :param plan: Maps products of the store to the quantity to add.
+        :return: The total number of units added.
+        """
+        members = set(self._products)
+
+        for product, quantity in plan.items():
+            if product not in members:
+                raise ValueError(f"{product.name} is not a product of this store.")
+
+            if not isinstance(quantity, int) or quantity < 0:
+                raise ValueError(f"Restock quantity of {product.name} should be an int of at least 0.")
+
+            if isinf(product.quantity):
+                raise ValueError(f"{product.name} has unlimited stock.")
+
+        with self.batch():
+            for product, quantity in plan.items():
+                before = product.locations
+                product.quantity = product.quantity + quantity
+                if before:
+                    self._update_location_totals(product.locations, before)
+                self._mark(product)
+
+        return sum(plan.values())
+
+    def read_view(self) -> CatalogView:
+        """
+        Returns the current read view of the catalog. The view is immutable, readers don't
+        lock and never see a batch half applied. Built on first use, from then on the store
+        consumes the change-feed until it's closed. Changes made through the product setters
+        are published with the next batch, see _refresh_view.
+        """
+        view = self._view
+        if view is None:
+            with self._write_lock:
+                if self._view is None:
+                    self._positions = {product.id: idx for idx, product in enumerate(self._products)}
+                    self._view = CatalogView.build(self._products)
+                    changefeed.FEED.subscribe(self._on_changes, _PRODUCT_EVENTS)
+                view = self._view
+
+        return view
+
+    def _on_changes(self, events: list) -> None:
+        """
+        Collects the products of this store changed by their setters, they are frozen again
+        with the next published view. Doesn't wait for the write lock, it's called by whichever
+        thread flushes the change-feed.
+        """
+        by_id = self._by_id
+
+        if any(isinstance(event, changefeed.FeedOverflow) for event in events):
+            # Events were lost, any product could have changed.
+            changed = set(by_id)
+        else:
+            changed = {
+                event.product.id for event in events
+                if by_id.get(event.product.id) is event.product
+            }
+
+        with self._stale_lock:
+            self._stale |= changed
+
+    def _refresh_view(self) -> CatalogView:
+        """ Delivers the pending change-feed events, publishes the changed products and returns the view. """
+        self.read_view()
+        changefeed.FEED.flush()
+        self.touch()
+        return self._view
+
+    @contextmanager
+    def batch(self):
+        """
+        Groups changes of the catalog. Writers are serialized, the changes are published
+        as one new read view when the outermost batch ends. Changes made to products directly
+        are published once they arrive through the change-feed, touch reports them right away.
+        """
+        with self._write_lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._publish()
+
+    def touch(self, *products: Product) -> None:
+        """ Reports products changed outside the store methods, e.g. by their setters. """
+        with self.batch():
+            for product in products:
+                self._mark(product)
+
+    def _mark(self, product: Product) -> None:
+        """ Marks a product as changed in the current batch. """
+        if self._view is not None:
+            self._dirty.add(product.id)
+
+    def _publish(self) -> None:
+        """
+        Publishes the changes of the batch as new read view. Only the chunks of changed products
+        are copied, removals rebuild the view from the frozen products of the previous one.
+        """
+        view = self._view
+        products = self._products
+
+        if self._stale:
+            with self._stale_lock:
+                stale, self._stale = self._stale, set()
+            self._dirty |= stale
+
+        if view is None or not (self._dirty or self._restructured or len(products) != len(view)):
+            self._dirty = set()
+            self._restructured = False
+            return
+
+        dirty, positions = self._dirty, self._positions
+
+        if self._restructured:
+            previous = view.get_all_products()
+            entries = [
+                previous[positions[product.id]]
+                if product.id in positions and product.id not in dirty
+                else freeze(product)
+                for product in products
+            ]
+            self._positions = {product.id: idx for idx, product in enumerate(products)}
+            self._view = CatalogView.build(entries, view.version + 1, frozen=True)
+        else:
+            for idx in range(len(view), len(products)):
+                positions[products[idx].id] = idx
+                dirty.add(products[idx].id)
+
+            entries = {
+                positions[product_id]: freeze(self._by_id[product_id])
+                for product_id in dirty
+                if product_id in positions
+            }
+            self._view = view.replaced(entries, len(products))
+
+        self._dirty = set()
+        self._restructured = False
+
+    def catalog_index(self) -> CatalogIndex:
+        """
+        Returns the bitmap index of the catalog, built on first use. Products added or removed
+        through the store are indexed accordingly, other changes arrive through the change-feed.
+        """
+        if self._index is None:
+            with self._write_lock:
+                if self._index is None:
+                    self._index = CatalogIndex(self)
+                    self.watch(self._index)
+
+        return self._index
+
+    def watch(self, watcher) -> None:
+        """
+        Registers a watcher of the catalog, e.g. an index kept up to date from the change-feed.
+        :param watcher: An object with the methods track(product) and untrack(product), called
+            when products are added or removed, and close(), called when the store is closed.
+        """
+        with self._write_lock:
+            if watcher not in self._watchers:
+                self._watchers.append(watcher)
+
+    def unwatch(self, watcher) -> None:
+        """ Removes a watcher, watchers that aren't registered are ignored. """
+        with self._write_lock:
+            if watcher in self._watchers:
+                self._watchers.remove(watcher)
+
+    def close(self) -> None:
+        """
+        Closes the watchers of the store, e.g. its catalog index, so they stop consuming the
+        change-feed. Products only publish changes while the feed has subscribers.
+        The catalog index and the read view are rebuilt on next use.
+        """
+        with self._write_lock:
+            watchers, self._watchers = self._watchers, []
+            self._index = None
+            if self._view is not None:
+                changefeed.FEED.unsubscribe(self._on_changes)
+                self._view = None
+
+        for watcher in watchers:
+            watcher.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def find_products(self, **filters) -> list[Product]:
+        """
+        Returns the products matching the filters of the catalog index, e.g.
+        store.find_products(tags=["audio"], active=True, in_stock=True, max_price=300).
+        """
+        return self.catalog_index().query(**filters)
+
+    def snapshot(self) -> StoreSnapshot:
+        """
+        Returns a copy-on-write view of the store at this point in time, taken of the current
+        read view. Prices, promotions and stock changed in the snapshot don't touch the store.
+        """
+        self._refresh_view()
+
+        # A view and its positions are replaced together, under the write lock they match.
+        with self._write_lock:
+            return StoreSnapshot(self, self.read_view(), self._positions)
+
+    def memory_report(self) -> dict[str, dict[str, int]]:
+        """
+        Reports the memory footprint of the catalog. Shared objects (interned names,
+        flyweight promotions) are counted once.
+        :return: Maps "<ProductType>", "names", "promotions", "locations" and "catalog"
+            to the count of objects and their size in bytes, "total" sums all of them.
+        """
+        counts = {}
+        names = {}
+        promotions = {}
+        locations = {}
+
+        for product in self._products:
+            counts[type(product)] = counts.get(type(product), 0) + 1
+            names[id(product.name)] = product.name
+            promotions[id(product.promotion)] = product.promotion
+            if product._locations is not None:
+                locations[id(product._locations)] = product._locations
+
+        # Products have slots only, every instance of a type has the same size.
+        first_of_type = {}
+        for product in self._products:
+            if len(first_of_type) == len(counts):
+                break
+            first_of_type.setdefault(type(product), product)
+
+        report = {
+            cls.__name__: {"count": count, "bytes": count * sys.getsizeof(first_of_type[cls])}
+            for cls, count in counts.items()
+        }
+
+        for key, objects in (("names", names), ("promotions", promotions), ("locations", locations)):
+            report[key] = {
+                "count": len(objects),
+                "bytes": sum(map(sys.getsizeof, objects.values())),
+            }
+
+        report["catalog"] = {"count": 1, "bytes": sys.getsizeof(self._products)}
+        report["total"] = {
+            "count": sum(entry["count"] for entry in report.values()),
+            "bytes": sum(entry["bytes"] for entry in report.values()),
+        }
+
+        return report
+
     def get_all_products(self):
         """ Return all products """
         return self._products
 
     def get_all_active_products(self) -> list[Product]:
-        """ Return all active products """
-        return list(filter(
-            lambda p: p.is_active(),
-            self.get_all_products()
-        ))
+        """
+        Return all active products, frozen copies from the current read view. Look up the
+        live product with get_product(product.id) to change it or add it to the cart.
+        """
+        return self._refresh_view().get_all_active_products()
 
     def get_all_available_products(self) -> list[Product]:
-        """ Return all items in stock """
-        return list(filter(
-            lambda product: product.quantity > 0,
-            self.get_all_active_products()
-        ))
+        """ Return all items in stock, frozen copies from the current read view. """
+        return self._refresh_view().get_all_available_products()
 
     def get_all_available_products_for_current_cart(self):
-        """ Returns all available products that aren't already fully added to the cart. """
+        """
+        Returns all available products that aren't already fully added to the cart.
+        Lists frozen copies from the current read view, checkouts don't change the list.
+        """
         return list(filter(
-            lambda item: self.shopping_cart[item.name] <= item.maximum
+            lambda item: self.shopping_cart[item] <= item.maximum
             if hasattr(item, "maximum")
             else inf,
             self.get_all_available_products()
@@ -205,16 +714,17 @@ class Store:
 
     def show_all_products(self) -> None:
         """
-        Prints an unrestricted list of all products
+        Prints an unrestricted list of all products, from the current read view.
         """
         product_infos = [
             product
-            for product in self.get_all_products()
+            for product in self._refresh_view()
         ]
 
         for idx, product_info in enumerate(product_infos):
             print(f"{idx + 1}. {product_info}")
 
+    @tracing.traced("Store.start_order")
     def start_order(self) -> None:
         """
         Prompts the user for a shopping list by listing all available
@@ -240,7 +750,7 @@ class Store:
             if quantity is None:
                 return self._finalize_order()
 
-            available_stock = order_item.quantity - self.shopping_cart[order_item.name]
+            available_stock = order_item.quantity - self.shopping_cart[order_item]
 
             if available_stock >= quantity:
                 self.shopping_cart.add_item(order_item, quantity)
@@ -253,39 +763,161 @@ class Store:
                 "_____________",
                 "\nShopping-Cart contains:"
             )
-            for name, quantity in self.shopping_cart.cart.items():
-                print(f"{name}: {quantity}")
+            for product_id, quantity in self.shopping_cart.cart.items():
+                print(f"{self._by_id[product_id].name}: {quantity}")
 
             print(
                 "_____________",
                 "\n\nWhat else do you want to buy?"
             )
 
-    def _order(self) -> float:
-        """ Removes the shopping-list item's quantities and returns the total price. """
-        bill = 0
-        cart = self.shopping_cart.cart
+    @tracing.traced("Store._order")
+    @metrics.timed("store_order_seconds", "Latency of Store._order.")
+    def _order(self, rejected: dict | None = None) -> int:
+        """
+        Removes the shopping-list item's quantities and returns the total price in cents.
+        :param rejected: [Optional]: Collects the product ids and quantities of the lines
+            that weren't sold because they're out of stock.
+        """
+        # The sold products are published in one new read view.
+        with self.batch():
+            bill = 0
+            cart = self.shopping_cart.cart
+            sold_lines = []
+
+            for product_id, quantity in cart.items():
+                try:
+                    # first check if product is in stock
+                    with tracing.span("lookup", product_id=product_id):
+                        product = self._by_id[product_id]
+                        before = product.locations
+                        allocation = None
+                        if before and self._allocator is not None:
+                            allocation = self._allocator.allocate(product, quantity)
+
+                    product.buy(quantity, allocation)
+                    self._mark(product)
+
+                    if before:
+                        self._update_location_totals(product.locations, before)
+
+                    # update bill if it's available
+                    with tracing.span("apply_promotion", product_id=product_id):
+                        net = product.promotion.apply_promotion_cents(
+                            price=product.price_cents,
+                            quantity=quantity
+                        )
+                    bill += net
+                    sold_lines.append((product, quantity, net))
+                except ValueError:
+                    print(f"{product.name} is out of stock.")
+                    if rejected is not None:
+                        rejected[product_id] = quantity
+
+            if self._ledger is not None and sold_lines:
+                with tracing.span("record_order", lines=len(sold_lines)):
+                    self._ledger.record_order(sold_lines)
 
-        for product_name, quantity in cart.items():
+        return bill
 
-            product = next(
-                (p for p in self._products if p.name == product_name)
+    @tracing.traced("Store.settle_orders")
+    @metrics.timed("store_settle_orders_seconds", "Latency of Store.settle_orders.")
+    def settle_orders(self, orders: list[dict[int, int]]) -> list[OrderResult]:
+        """
+        Takes many orders in one pass, see the orderqueue module. Orders are served in sequence,
+        a line is rejected if the stock left by the orders before it doesn't cover it.
+        The sold quantities of every product are taken in one decrement.
+        :param orders: One dictionary of product ids and quantities per order.
+        :return: The result of every order, totals in cents.
+        """
+        sold = [[] for _ in orders]
+        rejected = [{} for _ in orders]
+        # Product -> (order number, quantity) of every accepted line.
+        accepted = {}
+        left = {}
+
+        with self.batch():
+            for number, items in enumerate(orders):
+                for product_id, quantity in items.items():
+                    product = self._by_id.get(product_id)
+                    if product is None:
+                        rejected[number][product_id] = quantity
+                        continue
+
+                    stock = left.get(product_id)
+                    if stock is None:
+                        stock = product.quantity if product.is_active() else 0
+
+                    if quantity > stock or quantity > getattr(product, "maximum", quantity):
+                        rejected[number][product_id] = quantity
+                        continue
+
+                    left[product_id] = stock - quantity
+                    accepted.setdefault(product, []).append((number, quantity))
+
+            for product, lines in accepted.items():
+                lines = self._take(product, lines, rejected)
+                if not lines:
+                    continue
+
+                with tracing.span("apply_promotion", product_id=product.id, lines=len(lines)):
+                    nets = product.promotion.apply_promotion_cents_many(
+                        [product.price_cents] * len(lines), [quantity for _, quantity in lines]
+                    )
+
+                for (number, quantity), net in zip(lines, nets):
+                    sold[number].append((product, quantity, net))
+
+            if self._ledger is not None:
+                with tracing.span("record_order", orders=len(orders)):
+                    for lines in sold:
+                        if lines:
+                            self._ledger.record_order(lines)
+
+        return [
+            OrderResult(
+                total=sum(net for _, _, net in lines),
+                lines={product.id: quantity for product, quantity, _ in lines},
+                rejected=rejected[number],
             )
+            for number, lines in enumerate(sold)
+        ]
 
-            try:
-                # first check if product is in stock
-                product.buy(quantity)
-
-                # update bill if it's available
-                bill += product.promotion.apply_promotion(
-                    price=product.price,
-                    quantity=quantity
-                )
-            except ValueError:
-                print(f"{product.name} is out of stock.")
-
-        return bill
-
+    def _take(self, product: Product, lines: list, rejected: list) -> list:
+        """
+        Takes the summed quantity of the accepted lines of a product from its stock.
+        If the stock changed meanwhile, e.g. shared stock sold by another process, the lines
+        are taken one by one and the lines out of stock are moved to rejected.
+        :return: The lines taken.
+        """
+        before = product.locations
+
+        def buy(quantity):
+            allocation = None
+            if before and self._allocator is not None:
+                allocation = self._allocator.allocate(product, quantity)
+            product.buy(quantity, allocation)
+
+        try:
+            buy(sum(quantity for _, quantity in lines))
+            taken = lines
+        except ValueError:
+            taken = []
+            for number, quantity in lines:
+                try:
+                    buy(quantity)
+                    taken.append((number, quantity))
+                except ValueError:
+                    rejected[number][product.id] = quantity
+
+        self._mark(product)
+        if before:
+            self._update_location_totals(product.locations, before)
+
+        return taken
+
+    @tracing.traced("Store._finalize_order")
+    @metrics.timed("store_finalize_order_seconds", "Latency of Store._finalize_order.")
     def _finalize_order(self) -> None:
         """
         Finishes the order by printing the bill and the amount of items bought
@@ -297,8 +929,16 @@ class Store:
             quantity for quantity in self._shopping_cart.cart.values()
         )
 
+        if metrics.is_enabled():
+            metrics.REGISTRY.counter("store_orders_total", "Finalized orders.").inc()
+            metrics.REGISTRY.gauge(
+                "store_cart_size", "Different items in the last finalized cart."
+            ).set(len(self._shopping_cart))
+            metrics.REGISTRY.gauge("store_stock", "Sum of all finite product stock.").set(len(self))
+
         # Reset the cart
         self._shopping_cart.clear()
 
-        print("********")
-        print(f"Order made! Total payment: ${bill} for {amount_products} products.")
+        with tracing.span("print"):
+            print("********")
+            print(f"Order made! Total payment: ${money.format_cents(bill)} for {amount_products} products.")
@@ -0,0 +1,100 @@
+from threading import Thread
+from time import monotonic, sleep
+
+import pytest
+from admission import AdmissionControl, AdmissionRejected, TokenBucket
+from orderqueue import OrderQueue
+from products import Product, LimitedProduct
+from store import Store
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=100, burst=2)
+
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert 0 < bucket.wait_time() <= 0.01
+    assert bucket.wait_time(3) > bucket.wait_time(1)
+
+    sleep(0.02)
+    assert bucket.try_acquire()
+
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_waiting_requests_are_served_in_order():
+    shipping = LimitedProduct("Shipping", price=10, maximum=1)
+    Store([shipping])
+    admission = AdmissionControl(max_waiting=10, timeout=1)
+    admission.limit(shipping, rate=50)
+    admission.admit(shipping)
+    order = []
+
+    def buyer(number):
+        admission.admit(shipping)
+        order.append(number)
+
+    threads = []
+    for number in range(5):
+        threads.append(Thread(target=buyer, args=(number,)))
+        threads[-1].start()
+        sleep(0.002)
+    for thread in threads:
+        thread.join()
+
+    assert order == list(range(5))
+    assert admission.admitted == 6
+    assert admission.waiting(shipping) == 0
+
+
+def test_contention_fails_fast():
+    shipping = LimitedProduct("Shipping", price=10, maximum=1)
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    Store([shipping, mac])
+    admission = AdmissionControl(max_waiting=1, timeout=0.05)
+    admission.limit(shipping, rate=1)
+    admission.admit(shipping)
+
+    start = monotonic()
+    with pytest.raises(AdmissionRejected):
+        admission.admit(shipping)
+    assert monotonic() - start < 0.01
+
+    for _ in range(1000):
+        admission.admit(mac)
+    assert admission.rejected == 1
+    assert not admission.is_limited(mac)
+
+    with pytest.raises(ValueError):
+        admission.limit(Product("Loose", price=1, quantity=1), rate=1)
+
+
+def test_store_admits_cart_adds_and_checkout(capsys):
+    shipping = LimitedProduct("Shipping", price=10, maximum=1)
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    admission = AdmissionControl(max_waiting=0)
+    store = Store([shipping, mac], admission=admission)
+    admission.limit(shipping, rate=0.1)
+
+    # Frozen copies of the read view are limited like the live product.
+    assert admission.is_limited(store.read_view()[0])
+    store.shopping_cart.add_item(store.read_view()[0], 1)
+    store.shopping_cart.add_item(mac, 1)
+    assert store.shopping_cart.cart == {shipping.id: 1, mac.id: 1}
+
+    # The add took the only token, checkout doesn't take another one.
+    assert store._order() == 146000
+    assert admission.admitted == 1
+
+    store.shopping_cart.clear()
+    store.shopping_cart.add_item(shipping, 1)
+    assert "Shipping is in high demand, there is no capacity" in capsys.readouterr().out
+    assert store.shopping_cart.cart == {}
+
+    with OrderQueue(store) as queue:
+        with pytest.raises(AdmissionRejected):
+            queue.submit({shipping: 1})
+        assert queue.order({mac: 1}).total == 145000
+
+    store.close()
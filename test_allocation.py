@@ -0,0 +1,47 @@
+import pytest
+from allocation import Allocator, Location
+from products import Product
+from store import Store
+
+
+@pytest.fixture
+def store():
+    allocator = Allocator([
+        Location("Berlin", priority=2, cost=1),
+        Location("Hamburg", priority=1, cost=5),
+        Location("Munich", priority=3, cost=0.5),
+    ])
+    mac = Product("MacBook Air M2", price=1450, quantity=0)
+    store = Store([mac], allocator=allocator)
+    store.set_location_stock(mac, "Berlin", 10)
+    store.set_location_stock(mac, "Hamburg", 3)
+    store.set_location_stock(mac, "Munich", 7)
+    return store
+
+
+def test_order_is_split_by_priority(store):
+    mac = store.products[0]
+    store.shopping_cart.add_item(mac, 5)
+    store._order()
+
+    assert mac.quantity == 15
+    assert mac.locations == {"Berlin": 8, "Hamburg": 0, "Munich": 7}
+    assert store.location_totals == {"Berlin": 8, "Hamburg": 0, "Munich": 7}
+
+
+def test_allocation_by_cost(store):
+    allocator = Allocator(store._allocator.locations, strategy="cost")
+    assert allocator.allocate(store.products[0], 12) == {"Munich": 7, "Berlin": 5}
+
+    with pytest.raises(ValueError):
+        allocator.allocate(store.products[0], 21)
+
+
+def test_existing_stock_moves_to_default_location():
+    product = Product("Google Pixel 7", price=500, quantity=4)
+    product.set_location_stock("Berlin", 2)
+    product.quantity = 10
+    product.buy(7)
+
+    assert product.locations == {"default": 1, "Berlin": 2}
+    assert product.quantity == 3
@@ -0,0 +1,126 @@
+import random
+
+import pytest
+import changefeed
+from catalogindex import CatalogIndex
+from products import Product, NonStockedProduct, LimitedProduct
+from serialization import product_from_dict, product_to_dict
+from store import Store
+
+
+@pytest.fixture
+def store():
+    store = Store([
+        Product("Bose QuietComfort Earbuds", price=250, quantity=12),
+        Product("Sonos Era 100", price=299.99, quantity=0),
+        Product("Google Pixel 7", price=500, quantity=250),
+        NonStockedProduct("Spotify Premium", price=10.99),
+        LimitedProduct("Shipping", price=10, maximum=1),
+    ])
+    bose, sonos, pixel, spotify, _ = store.products
+    bose.set_tags(["audio", "wireless"])
+    bose.set_attribute("brand", "bose")
+    sonos.set_tags(["audio"])
+    pixel.set_tags(["phone", "wireless"])
+    spotify.add_tag("audio")
+    with store:
+        yield store
+
+
+def test_tags_and_attributes():
+    product = Product("Sonos Era 100", price=299, quantity=5)
+    product.set_tags(["audio", "speaker"])
+    product.set_attribute("brand", "sonos")
+    product.set_attribute("brand", "apple")
+    product.remove_tag("speaker")
+
+    assert product.tags == {"audio", "brand=apple"}
+    assert product.attributes == {"brand": "apple"}
+
+    other = Product("Other", price=1, quantity=1)
+    other.set_tags(["brand=apple", "audio"])
+    assert other.tags is product.tags
+
+    assert product_from_dict(product_to_dict(product)).tags == product.tags
+
+    with pytest.raises(TypeError):
+        product.set_tags("audio")
+    with pytest.raises(ValueError):
+        product.add_tag("")
+    with pytest.raises(ValueError):
+        product.set_attribute("a=b", "c")
+
+
+def test_query_intersects_tags_status_and_price(store):
+    bose, sonos, pixel, spotify, shipping = store.products
+
+    assert store.find_products(tags=["audio"], active=True, in_stock=True, max_price=300) == [bose, spotify]
+    assert store.find_products(tags="audio", in_stock=False) == [sonos]
+    assert store.find_products(any_tags=["phone", "audio"], min_price=299.99) == [sonos, pixel]
+    assert store.find_products(attributes={"brand": "bose"}) == [bose]
+    assert store.find_products(limited=True) == [shipping]
+    assert store.find_products(unlimited=True, limited=False) == [spotify]
+    assert store.find_products(tags=["unknown"]) == []
+    assert store.catalog_index().count(tags=["wireless"]) == 2
+    assert store.catalog_index().tags()["audio"] == 3
+
+
+def test_index_follows_changes(store):
+    bose, sonos, pixel, spotify, shipping = store.products
+    index = store.catalog_index()
+
+    bose.buy(12)
+    pixel.price = 199
+    sonos.quantity = 5
+    spotify.remove_tag("audio")
+
+    assert index.query(tags=["audio"], active=True, in_stock=True) == [sonos]
+    assert index.query(max_price=200, min_price=100) == [pixel]
+
+    store.remove_product(sonos)
+    added = Product("JBL Flip 6", price=129, quantity=3)
+    added.set_tags(["audio"])
+    store.add_product(added)
+
+    assert len(index) == 5
+    assert index.query(tags=["audio"], in_stock=True) == [added]
+
+
+def test_index_matches_linear_filter():
+    rng = random.Random(7)
+    products = []
+    for idx in range(2000):
+        product = Product(f"Product {idx}", price=rng.randint(0, 100000) / 100, quantity=rng.randint(0, 3))
+        product.set_tags(rng.sample(["audio", "video", "phone", "sale"], rng.randint(0, 2)))
+        products.append(product)
+
+    store = Store(products)
+    index = CatalogIndex(store)
+    try:
+        for product in rng.sample(products, 200):
+            product.price = rng.randint(0, 200000) / 100
+            product.quantity = rng.randint(0, 3)
+
+        for tag in ("audio", "video"):
+            for low, high in ((0, 300), (150.5, 150.5), (999.99, 5000)):
+                expected = [
+                    product for product in products
+                    if tag in product.tags and product.is_active() and product.quantity > 0
+                    and low <= product.price <= high
+                ]
+                assert index.query(
+                    tags=[tag], active=True, in_stock=True, min_price=low, max_price=high
+                ) == expected
+    finally:
+        index.close()
+
+
+def test_closing_the_store_unsubscribes_the_index():
+    store = Store([Product("Bose QuietComfort Earbuds", price=250, quantity=12)])
+    index = store.catalog_index()
+    assert changefeed.FEED.active
+
+    store.close()
+    assert not changefeed.FEED.active
+    assert store.catalog_index() is not index
+    store.close()
@@ -0,0 +1,99 @@
+import json
+import pytest
+from catalogsync import diff, apply_patch, fingerprint, Patch
+from products import Product, NonStockedProduct, LimitedProduct
+from promotion import PromotionDiscountPercent
+from serialization import product_from_dict, product_to_dict
+from store import Store
+
+
+def make_products():
+    return [
+        Product("MacBook Air M2", price=1450, quantity=100),
+        Product("Bose QuietComfort Earbuds", price=250, quantity=500),
+        Product("Google Pixel 7", price=500, quantity=250),
+        NonStockedProduct("Windows License", price=125),
+        LimitedProduct("Shipping", price=10, quantity=250, maximum=1),
+    ]
+
+
+def test_replica_is_kept_in_sync_by_patches(capsys):
+    primary = Store(make_products())
+    replica = Store([product_from_dict(product_to_dict(p)) for p in primary.products])
+    pixel = replica.products[2]
+    replica.shopping_cart.add_item(pixel, 2)
+    before = fingerprint(primary.products)
+    old = Store([product_from_dict(product_to_dict(p)) for p in primary.products])
+
+    mac, bose, _, _, shipping = primary.products
+    mac.price = 1399
+    bose.quantity = 0
+    bose.set_promotion(PromotionDiscountPercent("20% off", 20))
+    shipping.maximum = 2
+    shipping.set_tags(["logistics"])
+    primary.remove_product(primary.products[3])
+    primary.add_product(Product("Sony Headphones", price=99, quantity=5))
+
+    patch = diff(old, primary)
+    assert sorted(change["name"] for change in patch.changed) == [
+        "Bose QuietComfort Earbuds", "MacBook Air M2", "Shipping"
+    ]
+    assert set(patch.changed[0]) == {"name", "type", "price"}
+    assert patch.removed == ["Windows License"]
+    assert len(patch) == 5
+    shipped = diff(before, primary)
+    assert shipped.added == patch.added and shipped.removed == patch.removed
+    assert shipped.changed[0]["quantity"] == 100 and "locations" in shipped.changed[0]
+
+    # Ship the patch as JSON, the replica keeps its cart.
+    assert apply_patch(replica, json.loads(json.dumps(patch.to_dict()))) == 5
+    assert fingerprint(replica.products) == fingerprint(primary.products)
+    assert not replica.get_product(replica.products[1].id).is_active()
+    assert replica.shopping_cart[pixel] == 2
+    assert not diff(replica, primary)
+
+    # Full-state patches from a fingerprint bring a second replica to the same state.
+    assert apply_patch(old, shipped) == 5
+    assert fingerprint(old.products) == fingerprint(primary.products)
+
+
+def test_invalid_patch_changes_nothing():
+    store = Store(make_products())
+    state = fingerprint(store.products)
+    patch = Patch(
+        added=[{"name": "New", "price": 1, "quantity": 1}],
+        removed=[],
+        changed=[{"name": "MacBook Air M2", "type": "product", "price": -1}],
+    )
+
+    with pytest.raises(ValueError):
+        apply_patch(store, patch)
+
+    with pytest.raises(KeyError):
+        apply_patch(store, Patch(added=[], removed=["Unknown"], changed=[]))
+
+    assert fingerprint(store.products) == state
+
+
+def test_patch_located_stock():
+    def make_store():
+        mac = Product("MacBook Air M2", price=1450, quantity=0)
+        mac.set_location_stock("x", 4)
+        mac.set_location_stock("y", 6)
+        return Store([mac, Product("Google Pixel 7", price=500, quantity=250)])
+
+    primary, replica, old = make_store(), make_store(), make_store()
+    primary.set_location_stock(primary.products[0], "x", 5)
+    pixel = primary.products[1]
+    primary.set_location_stock(pixel, "north", 250)
+    primary.set_location_stock(pixel, "default", 0)
+
+    apply_patch(replica, diff(old, primary))
+    mac, pixel = replica.products
+    assert (mac.quantity, mac.locations) == (11, {"x": 5, "y": 6})
+    assert (pixel.quantity, pixel.locations) == (250, {"default": 0, "north": 250})
+    assert replica.location_totals == primary.location_totals == {"x": 5, "y": 6, "default": 0, "north": 250}
+    assert fingerprint(replica.products) == fingerprint(primary.products)
+
+    apply_patch(old, Patch(added=[], removed=[], changed=[{"name": mac.name, "type": "product", "quantity": 15}]))
+    assert (old.products[0].quantity, old.products[0].locations) == (15, {"x": 9, "y": 6})
@@ -0,0 +1,92 @@
+import pytest
+import changefeed
+from changefeed import ChangeFeed, StockDecremented, Restocked, Deactivated, Activated, FeedOverflow
+from products import Product
+from promotion import PromotionDiscountPercent
+
+
+@pytest.fixture
+def batches():
+    received = []
+    changefeed.FEED.subscribe(received.append)
+    yield received
+    changefeed.FEED.unsubscribe(received.append)
+
+
+def test_purchases_are_coalesced(batches):
+    product = Product("Airpods Pro 2", price=249, quantity=10)
+    for _ in range(10):
+        product.buy(1)
+    changefeed.FEED.flush()
+
+    assert len(batches) == 1
+    decremented, deactivated = batches[0]
+    assert isinstance(decremented, StockDecremented)
+    assert decremented.quantity == 10 and decremented.remaining == 0
+    assert isinstance(deactivated, Deactivated)
+
+
+def test_restock_activates(batches):
+    product = Product("Airpods Pro 2", price=249, quantity=1)
+    product.buy(1)
+    product.quantity = 5
+    changefeed.FEED.flush()
+
+    kinds = [type(event) for event in batches[0]]
+    assert kinds == [StockDecremented, Restocked, Activated]
+
+
+def test_filtered_subscriber(batches):
+    prices = []
+    changefeed.FEED.subscribe(prices.append, (changefeed.PriceChanged,))
+    product = Product("Airpods Pro 2", price=249, quantity=1)
+    product.price = 200
+    product.price = 150
+    product.set_promotion(PromotionDiscountPercent("20% off", 20))
+    changefeed.FEED.flush()
+    changefeed.FEED.unsubscribe(prices.append)
+
+    assert len(prices[0]) == 1
+    assert (prices[0][0].old, prices[0][0].new) == (249, 150)
+    assert len(batches[0]) == 2
+
+
+def test_overflow_is_reported():
+    feed = ChangeFeed(capacity=2)
+    received = []
+    feed.subscribe(received.append)
+    product = Product("Airpods Pro 2", price=249, quantity=1)
+    for quantity in range(3):
+        feed.publish(Restocked(product, quantity, quantity + 1, 0.0))
+    feed.flush()
+
+    assert received[0][0] == FeedOverflow(1, 0.0)
+    assert received[0][1].previous == 1
+
+
+def test_uncoalesced_subscriber(batches):
+    prices = []
+    changefeed.FEED.subscribe(prices.append, (changefeed.PriceChanged,), coalesced=False)
+    product = Product("Airpods Pro 2", price=249, quantity=1)
+    product.price = 200
+    product.price = 150
+    changefeed.FEED.flush()
+    changefeed.FEED.unsubscribe(prices.append)
+
+    assert [(event.old, event.new) for event in prices[0]] == [(249, 200), (200, 150)]
+    assert len(batches[0]) == 1
+
+
+def test_coalesced_stock_ends_at_the_latest_state(batches):
+    product = Product("Airpods Pro 2", price=249, quantity=20)
+    product.buy(5)
+    product.quantity = 25
+    product.buy(5)
+    changefeed.FEED.flush()
+
+    stock = None
+    for event in batches[0]:
+        stock = event.remaining if isinstance(event, StockDecremented) else event.quantity
+
+    assert [type(event) for event in batches[0]] == [Restocked, StockDecremented]
+    assert stock == product.quantity == 20
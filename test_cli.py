@@ -0,0 +1,92 @@
+import json
+import cli
+from products import Product, NonStockedProduct
+from promotion import PromotionDiscountPercent
+from serialization import read_products, save_products
+
+
+def test_import_order_and_totals(tmp_path, capsys):
+    source = tmp_path / "source.csv"
+    save_products([
+        Product("MacBook Air M2", price=1450, quantity=10),
+        NonStockedProduct("Windows License", price=125, promotion=PromotionDiscountPercent("30% off", 30)),
+    ], str(source))
+    catalog = str(tmp_path / "store.jsonl")
+
+    assert cli.main(["import", catalog, str(source)]) == 0
+
+    orders = tmp_path / "orders.jsonl"
+    orders.write_text(
+        json.dumps({"items": {"MacBook Air M2": 2, "Windows License": 2}}) + "\n"
+        + json.dumps({"items": {"Unknown": 1}}) + "\n"
+        + json.dumps({"items": {"MacBook Air M2": 9, "Windows License": 1}}) + "\n"
+        + json.dumps({"items": {"MacBook Air M2": 9}}) + "\n"
+    )
+    capsys.readouterr()
+    assert cli.main(["order", catalog, str(orders)]) == 0
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    assert results[0]["status"] == "ok" and results[0]["total_cents"] == 290000 + 17500
+    assert results[1]["status"] == "rejected"
+    assert results[2]["status"] == "partial" and results[2]["rejected"] == "MacBook Air M2: 9"
+    assert (results[2]["sold"], results[2]["total_cents"]) == (1, 8750)
+    assert results[3]["status"] == "rejected" and results[3]["sold"] == 0
+    assert [p.quantity for p in read_products(catalog)][0] == 8
+
+    assert cli.main(["totals", catalog]) == 0
+    assert json.loads(capsys.readouterr().out)["stock"] == 8
+
+
+def test_missing_catalog_fails(tmp_path, capsys):
+    assert cli.main(["list", str(tmp_path / "missing.jsonl")]) == 1
+
+
+def test_diff_and_patch(tmp_path, capsys):
+    old, new = str(tmp_path / "old.jsonl"), str(tmp_path / "new.csv")
+    save_products([Product("MacBook Air M2", price=1450, quantity=10)], old)
+    save_products([
+        Product("MacBook Air M2", price=1399, quantity=10),
+        Product("Google Pixel 7", price=500, quantity=250),
+    ], new)
+
+    assert cli.main(["diff", old, new]) == 0
+    patch = tmp_path / "patch.json"
+    patch.write_text(capsys.readouterr().out)
+
+    assert cli.main(["patch", old, str(patch)]) == 0
+    assert json.loads(capsys.readouterr().out) == {"patched": 2, "products": 2}
+    assert [(p.name, p.price) for p in read_products(old)] == [("MacBook Air M2", 1399), ("Google Pixel 7", 500)]
+
+
+def test_reprice(tmp_path, capsys):
+    catalog = str(tmp_path / "store.jsonl")
+    audio = Product("Bose QuietComfort Earbuds", price=250, quantity=12)
+    audio.set_tags(["audio"])
+    save_products([audio, Product("Google Pixel 7", price=500, quantity=250)], catalog)
+
+    prices = tmp_path / "prices.jsonl"
+    prices.write_text(json.dumps({
+        "name": "Google Pixel 7", "price": "450",
+        "promotion": {"type": "discount_percent", "name": "10% off", "percent": 10}
+    }) + "\n")
+
+    assert cli.main(["reprice", catalog, "--percent", "-20", "--tag", "audio", "--prices", str(prices)]) == 0
+    assert json.loads(capsys.readouterr().out) == {"repriced": 2, "products": 2}
+    bose, pixel = read_products(catalog)
+    assert (bose.price, pixel.price, pixel.promotion.name) == (200, 450, "10% off")
+    assert isinstance(pixel.price, int)
+
+
+def test_located_stock_round_trips(tmp_path):
+    catalog = str(tmp_path / "store.jsonl")
+    mac = Product("MacBook Air M2", price=1450, quantity=0)
+    mac.set_location_stock("x", 4)
+    mac.set_location_stock("y", 6)
+    idle = Product("Google Pixel 7", price=500, quantity=0)
+    idle.set_location_stock("x", 3)
+    idle.deactivate()
+    save_products([mac, idle], catalog)
+
+    mac, idle = read_products(catalog)
+    assert (mac.quantity, mac.locations) == (10, {"x": 4, "y": 6})
+    assert (idle.quantity, idle.is_active()) == (3, False)
@@ -0,0 +1,34 @@
+from differential import PATHS, make_case, run
+from promotion import PromotionEveryXFree
+from store import Store
+
+
+def test_optimized_paths_match_the_reference():
+    report = run(cases=300, seed=11)
+
+    assert report.divergences == []
+    assert set(report.timings) == set(PATHS)
+
+
+def test_cases_are_reproducible():
+    first, first_lines = make_case(5)
+    second, second_lines = make_case(5)
+
+    assert first_lines == second_lines
+    assert [str(product) for product in first] == [str(product) for product in second]
+    assert not set(map(id, first)) & set(map(id, second))
+
+
+def test_divergences_are_reported(monkeypatch):
+    apply_many = PromotionEveryXFree.apply_promotion_cents_many
+    monkeypatch.setattr(
+        PromotionEveryXFree, "apply_promotion_cents_many",
+        lambda self, prices, quantities: [total + 1 for total in apply_many(self, prices, quantities)]
+    )
+    monkeypatch.setattr(Store, "_order", lambda self: 0)
+
+    report = run(cases=50)
+    paths = {divergence.path for divergence in report.divergences}
+
+    assert {"promotion_cents_many", "order"} <= paths
+    assert "promotion_cents" not in paths
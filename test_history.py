@@ -0,0 +1,108 @@
+import random
+from time import sleep, time
+
+import pytest
+import changefeed
+from changefeed import ChangeFeed, Restocked
+from history import BLOCK_SIZE, InventoryHistory, TimeSeries
+from products import Product, NonStockedProduct
+from store import Store
+
+
+def test_time_series_matches_linear_scan():
+    rng = random.Random(3)
+    series = TimeSeries()
+    changes = []
+    when, value = 1_700_000_000_000, 100
+
+    for _ in range(10 * BLOCK_SIZE + 5):
+        when += rng.randint(0, 3_600_000)
+        value = max(0, value + rng.randint(-20, 20))
+        if series.append(when, value):
+            changes.append((when, value))
+
+    assert list(series) == changes
+    assert len(series) == len(changes)
+    assert series.nbytes < 6 * len(changes)
+    assert series.at(changes[0][0] - 1) is None
+
+    for probe in rng.sample(range(changes[0][0], when + 10), 200):
+        expected = [change_value for change_time, change_value in changes if change_time <= probe][-1]
+        assert series.at(probe) == expected
+
+        end = probe + rng.randint(0, 50_000_000)
+        assert series.between(probe, end) == [change for change in changes if probe <= change[0] <= end]
+
+
+def test_history_records_every_change():
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    windows = NonStockedProduct("Windows License", price=125)
+    store = Store([mac, windows])
+    history = InventoryHistory(store)
+
+    try:
+        sleep(0.01)
+        start = time()
+        sleep(0.01)
+        mac.buy(10)
+        mac.buy(5)
+        middle = time()
+        sleep(0.01)
+        mac.price = 1300
+        mac.price = 1199.99
+        mac.quantity = 120
+        end = time()
+
+        assert history.stock_at(mac, start) == 100
+        assert history.stock_at(mac.id, middle) == 85
+        assert history.stock_at(mac, end) == 120
+        assert [stock for _, stock in history.stock_changes(mac, start, end)] == [90, 85, 120]
+        assert history.price_at(mac, middle) == 1450
+        assert [price for _, price in history.price_changes(mac, middle, end)] == [1300, 1199.99]
+        assert history.stock_at(windows, end) is None
+        assert history.price_at(mac, start - 60) is None
+
+        with pytest.raises(TypeError):
+            history.stock_at("MacBook Air M2", end)
+    finally:
+        history.close()
+
+
+def test_overflow_records_the_current_state():
+    feed = ChangeFeed(capacity=2)
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    history = InventoryHistory(Store([mac]), feed)
+
+    for quantity in (101, 102, 103):
+        feed.publish(Restocked(mac, quantity - 1, quantity, time()))
+    mac._quantity = 150
+    feed.flush()
+
+    assert history.stock_at(mac, time()) == 150
+    assert not changefeed.FEED.active
+    history.close()
+
+
+def test_history_watches_the_store():
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+    other = Product("Bose QuietComfort Earbuds", price=250, quantity=500)
+    store = Store([mac])
+    Store([other])
+    history = InventoryHistory(store)
+
+    try:
+        store.add_product(pixel)
+        pixel.buy(10)
+        other.buy(10)
+        store.remove_product(mac)
+        mac.buy(10)
+        now = time()
+
+        assert history.stock_at(pixel, now) == 240
+        assert history.stock_at(other, now) is None
+        assert history.stock_at(mac, now) == 100
+    finally:
+        store.close()
+
+    assert not changefeed.FEED.active
@@ -0,0 +1,77 @@
+import pytest
+from lazycatalog import LazyCatalog, LazyLimitedProduct
+from products import Product, NonStockedProduct, LimitedProduct
+from promotion import PromotionDiscountPercent
+from serialization import product_to_dict, save_products
+from store import Store
+
+
+@pytest.fixture
+def originals():
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    mac.set_tags(["laptop"])
+    bose = Product("Bose QuietComfort Earbuds", price=250.5, quantity=500)
+    bose.set_location_stock("north", 20)
+    windows = NonStockedProduct("Windows License", price=125,
+                                promotion=PromotionDiscountPercent("30% off", 30))
+    shipping = LimitedProduct("Shipping", price=10, maximum=1)
+    return [mac, bose, windows, shipping]
+
+
+@pytest.fixture
+def catalog(tmp_path, originals):
+    path = str(tmp_path / "catalog.jsonl")
+    save_products(originals, path)
+    with LazyCatalog(path, capacity=2, hot_loads=3) as catalog:
+        yield catalog
+
+
+def test_products_load_on_first_access(catalog, originals):
+    store = Store(catalog.products())
+
+    assert catalog.loaded == 0
+    assert store.location_totals == {"default": 500, "north": 20}
+    assert isinstance(store.products[3], LimitedProduct)
+    assert isinstance(store.products[3], LazyLimitedProduct)
+    assert not hasattr(store.products[0], "maximum")
+
+    assert [product_to_dict(product) for product in store.products] == list(map(product_to_dict, originals))
+    assert catalog.loaded == 2
+    assert catalog.evictions == 2
+    assert catalog[1] is store.products[1]
+
+
+def test_changed_products_are_pinned(catalog):
+    mac, bose, windows, shipping = store_products = catalog.products()
+    store = Store(store_products)
+
+    store.shopping_cart.add_item(mac, 2)
+    store.shopping_cart.add_item(shipping, 1)
+    store.shopping_cart.add_item(shipping, 1)
+    assert store._order() == 2 * 145000 + 1000
+
+    # Loading the others evicts the unchanged products only.
+    for product in (bose, windows, bose, windows):
+        assert product.price > 0
+    assert catalog.pinned == 1
+    assert mac.quantity == 98
+
+
+def test_hot_products_are_pinned(catalog):
+    products = catalog.products()
+
+    for _ in range(3):
+        for product in products:
+            assert product.name
+
+    # The first two products are reloaded every round, the last two stay in the LRU in the last round.
+    assert catalog.pinned == 2
+    assert catalog.loads == 10
+
+    catalog.unpin(products[0])
+    catalog.unpin(products[2])
+    assert catalog.pinned == 1
+    assert catalog.loaded == 3
+
+    with pytest.raises(ValueError):
+        catalog.pin(Product("Loose", price=1, quantity=1))
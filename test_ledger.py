@@ -0,0 +1,78 @@
+import pytest
+from ledger import Ledger
+from products import Product
+from promotion import PromotionDiscountPercent
+from store import Store
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    with Ledger(str(tmp_path / "orders.ledger")) as ledger:
+        yield ledger
+
+
+def test_orders_are_recorded(ledger, capsys):
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    bose = Product(
+        "Bose QuietComfort Earbuds", price=250, quantity=500,
+        promotion=PromotionDiscountPercent("20% off", 20)
+    )
+    store = Store([mac, bose], ledger=ledger)
+
+    for _ in range(2):
+        store.shopping_cart.add_item(mac, 1)
+        store.shopping_cart.add_item(bose, 2)
+        store._finalize_order()
+
+    assert len(ledger) == 4
+    records = list(ledger.records())
+    assert [record.order_id for record in records] == [0, 0, 1, 1]
+    assert records[1].product == "Bose QuietComfort Earbuds"
+    assert records[1].net == 40000 and records[1].unit_price == 25000
+
+    assert ledger.revenue_by_product() == {"MacBook Air M2": 290000, "Bose QuietComfort Earbuds": 80000}
+    assert ledger.revenue_by_promotion() == {"No Promotion": 290000, "20% off": 80000}
+
+
+def test_revenue_by_time_and_reopen(tmp_path):
+    path = str(tmp_path / "orders.ledger")
+    mac = Product("MacBook Air M2", price=10, quantity=100)
+
+    with Ledger(path) as ledger:
+        ledger.record_order([(mac, 1, 1000)], timestamp=3600)
+        ledger.record_order([(mac, 2, 2000)], timestamp=3700)
+
+    with Ledger(path) as ledger:
+        assert ledger.record_order([(mac, 3, 3000)], timestamp=7300) == 2
+        assert ledger.revenue_by_time(3600) == {3600: 3000, 7200: 3000}
+        assert ledger.revenue_by_product() == {"MacBook Air M2": 6000}
+
+
+def test_renamed_products_keep_their_history(ledger):
+    mac = Product("MacBook Air M2", price=10, quantity=100)
+    Store([mac])
+
+    ledger.record_order([(mac, 1, 1000)], timestamp=3600)
+    mac.name = "MacBook Air M3"
+    ledger.record_order([(mac, 1, 1500)], timestamp=3700)
+
+    assert ledger.revenue_by_product() == {"MacBook Air M3": 2500}
+    assert [record.product for record in ledger.records()] == ["MacBook Air M3"] * 2
+
+
+def test_history_is_found_with_another_catalog_order(tmp_path):
+    path = str(tmp_path / "orders.ledger")
+    mac = Product("MacBook Air M2", price=10, quantity=100)
+    Store([mac, Product("Google Pixel 7", price=5, quantity=100)])
+
+    with Ledger(path) as ledger:
+        ledger.record_order([(mac, 2, 2000)], timestamp=3600)
+
+    # Another process loads the catalog in another order, the products get other ids.
+    pixel = Product("Google Pixel 7", price=5, quantity=100)
+    mac = Product("MacBook Air M2", price=10, quantity=100)
+    Store([pixel, mac])
+
+    with Ledger(path) as ledger:
+        ledger.record_order([(pixel, 1, 500)], timestamp=3700)
+        assert ledger.revenue_by_product() == {"MacBook Air M2": 2000, "Google Pixel 7": 500}
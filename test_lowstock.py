@@ -0,0 +1,73 @@
+import pytest
+from lowstock import IndexedMinHeap, LowStockMonitor
+from products import Product, NonStockedProduct
+from store import Store
+
+
+def test_indexed_heap_updates_and_removals():
+    heap = IndexedMinHeap()
+    for key, item in [(5, "a"), (3, "b"), (8, "c"), (1, "d")]:
+        heap.push(item, key)
+
+    heap.push("c", 0)
+    heap.remove("d")
+
+    assert heap.peek() == (0, "c")
+    assert heap.items_up_to(4) == [(0, "c"), (3, "b")]
+    assert len(heap) == 3 and "d" not in heap
+
+
+@pytest.fixture
+def store():
+    return Store([
+        Product("MacBook Air M2", price=1450, quantity=100),
+        Product("Bose QuietComfort Earbuds", price=250, quantity=12),
+        NonStockedProduct("Windows License", price=125),
+    ])
+
+
+def test_monitor_follows_purchases(store):
+    mac, bose, _ = store.products
+    monitor = LowStockMonitor(store, default_reorder_point=10)
+    try:
+        assert monitor.low_stock() == []
+
+        bose.buy(12)
+        monitor.set_reorder_point(mac, 95, target=150)
+        mac.buy(5)
+
+        assert monitor.low_stock() == [bose, mac]
+        assert monitor.plan() == {bose: 20, mac: 55}
+
+        assert monitor.replenish() == 75
+        assert bose.is_active() and bose.quantity == 20
+        assert monitor.low_stock() == []
+    finally:
+        monitor.close()
+
+
+def test_restock_validates_whole_plan(store):
+    mac, bose, license_ = store.products
+    with pytest.raises(ValueError):
+        store.restock({mac: 5, license_: 5})
+    assert mac.quantity == 100
+
+    with pytest.raises(ValueError):
+        store.restock({Product("Unknown", price=1, quantity=1): 1})
+
+
+def test_monitor_watches_the_store(store):
+    with store:
+        monitor = LowStockMonitor(store, default_reorder_point=10)
+        airpods = Product("Airpods Pro 2", price=249, quantity=3)
+        store.add_product(airpods)
+        assert monitor.low_stock() == [airpods]
+
+        store.remove_product(airpods)
+        assert monitor.low_stock() == []
+
+    # Closing the store closed the monitor.
+    store.products[1].buy(12)
+    assert monitor.low_stock() == []
+    with pytest.raises(ValueError, match="at least 0"):
+        store.restock({store.products[0]: -1})
@@ -0,0 +1,38 @@
+from products import Product, NonStockedProduct, LimitedProduct
+from promotion import NoPromotion, PromotionDiscountPercent, PromotionEveryXFree
+from store import Store
+
+CATALOG_SIZE = 10 ** 6
+
+
+def test_hierarchy_has_no_instance_dict():
+    instances = [
+        Product("MacBook Air M2", price=1450, quantity=100),
+        NonStockedProduct("Windows License", price=125),
+        LimitedProduct("Shipping", price=10, maximum=1),
+        NoPromotion("No Promotion"),
+        PromotionDiscountPercent("20% off", 20),
+        PromotionEveryXFree("Buy two, get one free", 3),
+    ]
+    for instance in instances:
+        assert not hasattr(instance, "__dict__")
+
+
+def test_shared_promotions_are_flyweights():
+    assert PromotionDiscountPercent.shared("20% off", 20) is PromotionDiscountPercent.shared("20% off", 20)
+    assert PromotionDiscountPercent.shared("20% off", 20) is not PromotionDiscountPercent.shared("20% off", 30)
+
+
+def test_bytes_per_product():
+    promotion = PromotionDiscountPercent.shared("20% off", 20)
+    store = Store([
+        Product(f"Product {idx}", price=idx % 2000, quantity=100, promotion=promotion)
+        for idx in range(CATALOG_SIZE)
+    ])
+    report = store.memory_report()
+
+    assert report["Product"]["count"] == CATALOG_SIZE
+    assert report["promotions"]["count"] == 1
+    # 8 slots: id, name, price, quantity, promotion, active, locations and tags.
+    assert report["Product"]["bytes"] / CATALOG_SIZE <= 96
+    assert report["total"]["bytes"] / CATALOG_SIZE <= 168
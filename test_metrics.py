@@ -0,0 +1,49 @@
+import pytest
+import metrics
+from products import Product
+from store import Store
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.REGISTRY.clear()
+    metrics.enable()
+    yield metrics.REGISTRY
+    metrics.disable()
+    metrics.REGISTRY.clear()
+
+
+def test_disabled_records_nothing():
+    metrics.REGISTRY.clear()
+    product = Product("Airpods Pro 2", price=249, quantity=200)
+    product.buy(1)
+    assert metrics.REGISTRY.render() == "\n"
+
+
+def test_histogram_buckets():
+    histogram = metrics.Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2):
+        histogram.observe(value)
+    lines = list(histogram.samples("latency_seconds", ()))
+    assert lines[:3] == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1.0"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+    ]
+    assert lines[-1] == "latency_seconds_count 4"
+
+
+def test_order_is_instrumented(enabled_metrics, tmp_path, capsys):
+    product = Product("Airpods Pro 2", price=249, quantity=200)
+    store = Store([product])
+    store.shopping_cart.add_item(product, 3)
+    store._finalize_order()
+
+    path = tmp_path / "metrics.prom"
+    metrics.write_prometheus(str(path))
+    text = path.read_text()
+
+    assert "product_units_sold_total 3" in text
+    assert "store_orders_total 1" in text
+    assert "store_stock 197" in text
+    assert "store_order_seconds_count 1" in text
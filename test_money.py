@@ -0,0 +1,33 @@
+import money
+from promotion import NoPromotion, PromotionDiscountPercent, PromotionEveryXFree
+
+
+def test_conversion_and_formatting():
+    assert money.to_cents(1450) == 145000
+    assert money.to_cents(0.1 + 0.2) == 30
+    assert money.format_cents(145000) == "1450.00"
+    assert money.format_cents(-5) == "-0.05"
+    assert money.ratio(20) == (1, 5)
+    assert money.ratio(12.5) == (1, 8)
+
+
+def test_promotions_in_cents_are_exact_and_batched():
+    discount = PromotionDiscountPercent("30% off", 30)
+    third_free = PromotionEveryXFree("Third one free", 3)
+    half_off = PromotionEveryXFree("Second half price", 2, 50)
+
+    # 30% of 3 * 33 cents is 29.7 cents, the discount is rounded to 30 cents.
+    assert discount.apply_promotion_cents(33, 3) == 69
+    assert third_free.apply_promotion_cents(999, 7) == 5 * 999
+    # Half of 1 cent is rounded half-up.
+    assert half_off.apply_promotion_cents(1, 2) == 1
+
+    prices, quantities = [33, 999, 12345], [3, 7, 11]
+    for promotion in (NoPromotion("None"), discount, third_free, half_off):
+        assert promotion.apply_promotion_cents_many(prices, quantities) == [
+            promotion.apply_promotion_cents(price, quantity)
+            for price, quantity in zip(prices, quantities)
+        ]
+
+    lines = [(discount, 33, 3), (third_free, 999, 7), (discount, 100, 1)]
+    assert money.bill_cents(lines) == 69 + 5 * 999 + 70
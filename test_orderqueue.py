@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from ledger import Ledger
+from orderqueue import OrderQueue, OrderResult
+from products import Product, NonStockedProduct, LimitedProduct
+from promotion import PromotionEveryXFree
+from store import Store
+
+
+@pytest.fixture
+def store():
+    return Store([
+        Product("MacBook Air M2", price=1450, quantity=3),
+        Product("Bose QuietComfort Earbuds", price=250, quantity=500,
+                promotion=PromotionEveryXFree("Second one free", 2)),
+        NonStockedProduct("Windows License", price=125),
+        LimitedProduct("Shipping", price=10, maximum=1),
+    ])
+
+
+def test_settle_orders_merges_decrements(store, tmp_path):
+    mac, bose, windows, shipping = store.products
+    ledger = Ledger(str(tmp_path / "orders.ledger"))
+    store = Store(store.products, ledger=ledger)
+
+    results = store.settle_orders([
+        {mac.id: 2, bose.id: 2, shipping.id: 1},
+        {mac.id: 2, bose.id: 3},
+        {mac.id: 1, windows.id: 4, shipping.id: 2},
+    ])
+
+    assert results == [
+        OrderResult(total=290000 + 25000 + 1000, lines={mac.id: 2, bose.id: 2, shipping.id: 1}, rejected={}),
+        OrderResult(total=50000, lines={bose.id: 3}, rejected={mac.id: 2}),
+        OrderResult(total=145000 + 50000, lines={mac.id: 1, windows.id: 4}, rejected={shipping.id: 2}),
+    ]
+    assert mac.quantity == 0 and not mac.is_active()
+    assert bose.quantity == 495
+    assert [record.order_id for record in ledger.records()] == [0, 0, 0, 1, 2, 2]
+    ledger.close()
+
+
+def test_queue_batches_concurrent_orders(store):
+    mac, bose, _, _ = store.products
+
+    with OrderQueue(store, window=0.05, max_batch=8) as queue:
+        with ThreadPoolExecutor(max_workers=8) as clients:
+            results = list(clients.map(lambda _: queue.order({bose: 2}), range(16)))
+
+        assert queue.orders == 16 and queue.batches < 16
+        assert all(result.total == 25000 for result in results)
+        assert bose.quantity == 500 - 32
+
+        # Stock runs out in submission order.
+        futures = [queue.submit({mac.id: 2}) for _ in range(2)]
+        assert [future.result().lines for future in futures] == [{mac.id: 2}, {}]
+
+        with pytest.raises(KeyError):
+            queue.submit({10 ** 9: 1})
+        with pytest.raises(ValueError):
+            queue.submit({bose: 0})
+
+    with pytest.raises(RuntimeError):
+        queue.submit({bose: 1})
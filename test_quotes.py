@@ -0,0 +1,79 @@
+import itertools
+import random
+
+import pytest
+from products import Product, LimitedProduct
+from promotion import NoPromotion, PromotionEveryXFree, PromotionDiscountPercent
+from quotes import line_cost, quote_each, quote_at_least, quote_budget
+from store import Store
+
+
+@pytest.fixture
+def store():
+    with Store([
+        Product("USB Cable", price=10, quantity=100, promotion=PromotionEveryXFree("Third one free", 3)),
+        Product("Braided Cable", price=9, quantity=4),
+        LimitedProduct("Charger", price=20, quantity=50, maximum=2,
+                       promotion=PromotionDiscountPercent("50% off", 50)),
+    ]) as store:
+        yield store
+
+
+def test_cheapest_quotes_use_price_cliffs(store):
+    usb, braided, charger = store.products
+
+    # Two cables cost as much as three.
+    quote = quote_each(store, {usb: 2})
+    assert quote.items == {usb: 3} and quote.total == 2000
+
+    # Five cables: three USB cables for 20 and two braided ones for 18.
+    quote = quote_at_least(store, 5, [usb, braided])
+    assert quote.items == {usb: 3, braided: 2} and quote.total == 3800
+
+    quote = quote_at_least(store, 10)
+    assert quote.items == {usb: 9, braided: 1} and quote.total == 6900
+
+    # Chargers are capped by the maximum per order.
+    with pytest.raises(ValueError):
+        quote_each(store, {charger: 3})
+
+    with pytest.raises(ValueError):
+        quote_at_least(store, 3, [charger])
+
+
+def test_budget_quote(store):
+    usb, braided, charger = store.products
+
+    assert quote_budget(store, 4000) == ({usb: 6}, 4000, 6)
+    assert quote_budget(store, 3900) == ({usb: 3, braided: 2}, 3800, 5)
+    assert quote_budget(store, 5).units == 0
+
+
+def test_quotes_match_a_brute_force_search():
+    rng = random.Random(5)
+
+    for _ in range(30):
+        promotions = [NoPromotion("No Promotion"), PromotionEveryXFree("Third one free", 3),
+                      PromotionDiscountPercent("50% off", 50)]
+        with Store([
+            Product(f"Cable {idx}", price=rng.randint(1, 20), quantity=rng.randint(0, 6),
+                    promotion=rng.choice(promotions))
+            for idx in range(4)
+        ]) as store:
+            products = store.products
+            carts = [
+                dict(zip(products, quantities))
+                for quantities in itertools.product(*(range(product.quantity + 1) for product in products))
+            ]
+            units, budget = rng.randint(1, 12), rng.randint(0, 8000)
+
+            fitting = [cart for cart in carts if sum(cart.values()) >= units]
+            if fitting:
+                cheapest = min(sum(line_cost(p, q) for p, q in cart.items()) for cart in fitting)
+                assert quote_at_least(store, units).total == cheapest
+
+            affordable = [
+                (sum(cart.values()), -sum(line_cost(p, q) for p, q in cart.items())) for cart in carts
+            ]
+            most, cost = max(pair for pair in affordable if -pair[1] <= budget)
+            assert (quote_budget(store, budget).units, quote_budget(store, budget).total) == (most, -cost)
@@ -0,0 +1,92 @@
+import gc
+import threading
+import weakref
+from products import Product
+from readview import CHUNK_SIZE
+from store import Store
+
+
+def make_store(size=3 * CHUNK_SIZE):
+    return Store([Product(f"Product {idx}", price=10, quantity=100) for idx in range(size)])
+
+
+def test_views_are_versioned_and_share_unchanged_chunks():
+    store = make_store()
+    first = store.read_view()
+    last = store.products[-1]
+
+    store.restock({last: 5})
+    second = store.read_view()
+
+    assert second.version == first.version + 1
+    assert first[len(first) - 1].quantity == 100 and second[len(second) - 1].quantity == 105
+    assert second._chunks[0] is first._chunks[0]
+
+    with store.batch():
+        store.add_product(Product("New", price=1, quantity=1))
+        store.remove_product(store.products[0])
+        store.products[1].price = 20
+        store.touch(store.products[1])
+        assert store.read_view() is second
+
+    third = store.read_view()
+    assert third.version == second.version + 1
+    assert [p.name for p in third][-1] == "New" and len(third) == len(store.products)
+    assert third[1].price == 20 and second[2].price == 10
+
+    # Unreferenced versions are reclaimed.
+    reference = weakref.ref(first)
+    del first
+    gc.collect()
+    assert reference() is None
+    store.close()
+
+
+def test_readers_never_see_half_applied_batches():
+    store = make_store(2 * CHUNK_SIZE)
+    first, second = store.products[0], store.products[-1]
+    store.read_view()
+    done = threading.Event()
+    torn = []
+
+    def read():
+        while not done.is_set():
+            view = store.read_view()
+            if view[0].quantity != view[len(view) - 1].quantity:
+                torn.append(view.version)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    for _ in range(500):
+        store.restock({first: 1, second: 1})
+    done.set()
+    reader.join()
+
+    assert not torn
+    assert store.read_view().version == 500
+    store.close()
+
+
+def test_listings_show_changes_made_through_setters(capsys):
+    with make_store(3) as store:
+        first = store.read_view()
+        product = store.products[1]
+        product.price = 25
+        product.quantity = 7
+
+        store.show_all_products()
+        assert "Product 1, Price: 25, Quantity: 7" in capsys.readouterr().out
+        assert store.read_view().version == first.version + 1 and first[1].price == 10
+
+        # The listings hold frozen copies, unchanged by the next checkout.
+        listed = store.get_all_available_products_for_current_cart()
+        assert listed[1] is not product and listed[1].quantity == 7
+        store.shopping_cart.add_item(product, 2)
+        store._order()
+        assert product.quantity == 5 and listed[1].quantity == 7
+        assert store.get_all_available_products()[1].quantity == 5
+
+    # Closing drops the view, the next one is built from the live products.
+    product.price = 30
+    with store:
+        assert store.read_view()[1].price == 30
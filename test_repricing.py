@@ -0,0 +1,65 @@
+import pytest
+from catalogindex import CatalogIndex
+from products import Product, LimitedProduct
+from promotion import PromotionDiscountPercent
+from repricing import PercentChange, reprice
+from store import Store
+
+
+@pytest.fixture
+def store():
+    products = [Product(f"Product {idx}", price=10 + idx, quantity=5) for idx in range(50)]
+    products.append(LimitedProduct("Shipping", price=10, maximum=1))
+    for product in products[:10]:
+        product.set_tags(["audio"])
+    with Store(products) as store:
+        yield store
+
+
+def test_reprice_by_rule_mapping_and_promotion(store):
+    first, second = store.products[:2]
+    view = store.read_view()
+    sale = PromotionDiscountPercent.shared("20% off", 20)
+
+    changed = reprice(
+        store,
+        prices={second.id: 99, "Shipping": 12.5},
+        promotions={first: sale},
+        rule=PercentChange(-10, tags=["audio"]),
+        chunk_size=4,
+    )
+
+    assert changed == 11
+    assert first.price == 9 and isinstance(first.price, int) and first.promotion is sale
+    assert second.price == 99
+    assert store.products[9].price == 17.1
+    assert store.products[10].price == 20
+    assert store.products[-1].price == 12.5
+    # One read view per chunk of 4 changed products.
+    assert store.read_view().version == view.version + 3
+    assert store.read_view()[1].price == 99
+
+
+def test_invalid_batch_changes_nothing(store):
+    first = store.products[0]
+
+    with pytest.raises(ValueError):
+        reprice(store, prices={first.id: 5, "Product 1": -1}, rule=PercentChange(50))
+    with pytest.raises(KeyError):
+        reprice(store, prices={"Unknown": 5, first.id: 5})
+    with pytest.raises(TypeError):
+        reprice(store, prices={first.id: 5}, promotions={"Product 1": "20% off"})
+    with pytest.raises(ValueError):
+        PercentChange(-150)
+
+    assert [product.price for product in store.products[:2]] == [10, 11]
+
+
+def test_reprice_updates_index_and_runs_on_processes(store):
+    index = CatalogIndex(store)
+    try:
+        assert reprice(store, rule=PercentChange(100, tags=["audio"]), chunk_size=3, processes=2) == 10
+        assert [product.price for product in store.products[:3]] == [20, 22, 24]
+        assert len(index.query(tags=["audio"], min_price=20)) == 10
+    finally:
+        index.close()
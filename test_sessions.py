@@ -0,0 +1,97 @@
+import gc
+
+import pytest
+from products import Product, LimitedProduct
+from sessions import SessionStore, decode_cart, encode_cart
+from store import Store
+
+
+def test_encoding_round_trips():
+    for cart in ({}, {3: 1, 1: 2, 2: 5}, {10 ** 9: 7, 0: -1, 5: 1.5, 6: 2.0}):
+        decoded = decode_cart(encode_cart(cart))
+        assert decoded == cart
+        assert list(decoded) == list(cart)
+
+    assert len(encode_cart({10: 1, 11: 2, 12: 1})) == 8
+
+    with pytest.raises(ValueError):
+        decode_cart(b"")
+    with pytest.raises(ValueError):
+        decode_cart(encode_cart({1: 200})[:-1])
+    with pytest.raises(TypeError):
+        encode_cart({"mac": 1})
+
+
+def test_carts_persist_and_restore_lazily(tmp_path):
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    shipping = LimitedProduct("Shipping", price=10, maximum=1)
+    store = Store([mac, shipping])
+    path = str(tmp_path / "sessions.db")
+
+    with SessionStore(path, store, commit_every=2) as sessions:
+        store.shopping_cart = sessions.cart("alice")
+        store.shopping_cart.add_item(mac, 2)
+        store.shopping_cart.add_item(shipping, 1)
+        sessions.cart("bob").add_item(mac, 1)
+        sessions.cart("bob").clear()
+
+        assert sessions.cart("alice") is store.shopping_cart
+        assert len(sessions) == 1
+
+    with SessionStore(path, store) as sessions:
+        assert sessions.sessions() == ["alice"]
+        assert "bob" not in sessions
+        cart = sessions.cart("alice")
+        assert cart.cart == {mac.id: 2, shipping.id: 1}
+
+        # Unused carts are dropped from memory and loaded again.
+        cart.add_item(mac, 1)
+        del cart
+        gc.collect()
+        assert sessions.cart("alice").cart == {mac.id: 3, shipping.id: 1}
+
+    # Lines of products the store doesn't have are dropped on restore.
+    with SessionStore(path, Store([mac])) as sessions:
+        assert sessions.cart("alice").cart == {mac.id: 3}
+
+
+def test_carts_restore_by_product_name(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+    store = Store([mac, pixel])
+
+    with SessionStore(path, store) as sessions:
+        sessions.cart("alice").add_item(pixel, 2)
+        sessions.cart("alice").add_item(mac, 1)
+
+    # Another process loads the catalog in another order, its products get other ids.
+    catalog = [Product("Bose QuietComfort Earbuds", price=250, quantity=500),
+               Product("Google Pixel 7", price=500, quantity=250),
+               Product("MacBook Air M2", price=1450, quantity=100)]
+    restored = Store(catalog)
+    assert catalog[1].id != pixel.id
+
+    with SessionStore(path, restored) as sessions:
+        assert sessions.cart("alice").cart == {catalog[1].id: 2, catalog[2].id: 1}
+
+
+def test_restores_follow_the_catalog(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+
+    with SessionStore(path, Store([mac, pixel])) as sessions:
+        sessions.cart("alice").add_item(mac, 1)
+        sessions.cart("bob").add_item(pixel, 2)
+
+    store = Store([mac])
+    with SessionStore(path, store) as sessions:
+        assert sessions.cart("alice").cart == {mac.id: 1}
+
+        # Products added or removed after the first restore are seen without a rescan.
+        store.add_product(pixel)
+        store.remove_product(mac)
+        assert sessions.cart("bob").cart == {pixel.id: 2}
+        gc.collect()
+        assert sessions.cart("alice").cart == {}
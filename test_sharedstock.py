@@ -0,0 +1,59 @@
+import multiprocessing
+import pytest
+from products import Product, NonStockedProduct
+from sharedstock import SharedStockTable
+
+WORKERS = 4
+STOCK = 2000
+
+
+@pytest.fixture
+def table():
+    table = SharedStockTable.create(2, stripes=2)
+    yield table
+    table.close()
+    table.unlink()
+
+
+def test_shared_product_behaves_like_product(table):
+    pixel, license_ = table.share([
+        Product("Google Pixel 7", price=500, quantity=3),
+        NonStockedProduct("Windows License", price=125),
+    ])
+
+    assert pixel.buy(3) == 1500
+    assert pixel.quantity == 0 and not pixel.is_active()
+    with pytest.raises(ValueError):
+        pixel.buy(1)
+
+    pixel.quantity = 5
+    assert pixel.is_active() and table.quantity(0) == 5
+    assert license_.buy(10 ** 6) == 125 * 10 ** 6
+
+
+def _sell_until_sold_out(product, sold):
+    while True:
+        try:
+            product.buy(1)
+        except ValueError:
+            return
+        with sold.get_lock():
+            sold.value += 1
+
+
+def test_no_oversell_across_processes(table):
+    context = multiprocessing.get_context("fork")
+    product, = table.share([Product("Google Pixel 7", price=500, quantity=STOCK)])
+    sold = context.Value("q", 0)
+
+    workers = [
+        context.Process(target=_sell_until_sold_out, args=(product, sold))
+        for _ in range(WORKERS)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sold.value == STOCK
+    assert product.quantity == 0 and not product.is_active()
@@ -0,0 +1,43 @@
+from products import Product, LimitedProduct
+from store import Store
+
+
+def test_cart_is_keyed_by_product_id(capsys):
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    store = Store([mac])
+    store.shopping_cart.add_item(mac, 2)
+    mac.name = "MacBook Air M3"
+    store.shopping_cart.add_item(mac, 1)
+
+    assert store.shopping_cart.cart == {mac.id: 3}
+    assert store.shopping_cart[mac] == 3
+    assert store.get_product(mac.id) is mac
+    assert store._order() == 3 * 145000
+
+
+def test_ids_are_stable_across_stores():
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    pixel = LimitedProduct("Google Pixel 7", price=500, quantity=250, maximum=1)
+    first = Store([mac])
+    second = Store([pixel, mac])
+
+    assert mac.id == first.products[0].id == second.get_product(mac.id).id
+    assert pixel.id != mac.id
+
+
+def test_products_outside_a_store_are_rejected(capsys):
+    store = Store([])
+    store.shopping_cart.add_item(Product("Loose", price=1, quantity=1), 1)
+    assert len(store.shopping_cart) == 0
+
+
+def test_removed_products_leave_the_cart():
+    mac = Product("MacBook Air M2", price=1450, quantity=100)
+    pixel = Product("Google Pixel 7", price=500, quantity=250)
+    store = Store([mac, pixel])
+    store.shopping_cart.add_item(mac, 1)
+    store.shopping_cart.add_item(pixel, 2)
+
+    store.remove_product(mac)
+    assert store.shopping_cart.cart == {pixel.id: 2}
+    assert store._order() == 2 * 50000
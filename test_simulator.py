@@ -0,0 +1,58 @@
+import pytest
+from products import Product, NonStockedProduct, LimitedProduct
+from promotion import PromotionEveryXFree
+from simulator import Demand, _settle, simulate
+
+
+@pytest.fixture
+def catalog():
+    return [
+        Product("MacBook Air M2", price=1450, quantity=10),
+        NonStockedProduct("Windows License", price=125),
+    ]
+
+
+def test_promotion_revenue_and_discount(catalog):
+    demand = Demand(
+        {"Windows License": 1},
+        {"Windows License": {2: 1}},
+    )
+    promotion = PromotionEveryXFree("Every 2nd 20%", 2, 20)
+
+    report = simulate(catalog, demand, orders=1000, promotion=promotion)
+
+    assert report.served == 1000 and report.stockouts == 0
+    assert report.units == 2000
+    assert report.list_revenue == 1000 * 2 * 12500
+    assert report.discount == 1000 * 2500
+
+
+def test_stockouts_and_process_pool(catalog):
+    demand = Demand.synthetic(catalog, max_quantity=3)
+
+    report = simulate(catalog, demand, orders=500, runs=2, seed=7)
+    assert report == simulate(catalog, demand, orders=500, runs=2, seed=7, processes=2)
+
+    assert report.orders == 1000
+    assert report.served + report.stockouts + report.rejected == report.orders
+    assert 0 < report.stockout_rate < 1
+    assert catalog[0].quantity == 10
+
+    with pytest.raises(ValueError):
+        Demand({"MacBook Air M2": 1}, {"MacBook Air M2": {0: 1}})
+
+
+def test_smaller_orders_fit_after_a_stockout():
+    assert _settle([4, 4, 3, 1, 2], 9) == ({4: 2, 1: 1}, 2)
+    assert _settle([], 9) == ({}, 0)
+
+
+def test_orders_above_the_maximum_are_rejected():
+    shipping = LimitedProduct("Shipping", price=10, maximum=1)
+    demand = Demand({"Shipping": 1}, {"Shipping": {1: 1, 2: 1}})
+
+    report = simulate([shipping], demand, orders=1000)
+
+    assert report.rejected > 0 and report.stockouts == 0
+    assert report.served + report.rejected == report.orders
+    assert report.units == report.served
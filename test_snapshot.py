@@ -0,0 +1,74 @@
+import pytest
+from products import Product, NonStockedProduct, LimitedProduct
+from promotion import PromotionDiscountPercent
+from store import Store
+
+
+@pytest.fixture
+def store():
+    with Store([
+        Product("MacBook Air M2", price=1450, quantity=100),
+        Product("Bose QuietComfort Earbuds", price=250, quantity=500),
+        NonStockedProduct("Windows License", price=125),
+    ]) as store:
+        yield store
+
+
+def test_snapshot_changes_dont_touch_the_store(store):
+    mac, bose, windows = store.products
+    cheap, discounted = store.snapshot(), store.snapshot()
+    items = {mac: 2, bose.id: 4, windows: 1}
+
+    cheap.set_price(mac, 1399)
+    discounted.set_promotion(bose, PromotionDiscountPercent("20% off", 20))
+
+    assert cheap.bill(items) == 2 * 139900 + 4 * 25000 + 12500
+    assert discounted.bill(items) == 2 * 145000 + 4 * 20000 + 12500
+    assert len(cheap.materialized) == len(discounted.materialized) == 1
+    assert cheap.get_product(bose) is store.read_view()[1]
+
+    assert discounted.order(items) == 2 * 145000 + 4 * 20000 + 12500
+    assert discounted.get_product(mac).quantity == 98
+    assert len(discounted) == 98 + 496
+
+    # The store keeps its prices, promotions and stock.
+    assert (mac.price, mac.quantity, bose.quantity) == (1450, 100, 500)
+    assert bose.promotion.name == "No Promotion"
+    assert len(store) == 600
+
+
+def test_snapshot_stock_checks(store):
+    mac = store.products[0]
+    snapshot = store.snapshot()
+    snapshot.set_quantity(mac, 0)
+
+    assert len(snapshot.get_all_active_products()) == 2
+    assert mac.is_active()
+
+    with pytest.raises(ValueError):
+        snapshot.bill({mac: 1})
+
+    with pytest.raises(ValueError):
+        snapshot.set_price(mac, -1)
+
+    with pytest.raises(ValueError):
+        snapshot.set_quantity(store.products[2], 5)
+
+
+def test_snapshot_is_taken_at_a_point_in_time(store):
+    mac, bose, _ = store.products
+    snapshot = store.snapshot()
+
+    mac.price = 999
+    bose.buy(10)
+    store.add_product(Product("Google Pixel 7", price=500, quantity=250))
+    store.remove_product(store.products[2])
+    shipping = LimitedProduct("Shipping", price=10, maximum=1)
+    store.add_product(shipping)
+
+    assert snapshot.bill({mac: 1, bose: 500}) == 145000 + 500 * 25000
+    assert len(snapshot.products) == 3 and len(snapshot) == 600
+    assert shipping not in snapshot
+
+    with pytest.raises(ValueError):
+        store.snapshot().bill({shipping: 2})
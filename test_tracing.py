@@ -0,0 +1,51 @@
+import json
+import time
+import pytest
+import tracing
+from products import Product
+from store import Store
+
+
+@pytest.fixture
+def store():
+    store = Store([Product("MacBook Air M2", price=1450, quantity=100)])
+    store.shopping_cart.add_item(store.products[0], 2)
+    yield store
+    tracing.disable()
+    tracing.clear()
+
+
+def test_checkout_phases_are_traced(store, tmp_path):
+    tracing.enable()
+    store._order()
+
+    events = tracing.events()
+    names = [event["name"] for event in events]
+    assert set(names) == {"Store._order", "lookup", "Product.buy", "apply_promotion"}
+    assert len({event["args"]["trace"] for event in events}) == 1
+
+    # Child spans lie within the outermost span.
+    root = next(event for event in events if event["name"] == "Store._order")
+    for event in events:
+        assert root["ts"] <= event["ts"] <= event["ts"] + event["dur"] <= root["ts"] + root["dur"]
+
+    path = tmp_path / "trace.json"
+    tracing.write_chrome(str(path))
+    assert len(json.loads(path.read_text())["traceEvents"]) == 4
+
+
+def test_sampling_keeps_slow_traces(store):
+    tracing.enable(sample_rate=0, slow_threshold=0.01)
+    store._order()
+    assert tracing.events() == []
+
+    with tracing.span("slow checkout"):
+        time.sleep(0.02)
+        store._order()
+
+    assert len(tracing.events()) == 5
+
+    tracing.disable()
+    with tracing.span("disabled"):
+        pass
+    assert len(tracing.events()) == 5
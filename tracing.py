@@ -0,0 +1,255 @@
+"""
+tracing module
+
+This module provides opt-in tracing spans for the checkout phases. Spans nest through a
+context variable, so every span knows the trace of the outermost span it runs in, also across
+threads started with a copied context. Finished traces are kept in a bounded buffer and
+written in the Chrome trace event format, which chrome://tracing and Perfetto show as a timeline.
+Tracing is disabled by default. While disabled, traced functions cost a single flag check and
+spans an empty context manager.
+
+Traces are sampled when their outermost span starts. With a slow threshold, unsampled traces
+are recorded as well and kept only if they took at least the threshold, so single slow orders
+are captured without keeping every fast one.
+
+Classes:
+    Span
+
+Functions:
+    enable(sample_rate: float = 1.0, slow_threshold: float | None = None, capacity: int = 100000) -> None:
+        Enables tracing.
+
+    disable() -> None:
+        Disables tracing.
+
+    is_enabled() -> bool:
+        Returns whether spans are recorded.
+
+    span(name: str, **args) -> Span:
+        Returns a context manager timing a span.
+
+    traced(name: str | None = None):
+        Decorator recording every call as span.
+
+    events() -> list[dict]:
+        Returns the recorded spans as Chrome trace events.
+
+    clear() -> None:
+        Drops all recorded spans.
+
+    write_chrome(path: str) -> None:
+        Writes the recorded spans as Chrome trace JSON.
+
+Class Span:
+    A timed section of a trace, used as context manager.
+"""
+
+import json
+import os
+import random
+from collections import deque
+from contextvars import ContextVar
+from functools import wraps
+from itertools import count
+from threading import get_ident, Lock
+from time import perf_counter_ns
+
+_enabled = False
+_sample_rate = 1.0
+_slow_threshold_ns = None
+_buffer = deque(maxlen=100000)
+_buffer_lock = Lock()
+_trace_ids = count(1)
+
+# The trace of the outermost running span.
+_current = ContextVar("trace", default=None)
+
+
+class _Trace:
+    """ The spans of one trace, collected until its outermost span ends. """
+
+    __slots__ = ("id", "sampled", "spans")
+
+    def __init__(self, trace_id: int, sampled: bool):
+        self.id = trace_id
+        self.sampled = sampled
+        self.spans = []
+
+
+# Marks the spans of traces that are neither sampled nor checked for slowness.
+_UNSAMPLED = _Trace(0, False)
+
+
+class Span:
+    """ A timed section of a trace. Use tracing.span to create spans. """
+
+    __slots__ = ("_name", "_args", "_trace", "_token", "_start")
+
+    def __init__(self, name: str, args: dict):
+        self._name = name
+        self._args = args
+        self._trace = None
+        self._token = None
+        self._start = 0
+
+    def __enter__(self):
+        trace = _current.get()
+
+        if trace is None:
+            sampled = random.random() < _sample_rate
+            if sampled or _slow_threshold_ns is not None:
+                trace = _Trace(next(_trace_ids), sampled)
+            else:
+                trace = _UNSAMPLED
+            self._token = _current.set(trace)
+
+        self._trace = trace
+        self._start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = perf_counter_ns()
+        trace = self._trace
+
+        if trace is not _UNSAMPLED:
+            args = self._args
+            if exc_type is not None:
+                args = {**args, "error": exc_type.__name__}
+            trace.spans.append((self._name, self._start, end - self._start, get_ident(), args))
+
+        if self._token is not None:
+            _current.reset(self._token)
+            duration = end - self._start
+
+            keep = trace.sampled or (
+                _slow_threshold_ns is not None and duration >= _slow_threshold_ns
+            )
+            if trace is not _UNSAMPLED and keep:
+                with _buffer_lock:
+                    _buffer.extend((trace.id, *entry) for entry in trace.spans)
+
+        return False
+
+
+class _NullSpan:
+    """ The span of disabled tracing, does nothing. """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def enable(sample_rate: float = 1.0, slow_threshold: float | None = None, capacity: int = 100000) -> None:
+    """
+    Enables tracing.
+    :param sample_rate: The share of traces recorded, between 0 and 1.
+    :param slow_threshold: [Optional]: Also keep unsampled traces taking at least this many seconds.
+    :param capacity: The number of spans kept, the oldest are dropped first.
+    """
+    global _enabled, _sample_rate, _slow_threshold_ns, _buffer
+
+    if not 0 <= sample_rate <= 1:
+        raise ValueError("The sample rate should be between 0 and 1.")
+
+    if slow_threshold is not None and slow_threshold < 0:
+        raise ValueError("The slow threshold should be a positive number of seconds.")
+
+    if not isinstance(capacity, int) or capacity < 1:
+        raise ValueError("The capacity should be a positive int.")
+
+    with _buffer_lock:
+        if capacity != _buffer.maxlen:
+            _buffer = deque(_buffer, maxlen=capacity)
+
+    _sample_rate = sample_rate
+    _slow_threshold_ns = None if slow_threshold is None else int(slow_threshold * 1e9)
+    _enabled = True
+
+
+def disable() -> None:
+    """ Disables tracing. Recorded spans are kept until clear is called. """
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    """ Returns whether spans are recorded. """
+    return _enabled
+
+
+def span(name: str, **args):
+    """
+    Returns a context manager recording a span, e.g. with tracing.span("lookup", product=name).
+    :param name: The name shown in the timeline.
+    :param args: Details shown with the span, should be JSON-serializable.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+
+    return Span(name, args)
+
+
+def traced(name: str | None = None):
+    """
+    Decorator recording every call of the decorated function as span.
+    While tracing is disabled the function is called directly.
+    :param name: [Optional]: The span name, defaults to the qualified function name.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+
+            with Span(span_name, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def events() -> list[dict]:
+    """ Returns the recorded spans as Chrome trace events, timestamps in microseconds. """
+    pid = os.getpid()
+
+    with _buffer_lock:
+        spans = list(_buffer)
+
+    return [
+        {
+            "name": name,
+            "cat": "best-buy",
+            "ph": "X",
+            "ts": start / 1000,
+            "dur": duration / 1000,
+            "pid": pid,
+            "tid": thread,
+            "args": {"trace": trace_id, **args},
+        }
+        for trace_id, name, start, duration, thread, args in spans
+    ]
+
+
+def clear() -> None:
+    """ Drops all recorded spans. """
+    with _buffer_lock:
+        _buffer.clear()
+
+
+def write_chrome(path: str) -> None:
+    """ Writes the recorded spans as Chrome trace JSON, replacing the file atomically. """
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump({"traceEvents": events(), "displayTimeUnit": "ms"}, file)
+
+    os.replace(temporary, path)
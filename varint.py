@@ -0,0 +1,55 @@
+"""
+varint module
+
+This module provides the variable-length int encoding of the compact binary formats, e.g. the
+encoded carts of the sessions module and the time series of the history module. Ints are
+written 7 bits per byte, lowest first, the high bit marks that another byte follows. Small
+values take a single byte. Signed values are zigzag-mapped first, so small negative values
+stay small too.
+
+Functions:
+    write_varint(buffer: bytearray, value: int) -> None:
+        Appends an unsigned int to the buffer.
+
+    read_varint(data: bytes, offset: int) -> tuple[int, int]:
+        Returns the unsigned int at offset and the offset after it.
+
+    zigzag(value: int) -> int:
+        Maps a signed int to an unsigned int.
+
+    unzigzag(value: int) -> int:
+        Maps an unsigned int back to the signed int.
+"""
+
+
+def write_varint(buffer: bytearray, value: int) -> None:
+    """ Appends an unsigned int, 7 bits per byte, lowest first. """
+    while value > 0x7F:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data: bytes, offset: int) -> tuple[int, int]:
+    """
+    Returns the unsigned int at offset and the offset after it.
+    :raises IndexError: If the data ends within the int.
+    """
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def zigzag(value: int) -> int:
+    """ Maps signed to unsigned ints, small magnitudes to small values: 0, -1, 1, -2 to 0, 1, 2, 3. """
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def unzigzag(value: int) -> int:
+    """ Reverses zigzag. """
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)